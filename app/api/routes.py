@@ -1,18 +1,24 @@
 
 
+import json
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 # fast api imports
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 # schema imports
 
-from app.api.schemas import DocumentInfo, QueryRequest, QueryResponse, UploadResponse
+from app.api.schemas import BatchQueryRequest, DocumentInfo, DocumentPage, JobStatus, QueryRequest, QueryResponse, UploadResponse
 
+from app.core import metrics
 from app.core.config import Config
 from app.core.state import AppState
+from app.services.bedrock_invoker import BedrockThrottledError
+from app.services.upload_spool import spool_upload
+from app.services.vector_store import QueryFilter
 
 # Router
 router = APIRouter()
@@ -21,11 +27,23 @@ router = APIRouter()
 def get_state(request: Request) -> AppState:
     return request.app.state.app_state
 
+
+def get_filters(body) -> Optional[QueryFilter]:
+    doc_ids = list(body.doc_ids or [])
+    if getattr(body, "doc_id", None) and body.doc_id not in doc_ids:
+        doc_ids.append(body.doc_id)
+
+    filters = QueryFilter(doc_ids = doc_ids or None, doc_type = body.doc_type or None, section_prefix = body.section_prefix or None)
+    return None if filters.is_empty() else filters
+
+
+def get_timings(body, result):
+    return result.get("timings") if body.include_timings or Config.QUERY_TIMINGS else None
+
 # POST /upload
-@router.post("/upload", response_model = UploadResponse)
+@router.post("/upload", response_model = UploadResponse, status_code = 202)
 async def upload_document(
     request: Request,
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     ):
     state = get_state(request)
@@ -33,24 +51,38 @@ async def upload_document(
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code = 400, detail = "Only PDF files are supported")
 
-    if state.doc_processor is None:
-        raise HTTPException(status_code = 500, detail = "Document processor is not intialized") 
+    if state.ingestion_queue is None:
+        raise HTTPException(status_code = 500, detail = "Ingestion queue is not intialized") 
 
+    # Large PDFs are spooled to UPLOAD_DIR rather than held in memory until processed
+    pdf = None
     try:
-        pdf_bytes = await file.read()
-        result = state.doc_processor.process_document(pdf_bytes, file.filename)
-
-        state.document_store[result["doc_id"]] = result
+        pdf = await spool_upload(file)
+        job = state.ingestion_queue.submit(pdf, file.filename)
 
         return UploadResponse(
             success = True,
-            doc_id = result["doc_id"],
-            filename = result["filename"],
-            message = f"Documents '{file.filename}' processed successfully",
-            chunk_count = result["chunk_count"],
+            job_id = job.job_id,
+            status = job.status,
+            filename = file.filename,
+            message = f"Document '{file.filename}' queued for processing",
         )
     except Exception as e:
-        raise HTTPException(status_code = 500, detail = f"Error processing documents: {str(e)}")
+        if pdf is not None:
+            pdf.close()
+        raise HTTPException(status_code = 500, detail = f"Error queueing document: {str(e)}")
+
+
+# GET /jobs/{job_id}
+@router.get("/jobs/{job_id}", response_model = JobStatus)
+async def get_job(request: Request, job_id: str):
+    state = get_state(request)
+
+    job = state.ingestion_queue.get(job_id) if state.ingestion_queue else None
+    if job is None:
+        raise HTTPException(status_code = 404, detail = "Job not found")
+
+    return JobStatus(**job.to_dict())
 
 
 # POST /query
@@ -64,7 +96,7 @@ async def query_documents(request: Request, body: QueryRequest):
         raise HTTPException(status_code = 500, detail = "RAG system is not intialized")
 
     try:
-        result = state.rag_system.query(body.query, top_k = body.top_k or Config.TOP_K_CHUNKS)
+        result = await state.rag_system.aquery(body.query, top_k = body.top_k or Config.TOP_K_CHUNKS, filters = get_filters(body))
 
         return QueryResponse(
             query = result["query"],
@@ -72,32 +104,116 @@ async def query_documents(request: Request, body: QueryRequest):
             retrieved_chunks = result["retrieved_chunks"],
             num_chunks = result["num_chunks"],
             timestamp=datetime.now().isoformat(),
+            cached = result.get("cached"),
+            context_stats = result.get("context_stats"),
+            timings = get_timings(body, result),
         )
+    except BedrockThrottledError as e:
+        raise HTTPException(status_code = 503, detail = f"Model is busy, try again later: {str(e)}", headers = {"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"Error processing query: {str(e)}")
 
 
-# GET /documents
-@router.get("/documents", response_model = list[DocumentInfo])
-async def list_documents(request: Request):
+# POST /query/stream
+@router.post("/query/stream")
+
+async def query_documents_stream(request: Request, body: QueryRequest):
+
+    state = get_state(request)
+
+    if state.rag_system is None:
+        raise HTTPException(status_code = 500, detail = "RAG system is not intialized")
+
+    # Server-sent events: "chunks" first, then "token" events, then "done"
+    async def event_stream():
+        try:
+            async for event, data in state.rag_system.astream(body.query, top_k = body.top_k or Config.TOP_K_CHUNKS, filters = get_filters(body)):
+                if event == "token":
+                    payload = {"text": data}
+                elif event == "done":
+                    payload = {"num_chunks": data["num_chunks"], "cached": data.get("cached"), "context_stats": data.get("context_stats"), "timings": get_timings(body, data), "timestamp": datetime.now().isoformat()}
+                else:
+                    payload = {"retrieved_chunks": data, "num_chunks": len(data)}
+                yield f"event: {event}\ndata: {json.dumps(payload, default = float)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error processing query: {str(e)}'})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type = "text/event-stream", headers = {"Cache-Control": "no-cache"})
+
+
+# POST /query/batch
+@router.post("/query/batch")
+
+async def query_documents_batch(request: Request, body: BatchQueryRequest):
+
+    state = get_state(request)
+
+    if state.rag_system is None:
+        raise HTTPException(status_code = 500, detail = "RAG system is not intialized")
+
+    if not body.queries:
+        raise HTTPException(status_code = 400, detail = "No queries given")
+
+    if len(body.queries) > Config.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code = 400, detail = f"At most {Config.BATCH_MAX_QUERIES} queries per batch")
+
+    filters = get_filters(body)
+    if filters is not None and filters.doc_ids and state.document_registry is not None:
+        if any(state.document_registry.get(doc_id) is None for doc_id in filters.doc_ids):
+            raise HTTPException(status_code = 404, detail = "Document not found")
+
+    # NDJSON: one result per line in completion order; "index" is the position in queries
+    async def result_stream():
+        try:
+            async for result in state.rag_system.query_batch(body.queries, top_k = body.top_k or Config.TOP_K_CHUNKS, filters = filters):
+                result["timings"] = get_timings(body, result)
+                result["timestamp"] = datetime.now().isoformat()
+                yield json.dumps(result, default = float) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Error processing batch: {str(e)}"}) + "\n"
+
+    return StreamingResponse(result_stream(), media_type = "application/x-ndjson")
+
+
+# GET /documents?limit=&cursor=
+@router.get("/documents", response_model = DocumentPage)
+async def list_documents(
+    request: Request,
+    limit: int = Query(50, ge = 1, le = 500),
+    cursor: Optional[str] = None,
+    ):
     state = get_state(request)
 
+    if state.document_registry is None:
+        raise HTTPException(status_code = 500, detail = "Document registry is not initialized")
+
+    try:
+        page, next_cursor = state.document_registry.list(limit = limit, cursor = cursor)
+    except ValueError:
+        raise HTTPException(status_code = 400, detail = "Invalid cursor")
+
     documents = []
 
-    for doc_id, doc_data in state.document_store.items():
+    for doc_data in page:
 
         documents.append(
             DocumentInfo(
-                doc_id = doc_id,
+                doc_id = doc_data["doc_id"],
                 filename = doc_data["filename"],
-                doc_type = doc_data["meta_data"]["doc_type"],
-                word_count = doc_data["meta_data"]["word_count"],
+                doc_type = doc_data["metadata"]["doc_type"],
+                word_count = doc_data["metadata"]["word_count"],
                 chunk_count = doc_data["chunk_count"],
-                timestamp = doc_data["meta_data"]["timestamp"],
+                timestamp = doc_data["metadata"]["timestamp"],
+                duplicate_of = doc_data.get("duplicate_of"),
             )
         )
 
-    return documents
+    return DocumentPage(
+        documents = documents,
+        next_cursor = next_cursor,
+        total = state.document_registry.count(),
+        rebuilding = state.document_registry.rebuilding,
+    )
     
 # GET /documents/{doc_id}
 @router.get("/documents/{doc_id}")
@@ -105,10 +221,11 @@ async def list_documents(request: Request):
 async def get_document(request: Request, doc_id: str):
     state = get_state(request)
 
-    if doc_id not in state.document_store:
+    doc_data = state.document_registry.get(doc_id) if state.document_registry else None
+    if doc_data is None:
         raise HTTPException(status_code = 404, detail = "Document not found")
     
-    return state.document_store[doc_id]
+    return doc_data
 
 # DELETE /document/{doc_id}
 @router.delete("/document/{doc_id}")
@@ -116,7 +233,8 @@ async def get_document(request: Request, doc_id: str):
 async def delete_document(request: Request, doc_id: str):
     state = get_state(request)
 
-    if doc_id not in state.document_store:
+    doc_data = state.document_registry.get(doc_id) if state.document_registry else None
+    if doc_data is None:
         raise HTTPException(status_code = 404, detail = "Document not found")
     
     if state.doc_processor is None:
@@ -124,28 +242,94 @@ async def delete_document(request: Request, doc_id: str):
     
     try:
         
-        # Del from chromadb
-        state.doc_processor.chroma_manager.delete_by_doc_id(doc_id)
+        # Del from vector store and keyword index
+        state.doc_processor.delete_document(doc_id)
 
         # del raw from s3
-        filename = state.document_store[doc_id]["filename"]
+        filename = doc_data["filename"]
 
         state.doc_processor.s3_manager.delete_object(Config.RAW_BUCKET, filename)
 
-        del state.document_store[doc_id]
+        state.document_registry.delete(doc_id)
+
+        # Drop cached answers built from this document
+        if state.rag_system is not None:
+            state.rag_system.invalidate_doc(doc_id)
         return {"Success": True, "Message": f"Document {doc_id} deleted successfully"}
 
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"Error deleting document: {str(e)}")
 
-# GET
+# GET /metrics: Prometheus text format
+@router.get("/metrics")
+async def get_metrics():
+    if not Config.METRICS_ENABLED:
+        raise HTTPException(status_code = 404, detail = "Metrics are disabled")
+
+    return PlainTextResponse(metrics.render(), media_type = "text/plain; version=0.0.4")
+
+
+# GET /health/live: the process is up and serving requests
+@router.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+
+# GET /health/ready: models loaded and backends connected (503 until then)
+@router.get("/health/ready")
+async def health_ready(request: Request):
+    state = get_state(request)
+
+    services = state.services.status() if state.services else {"ready": False}
+    if not services["ready"] or state.rag_system is None:
+        return JSONResponse(status_code = 503, content = {"status": "starting", **services})
+    return {"status": "ready", **services}
+
+
+# GET /health
 @router.get("/health")
 async def health_check(request: Request):
     state = get_state(request)
 
+    answer_cache = None
+    if state.rag_system is not None and state.rag_system.answer_cache is not None:
+        answer_cache = state.rag_system.answer_cache.stats()
+
+    embedding_cache = None
+    cache = getattr(state.doc_processor.embedding_manager, "cache", None) if state.doc_processor else None
+    if cache is not None:
+        embedding_cache = cache.stats()
+
+    bm25_index = None
+    if state.doc_processor is not None and state.doc_processor.bm25_index is not None:
+        bm25_index = state.doc_processor.bm25_index.stats()
+
+    reranker = None
+    if state.rag_system is not None and state.rag_system.reranker is not None:
+        reranker = state.rag_system.reranker.stats()
+
+    bedrock = None
+    if state.rag_system is not None and getattr(state.rag_system.bedrock_llm, "invoker", None) is not None:
+        bedrock = state.rag_system.bedrock_llm.invoker.stats()
+
+    artifacts = None
+    if state.doc_processor is not None and state.doc_processor.artifacts is not None:
+        artifacts = state.doc_processor.artifacts.stats()
+
     return { 
         "status": "ok",
+        "ready": state.services.ready if state.services else False,
+        "services": state.services.status() if state.services else None,
         "timestamp": datetime.now().isoformat(),
-        "documents_count": len(state.document_store),
+        "documents_count": state.document_registry.count() if state.document_registry else 0,
+        "registry_rebuilding": state.document_registry.rebuilding if state.document_registry else False,
+        "ingest_queue_depth": state.ingestion_queue.pending() if state.ingestion_queue else 0,
         "chroma_collection" : Config.COLLECTION_NAME,
+        "vector_backend": Config.VECTOR_BACKEND,
+        "embedding_cache": embedding_cache,
+        "answer_cache": answer_cache,
+        "bm25_index": bm25_index,
+        "reranker": reranker,
+        "bedrock": bedrock,
+        "artifacts": artifacts,
     }
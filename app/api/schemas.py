@@ -7,6 +7,32 @@ class QueryRequest(BaseModel):
     
     top_k: Optional[int] = 5
 
+    # retrieval filters: only these documents / this doc type / sections whose title starts with the prefix
+    doc_ids: Optional[List[str]] = None
+
+    doc_type: Optional[str] = None
+
+    section_prefix: Optional[str] = None
+
+    # return per-stage seconds in "timings" (always on with QUERY_TIMINGS)
+    include_timings: bool = False
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+
+    top_k: Optional[int] = 5
+
+    doc_id: Optional[str] = None
+
+    doc_ids: Optional[List[str]] = None
+
+    doc_type: Optional[str] = None
+
+    section_prefix: Optional[str] = None
+
+    include_timings: bool = False
+
 
 class QueryResponse(BaseModel):
     query: str
@@ -19,6 +45,14 @@ class QueryResponse(BaseModel):
     
     timestamp: str
 
+    cached: Optional[str] = None
+
+    # estimated prompt context tokens before/after ContextBuilder, merge/dedupe/trim counts
+    context_stats: Optional[Dict] = None
+
+    # seconds per stage (query_embed, vector_search, llm_generation, ... and query for the total)
+    timings: Optional[Dict[str, float]] = None
+
 class DocumentInfo(BaseModel):
     doc_id: str
     
@@ -32,16 +66,68 @@ class DocumentInfo(BaseModel):
     
     timestamp: str
 
+    duplicate_of: Optional[str] = None
+
+class DocumentPage(BaseModel):
+    documents: List[DocumentInfo]
+
+    next_cursor: Optional[str] = None
+
+    total: int
+
+    rebuilding: bool = False
+
 class UploadResponse(BaseModel):
     success: bool
 
-    doc_id: str
+    job_id: str
+
+    status: str
+
+    doc_id: Optional[str] = None
     
     filename: str
 
     message: str
     
-    chunk_count: int
+    chunk_count: Optional[int] = None
+
+class JobStatus(BaseModel):
+    job_id: str
+
+    filename: str
+
+    status: str
+
+    stage: Optional[str] = None
+
+    completed_stages: List[str]
+
+    progress: float
+
+    error: Optional[str] = None
+
+    doc_id: Optional[str] = None
+
+    chunk_count: Optional[int] = None
+
+    deduplicated: Optional[bool] = None
+
+    # doc_id the chunks were copied from when the same bytes were already ingested under another name
+    duplicate_of: Optional[str] = None
+
+    # the upload replaced a different document stored under the same name
+    replaced: Optional[bool] = None
+
+    reused_chunks: Optional[int] = None
+
+    embedded_chunks: Optional[int] = None
+
+    deleted_chunks: Optional[int] = None
+
+    created_at: str
+
+    updated_at: str
 
 
 
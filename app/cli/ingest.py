@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+from app.core.config import Config
+from app.core.services import get_services, lock_instance
+from app.services.bulk_ingest import BulkIngester, Checkpoint, iter_dir_items, iter_s3_items
+
+# Bulk ingestion from the command line (see app.services.bulk_ingest):
+#   python -m app.cli.ingest --prefix contracts/2024/       # PDFs under a RAW_BUCKET prefix
+#   python -m app.cli.ingest --dir ./pdfs                   # a local directory, uploaded to RAW_BUCKET
+# Uses the same backends and settings as the app (.env). Interrupted runs resume
+# from --checkpoint; delete it to start over. With VECTOR_BACKEND=local, stop
+# the app first (INSTANCE_LOCK_PATH): it only reads the local index at startup.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli.ingest", description="Bulk-ingest PDFs into Legal RAG")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--prefix", help="ingest the PDFs under this key prefix of the raw bucket ('' for all)")
+    source.add_argument("--dir", help="ingest the PDFs in this directory (recursively)")
+    parser.add_argument("--bucket", default=Config.RAW_BUCKET, help="bucket to list with --prefix (default RAW_BUCKET)")
+    parser.add_argument("--workers", type=int, default=Config.BULK_WORKERS, help="extraction processes")
+    parser.add_argument("--io-workers", type=int, default=Config.BULK_IO_WORKERS, help="parallel downloads / uploads")
+    parser.add_argument("--batch-size", type=int, default=Config.BULK_EMBED_BATCH_SIZE, help="chunks per embedding batch")
+    parser.add_argument("--checkpoint", default=Config.BULK_CHECKPOINT_PATH)
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    if args.dir is not None and not os.path.isdir(args.dir):
+        parser.error(f"not a directory: {args.dir}")
+
+    if Config.VECTOR_BACKEND == "local":
+        lock_instance("python -m app.cli.ingest")
+    services = get_services()
+    s3_manager = services.s3_manager
+    if args.dir is not None:
+        s3_manager.create_buckets()
+        items = iter_dir_items(args.dir)
+
+        def fetch(key):
+            with open(os.path.join(args.dir, key), "rb") as f:
+                return f.read()
+    else:
+        items = iter_s3_items(s3_manager, args.bucket, args.prefix)
+
+        def fetch(key):
+            return s3_manager.download_file(args.bucket, key)
+
+    services.embedding_manager.load()
+    checkpoint = Checkpoint(args.checkpoint)
+    ingester = BulkIngester(
+        embedding_manager=services.embedding_manager,
+        vector_store=services.vector_store,
+        s3_manager=s3_manager,
+        bm25_index=services.bm25_index,
+        registry=services.document_registry,
+        checkpoint=checkpoint,
+        workers=args.workers,
+        io_workers=args.io_workers,
+        batch_size=args.batch_size,
+        progress_every=args.progress_every,
+        artifacts=services.artifact_writer,
+    )
+    #PDFs listed from another bucket are copied into RAW_BUCKET like uploads
+    upload = args.dir is not None or args.bucket != Config.RAW_BUCKET
+    try:
+        stats = ingester.run(items, fetch, upload=upload)
+    finally:
+        if services.artifact_writer is not None:
+            services.artifact_writer.stop()
+        checkpoint.close()
+        if services.bm25_index is not None:
+            services.bm25_index.save()
+        services.document_registry.close()
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import argparse
+import hashlib
+import sys
+from app.core.config import Config
+from app.core.services import get_services, lock_instance
+from app.services.artifact_store import ArtifactRebuilder, ArtifactStore
+
+# Rebuilds the vector store, keyword index and registry from the artifacts in
+# PROCESSED_BUCKET (see app.services.artifact_store), without reading any PDF:
+#   python -m app.cli.rebuild                       # every document with artifacts
+#   python -m app.cli.rebuild --doc-id <id> ...     # only these documents
+#   python -m app.cli.rebuild --reembed             # embed every chunk again
+# Documents embedded with another EMBEDDING_MODEL / EMBEDDING_BACKEND are
+# embedded again, and their artifacts rewritten unless ARTIFACTS_ENABLED=false. To switch models, point
+# COLLECTION_NAME (or LOCAL_INDEX_DIR) at an empty index first. PDFs in
+# RAW_BUCKET without artifacts are listed at the end; python -m app.cli.ingest
+# --prefix '' ingests them and skips the rebuilt ones as duplicates. With
+# VECTOR_BACKEND=local, stop the app first (INSTANCE_LOCK_PATH): it only reads the local index at startup.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli.rebuild", description="Rebuild the Legal RAG index from processed artifacts")
+    parser.add_argument("--doc-id", action="append", help="rebuild only this document (repeatable)")
+    parser.add_argument("--reembed", action="store_true", help="embed every chunk again, even with the same model")
+    parser.add_argument("--io-workers", type=int, default=Config.BULK_IO_WORKERS, help="parallel artifact downloads")
+    parser.add_argument("--batch-size", type=int, default=Config.BULK_EMBED_BATCH_SIZE, help="chunks per upsert / embedding batch")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    if Config.VECTOR_BACKEND == "local":
+        lock_instance("python -m app.cli.rebuild")
+    services = get_services()
+    store = ArtifactStore(services.s3_manager)
+    writer = services.artifact_writer
+    rebuilder = ArtifactRebuilder(
+        store,
+        embedding_manager=services.embedding_manager,
+        vector_store=services.vector_store,
+        bm25_index=services.bm25_index,
+        registry=services.document_registry,
+        writer=writer,
+        io_workers=args.io_workers,
+        batch_size=args.batch_size,
+        reembed=args.reembed,
+        progress_every=args.progress_every,
+    )
+    try:
+        stats = rebuilder.run(args.doc_id)
+    finally:
+        if writer is not None:
+            writer.stop()
+        if services.bm25_index is not None:
+            services.bm25_index.save()
+        services.document_registry.close()
+
+    if args.doc_id is None:
+        rebuilt = set(store.iter_doc_ids())
+        without = [
+            obj["Key"] for page in services.s3_manager.iter_objects(Config.RAW_BUCKET) for obj in page
+            if hashlib.md5(obj["Key"].encode()).hexdigest() not in rebuilt
+        ]
+        if without:
+            print(f"{len(without)} PDFs in {Config.RAW_BUCKET} have no artifacts, e.g. {without[0]}; "
+                  f"ingest them with: python -m app.cli.ingest --prefix ''")
+    return 1 if stats["failed"] or stats["missing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
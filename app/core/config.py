@@ -19,6 +19,11 @@ class Config:
     PROCESSED_BUCKET = os.getenv("PROCESSED_BUCKET", "processed-eula-docs")
     RAW_BUCKET = os.getenv("RAW_BUCKET", "raw-eula-docs")
 
+    # S3 writes of files: multipart above the threshold, parts uploaded in parallel
+    S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16"))
+    S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "8"))
+    S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+
     # Chroma cloud
 
     CHROMA_API_KEY = os.getenv("CHROMA_API_KEY", "")
@@ -26,6 +31,34 @@ class Config:
     CHROMA_DATABASE = os.getenv("CHROMA_DATABASE", "eula-docs")
     COLLECTION_NAME = os.getenv("COLLECTION_NAME", "eula-docs")
 
+    # Offline backends: "memory" keeps S3 objects in process, "stub" answers with a
+    # deterministic fake LLM (latencies in seconds); with VECTOR_BACKEND=local nothing needs AWS or Chroma
+
+    S3_BACKEND = os.getenv("S3_BACKEND", "aws").lower()
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "bedrock").lower()
+    STUB_LLM_FIRST_TOKEN_LATENCY = float(os.getenv("STUB_LLM_FIRST_TOKEN_LATENCY", "0.4"))
+    STUB_LLM_TOKEN_LATENCY = float(os.getenv("STUB_LLM_TOKEN_LATENCY", "0.02"))
+    STUB_LLM_TOKENS = int(os.getenv("STUB_LLM_TOKENS", "100"))
+
+    # Vector store backend: "chroma" (Chroma Cloud) or "local" (embedded, on disk)
+
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./data/vector_index")
+    LOCAL_INDEX_HNSW = os.getenv("LOCAL_INDEX_HNSW", "false").lower() == "true"
+    LOCAL_INDEX_HNSW_EF = int(os.getenv("LOCAL_INDEX_HNSW_EF", "64"))
+
+    # Hybrid retrieval: BM25 keyword index fused with vector results (reciprocal rank fusion)
+
+    HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+    BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "./data/bm25_index")
+    BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B = float(os.getenv("BM25_B", "0.75"))
+    BM25_FLUSH_POSTINGS = int(os.getenv("BM25_FLUSH_POSTINGS", "500000"))
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+    # Chroma cannot filter metadata by prefix: section-prefix queries fetch n_results * this and filter
+    SECTION_FILTER_OVERFETCH = int(os.getenv("SECTION_FILTER_OVERFETCH", "5"))
+
 
     # Processing
 
@@ -33,8 +66,115 @@ class Config:
     CHUNK_OVERLAP = os.getenv("CHUNK_OVERLAP", 200)
 
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # load the model when the app module is imported instead of in the background after startup
+    PRELOAD_EMBEDDING_MODEL = os.getenv("PRELOAD_EMBEDDING_MODEL", "false").lower() == "true"
+    # torch | torch-int8 | onnx | onnx-int8; the onnx backends do not need torch
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./models/onnx")
+    ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+    EMBED_MAX_SEQ_LENGTH = int(os.getenv("EMBED_MAX_SEQ_LENGTH", "256"))
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+    EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    EMBED_MAX_QUERY_BATCH = int(os.getenv("EMBED_MAX_QUERY_BATCH", "32"))
+
+    EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+    EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./cache/embeddings.sqlite3")
+    EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
 
     TOP_K_CHUNKS = int(os.getenv("TOP_K_CHUNKS", "5"))
 
-    # Local
-    UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
\ No newline at end of file
+    # Prompt context: token budget for retrieved text (0 = unlimited), share of repeated
+    # text above which a passage keeps only its new sentences, smallest useful trimmed tail
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+    CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.5"))
+    CONTEXT_MIN_TAIL_TOKENS = int(os.getenv("CONTEXT_MIN_TAIL_TOKENS", "64"))
+
+    # Cross-encoder reranking: RERANK_CANDIDATES retrieved chunks are scored in batches
+    # until RERANK_BUDGET_MS (0 = no limit) is spent and the best TOP_K are kept
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+    RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+
+    # Vector hits with a (squared L2) distance of this or more are dropped; 0 keeps all.
+    # 1.0 is cosine similarity 0.5 for normalized embeddings. Off by default when reranking.
+    MAX_DISTANCE = float(os.getenv("MAX_DISTANCE", "0" if RERANK_ENABLED else "1.0"))
+
+    # Query concurrency
+
+    EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+    VECTOR_CONCURRENCY = int(os.getenv("VECTOR_CONCURRENCY", "16"))
+    BEDROCK_CONCURRENCY = int(os.getenv("BEDROCK_CONCURRENCY", "8"))
+
+    # Bedrock invocation: calls in flight adapt between BEDROCK_MIN_CONCURRENCY and
+    # BEDROCK_CONCURRENCY (AIMD), throttles are retried with jittered exponential backoff,
+    # and BEDROCK_HEDGE_AFTER_MS > 0 sends a second request when the first is that slow
+    BEDROCK_MIN_CONCURRENCY = int(os.getenv("BEDROCK_MIN_CONCURRENCY", "1"))
+    BEDROCK_AIMD_DECREASE = float(os.getenv("BEDROCK_AIMD_DECREASE", "0.5"))
+    BEDROCK_MAX_RETRIES = int(os.getenv("BEDROCK_MAX_RETRIES", "6"))
+    BEDROCK_BACKOFF_BASE = float(os.getenv("BEDROCK_BACKOFF_BASE", "0.2"))
+    BEDROCK_BACKOFF_MAX = float(os.getenv("BEDROCK_BACKOFF_MAX", "10"))
+    BEDROCK_HEDGE_AFTER_MS = float(os.getenv("BEDROCK_HEDGE_AFTER_MS", "0"))
+    BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", str(2 * BEDROCK_CONCURRENCY)))
+    BEDROCK_CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "5"))
+    BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", "120"))
+
+    # /query/batch: questions per request and LLM calls in flight per batch
+    BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+    BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+    # Answer cache
+
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+    # Ingestion
+
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+    INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "1000"))
+
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+    PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "32"))
+
+    # chunks embedded and upserted per batch while the next batch is built
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+
+    # An upload under a stored document's name that keeps under INGEST_REPLACE_MIN_REUSED of its
+    # chunks is a different file, not an edit: reported as "replaced", or refused with INGEST_ALLOW_REPLACE=false
+    INGEST_REPLACE_MIN_REUSED = float(os.getenv("INGEST_REPLACE_MIN_REUSED", "0.2"))
+    INGEST_ALLOW_REPLACE = os.getenv("INGEST_ALLOW_REPLACE", "true").lower() == "true"
+
+    # Bulk ingestion (python -m app.cli.ingest): extraction processes, parallel
+    # downloads / uploads, chunks per embedding batch across documents, resume file
+    BULK_WORKERS = int(os.getenv("BULK_WORKERS", str(os.cpu_count() or 1)))
+    BULK_IO_WORKERS = int(os.getenv("BULK_IO_WORKERS", "8"))
+    BULK_EMBED_BATCH_SIZE = int(os.getenv("BULK_EMBED_BATCH_SIZE", "256"))
+    BULK_CHECKPOINT_PATH = os.getenv("BULK_CHECKPOINT_PATH", "./data/bulk_ingest.jsonl")
+
+    # Processed artifacts (cleaned text, chunks, embeddings) written behind ingestion
+    # to PROCESSED_BUCKET under ARTIFACT_PREFIX, for python -m app.cli.rebuild. Parts are
+    # spooled under UPLOAD_DIR; at most ARTIFACT_QUEUE_MB of spools wait to be written
+    ARTIFACTS_ENABLED = os.getenv("ARTIFACTS_ENABLED", "true").lower() == "true"
+    ARTIFACT_PREFIX = os.getenv("ARTIFACT_PREFIX", "artifacts/")
+    ARTIFACT_QUEUE_MB = int(os.getenv("ARTIFACT_QUEUE_MB", "256"))
+
+    # Document registry (SQLite); rebuilt from S3 and vector metadata when empty
+    REGISTRY_PATH = os.getenv("REGISTRY_PATH", "./data/documents.sqlite3")
+    REGISTRY_REBUILD = os.getenv("REGISTRY_REBUILD", "true").lower() == "true"
+
+    # Held by the app (and by the CLIs with VECTOR_BACKEND=local) so only one process serves a data directory
+    INSTANCE_LOCK_PATH = os.getenv("INSTANCE_LOCK_PATH", "./data/app.lock")
+
+    # Metrics (GET /metrics); QUERY_TIMINGS returns per-stage seconds with every /query answer
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    QUERY_TIMINGS = os.getenv("QUERY_TIMINGS", "false").lower() == "true"
+
+    # Local: uploads above UPLOAD_SPOOL_MAX_MEMORY_MB are spooled to UPLOAD_DIR until ingested
+    UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+    UPLOAD_SPOOL_MAX_MEMORY_MB = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY_MB", "8"))
\ No newline at end of file
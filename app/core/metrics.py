@@ -0,0 +1,207 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.core.config import Config
+
+# In-process metrics in the Prometheus text format, served at GET /metrics.
+# Each metric keeps one series per label value tuple; updates take a lock
+# and a few list operations, so they can sit on the query hot path.
+# Under several worker processes every worker reports its own series.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return super().render() + [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, *labels):
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        #labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        lines = super().render()
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "legal_rag_stage_seconds", "Time spent in a query or ingestion stage, per query or document", ("stage",)
+))
+STAGE_IN_FLIGHT = REGISTRY.register(Gauge(
+    "legal_rag_stage_in_flight", "Queries or documents currently in a stage", ("stage",)
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "legal_rag_stage_errors_total", "Stages that raised an error", ("stage",)
+))
+QUERIES = REGISTRY.register(Counter(
+    "legal_rag_queries_total", "Answered queries by answer source (model, exact or semantic cache)", ("source",)
+))
+DOCUMENTS = REGISTRY.register(Counter(
+    "legal_rag_documents_total", "Ingested documents by outcome", ("outcome",)
+))
+CHUNKS = REGISTRY.register(Counter(
+    "legal_rag_chunks_total", "Chunks of ingested documents: embedded, reused unchanged or deleted", ("result",)
+))
+BEDROCK_TOKENS = REGISTRY.register(Counter(
+    "legal_rag_bedrock_tokens_total", "Bedrock token usage reported in model responses", ("type",)
+))
+BEDROCK_RETRIES = REGISTRY.register(Counter(
+    "legal_rag_bedrock_retries_total", "Bedrock calls retried after throttling or a connection error", ("reason",)
+))
+BEDROCK_HEDGES = REGISTRY.register(Counter(
+    "legal_rag_bedrock_hedges_total", "Hedged Bedrock calls by which request answered first", ("winner",)
+))
+BEDROCK_CONCURRENCY_LIMIT = REGISTRY.register(Gauge(
+    "legal_rag_bedrock_concurrency_limit", "Current adaptive limit on Bedrock calls in flight"
+))
+
+
+class Stage:
+    #Times a block as one observation of `stage`, counts it in flight while it
+    #runs and records an error if it raises. With a timings dict the duration
+    #is also added there (per-query timings for QueryResponse).
+    #   with Stage("vector_search", timings):
+    #       ...
+
+    __slots__ = ("stage", "timings", "start")
+
+    def __init__(self, stage: str, timings: Optional[Dict[str, float]] = None):
+        self.stage = stage
+        self.timings = timings
+        self.start = 0.0
+
+    def __enter__(self):
+        if Config.METRICS_ENABLED:
+            STAGE_IN_FLIGHT.inc(1, self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.timings is not None:
+            self.timings[self.stage] = self.timings.get(self.stage, 0.0) + elapsed
+        if Config.METRICS_ENABLED:
+            STAGE_IN_FLIGHT.dec(1, self.stage)
+            STAGE_SECONDS.observe(elapsed, self.stage)
+            #a closed stream or cancelled task is not a stage failure
+            if exc_type is not None and issubclass(exc_type, Exception):
+                STAGE_ERRORS.inc(1, self.stage)
+        return False
+
+
+def observe_stage(stage: str, seconds: float):
+    if Config.METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage)
+
+
+def count(counter: Counter, *labels, amount: float = 1):
+    if Config.METRICS_ENABLED and amount:
+        counter.inc(amount, *labels)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,168 @@
+import os
+import threading
+from typing import Callable, Dict, Optional
+from app.core.config import Config
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: the single-process check is skipped
+    fcntl = None
+
+
+class ServiceContainer:
+    #One instance of each backend client per process, created on first use and
+    #shared by RAGSystem, DocumentProcessor, the registry and the ingestion
+    #workers. Service modules (and with them boto3, chromadb and torch) are
+    #imported only when a service is first asked for.
+    #
+    #warm_up() does the slow part (embedding model, vector store connection,
+    #buckets) so the app can report liveness at once and readiness after.
+
+    def __init__(self):
+        self._services: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        self.ready = False
+        self.warm_up_error: Optional[str] = None
+
+    def _get(self, name: str, create: Callable[[], object]):
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = create()
+            return self._services[name]
+
+    @property
+    def s3_manager(self):
+        def create():
+            from app.services.s3_manager import S3Manager
+            return S3Manager()
+        return self._get("s3_manager", create)
+
+    @property
+    def embedding_manager(self):
+        def create():
+            from app.services.embedding_manager import EmbeddingManager
+            return EmbeddingManager()
+        return self._get("embedding_manager", create)
+
+    @property
+    def vector_store(self):
+        def create():
+            from app.services.vector_store import create_vector_store
+            return create_vector_store()
+        return self._get("vector_store", create)
+
+    @property
+    def bedrock_llm(self):
+        def create():
+            from app.services.bedrockllm import BedrockLLM
+            return BedrockLLM()
+        return self._get("bedrock_llm", create)
+
+    @property
+    def bm25_index(self):
+        def create():
+            if not Config.HYBRID_SEARCH:
+                return None
+            from app.services.bm25_index import BM25Index
+            return BM25Index()
+        return self._get("bm25_index", create)
+
+    @property
+    def reranker(self):
+        def create():
+            if not Config.RERANK_ENABLED:
+                return None
+            from app.services.reranker import Reranker
+            return Reranker()
+        return self._get("reranker", create)
+
+    @property
+    def artifact_writer(self):
+        def create():
+            if not Config.ARTIFACTS_ENABLED:
+                return None
+            from app.services.artifact_store import ArtifactStore, ArtifactWriter
+            return ArtifactWriter(ArtifactStore(self.s3_manager), self.embedding_manager)
+        return self._get("artifact_writer", create)
+
+    @property
+    def document_registry(self):
+        def create():
+            from app.services.document_registry import DocumentRegistry
+            return DocumentRegistry()
+        return self._get("document_registry", create)
+
+    def warm_up(self, create_buckets: bool = True):
+        try:
+            if create_buckets:
+                self.s3_manager.create_buckets()
+            self.embedding_manager.load()
+            if self.reranker is not None:
+                self.reranker.load()
+            self.vector_store.warm_up()
+            self.ready = True
+        except Exception as e:
+            self.warm_up_error = str(e)
+            print(f"Error warming up services: {e}")
+
+    def warm_up_async(self, on_ready: Optional[Callable[[], None]] = None) -> threading.Thread:
+        def run():
+            self.warm_up()
+            if self.ready and on_ready is not None:
+                on_ready()
+
+        thread = threading.Thread(target=run, name="services-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict:
+        embedding_manager = self._services.get("embedding_manager")
+        vector_store = self._services.get("vector_store")
+        return {
+            "ready": self.ready,
+            "embedding_model": bool(embedding_manager is not None and embedding_manager.loaded),
+            "vector_store": bool(vector_store is not None and vector_store.ready),
+            "error": self.warm_up_error,
+        }
+
+
+_services: Optional[ServiceContainer] = None
+_services_lock = threading.Lock()
+
+
+def get_services() -> ServiceContainer:
+    #the process-wide container
+    global _services
+    with _services_lock:
+        if _services is None:
+            _services = ServiceContainer()
+        return _services
+
+
+_instance_lock = None
+
+
+def lock_instance(owner: str, path: str = Config.INSTANCE_LOCK_PATH):
+    #Takes INSTANCE_LOCK_PATH for the life of the process, or raises if another
+    #process holds it. Ingestion jobs, the answer cache and the local vector
+    #index live in one process, so the app runs as a single worker per data
+    #directory and the CLIs do not write a local index the app is serving.
+    global _instance_lock
+    if fcntl is None or _instance_lock is not None:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "a+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.seek(0)
+        holder = f.read().strip() or "another process"
+        f.close()
+        raise RuntimeError(
+            f"{path} is held by {holder}. Run the app as a single worker per data directory "
+            f"(INSTANCE_LOCK_PATH), and stop it before running the CLIs with VECTOR_BACKEND=local."
+        )
+    f.truncate(0)
+    f.write(f"{owner} (pid {os.getpid()})")
+    f.flush()
+    _instance_lock = f
@@ -1,8 +1,10 @@
-from dataclasses import dataclass, field
-from typing import Dict, Optional, Any
+from dataclasses import dataclass
+from typing import Optional, Any
 
 @dataclass
 class AppState:
     rag_system: Optional[Any] = None
     doc_processor: Optional[Any] = None
-    document_store: Dict[str, Dict] = field(default_factory = dict)
+    ingestion_queue: Optional[Any] = None
+    document_registry: Optional[Any] = None
+    services: Optional[Any] = None
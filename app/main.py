@@ -4,10 +4,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import Config
+from app.core.services import get_services, lock_instance
 from app.core.state import AppState
-from app.services.s3_manager import S3Manager
+from app.services.embedding_manager import load_model
 from app.services.rag_system import RAGSystem
 from app.services.document_processor import DocumentProcessor
+from app.services.ingestion_queue import IngestionQueue
 from app.api.routes import router as api_router
 from app.ui.routes import router as ui_router
 
@@ -44,6 +46,10 @@ def create_app() -> FastAPI:
     # State container
     app.state.app_state = AppState()
 
+    # Load the model before serving instead of in the background warm-up
+    if Config.PRELOAD_EMBEDDING_MODEL:
+        load_model()
+
     # Router inits
     app.include_router(ui_router)
     app.include_router(api_router)
@@ -52,15 +58,70 @@ def create_app() -> FastAPI:
     async def startup_event():
         print("Initializing RAG system...")
 
-        # Make buckets
-        s3 = S3Manager()
-        s3.create_buckets()
-
-        # Init RAG and doc processor
-        app.state.app_state.rag_system = RAGSystem()
-        app.state.app_state.doc_processor = DocumentProcessor()
-
-        print("RAG system initialized successfully!")
+        # Jobs, answer cache and local indexes are per process: one worker per data directory
+        lock_instance("app")
+
+        # One embedding manager, vector store and set of AWS clients per process
+        services = get_services()
+        app.state.app_state.services = services
+
+        # Durable document registry
+        registry = services.document_registry
+        app.state.app_state.document_registry = registry
+
+        # Init RAG and doc processor on the shared services
+        app.state.app_state.rag_system = RAGSystem(
+            embedding_manager=services.embedding_manager,
+            vector_store=services.vector_store,
+            bedrock_llm=services.bedrock_llm,
+            bm25_index=services.bm25_index,
+            reranker=services.reranker,
+        )
+        app.state.app_state.doc_processor = DocumentProcessor(
+            s3_manager=services.s3_manager,
+            embedding_manager=services.embedding_manager,
+            vector_store=services.vector_store,
+            bm25_index=services.bm25_index,
+            registry=registry,
+            artifacts=services.artifact_writer,
+        )
+
+        # Buckets, embedding model and vector store connection load in the
+        # background; /health/ready reports when they are done. An empty
+        # registry is then recovered from S3 and the vector store.
+        def on_ready():
+            if Config.REGISTRY_REBUILD:
+                registry.rebuild_async(services.s3_manager, services.vector_store)
+
+        services.warm_up_async(on_ready)
+
+        # Ingestion workers record finished documents in the registry
+        def on_ingested(result):
+            registry.put(result)
+            # Answers built on chunks a new version removed can no longer be served
+            if result.get("deleted_chunks"):
+                app.state.app_state.rag_system.invalidate_doc(result["doc_id"])
+
+        app.state.app_state.ingestion_queue = IngestionQueue(
+            app.state.app_state.doc_processor, on_complete=on_ingested
+        )
+        app.state.app_state.ingestion_queue.start()
+
+        print("RAG system initialized; loading models in the background")
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        if app.state.app_state.ingestion_queue is not None:
+            app.state.app_state.ingestion_queue.stop()
+        if app.state.app_state.rag_system is not None:
+            app.state.app_state.rag_system.close()
+            app.state.app_state.rag_system.bedrock_llm.close()
+            if app.state.app_state.rag_system.bm25_index is not None:
+                app.state.app_state.rag_system.bm25_index.save()
+        if app.state.app_state.doc_processor is not None and app.state.app_state.doc_processor.artifacts is not None:
+            app.state.app_state.doc_processor.artifacts.stop()
+        if app.state.app_state.document_registry is not None:
+            app.state.app_state.document_registry.close()
 
     return app
 
@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import numpy as np
+from app.core.config import Config
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    embedding: np.ndarray
+    chunk_ids: FrozenSet[str]
+    doc_ids: Set[str]
+    created_at: float
+    latency: float
+
+
+class AnswerCache:
+    #Caches generated answers for repeated and near-duplicate questions.
+    #Entries are grouped by the set of retrieved chunk ids, so an answer is
+    #only reused when the question is answered from the same context:
+    #  exact    - same normalized question text
+    #  semantic - cosine(query embedding) >= similarity threshold
+    #Entries expire after ttl seconds and are evicted least-recently-used.
+
+    def __init__(self, ttl: float = Config.ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = Config.ANSWER_CACHE_MAX_ENTRIES,
+                 similarity: float = Config.ANSWER_CACHE_SIMILARITY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, FrozenSet[str]], CachedAnswer]" = OrderedDict()
+        self._by_chunks: Dict[FrozenSet[str], Set[Tuple[str, FrozenSet[str]]]] = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        query = re.sub(r"\s+", " ", query.lower()).strip()
+        return query.strip(" ?!.")
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, query: str, query_embedding, chunk_ids: List[str]) -> Optional[Tuple[str, CachedAnswer]]:
+        #Returns ("exact" | "semantic", entry) or None
+        chunk_set = frozenset(chunk_ids)
+        key = (self.normalize(query), chunk_set)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.saved_seconds += entry.latency
+                return "exact", entry
+
+            best_key, best_score = None, self.similarity
+            query_vec = self._unit(query_embedding)
+            for candidate in list(self._by_chunks.get(chunk_set, ())):
+                cached = self._entries[candidate]
+                if self._expired(cached):
+                    self._remove(candidate)
+                    continue
+                score = float(np.dot(query_vec, cached.embedding))
+                if score >= best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                entry = self._entries[best_key]
+                self.semantic_hits += 1
+                self.saved_seconds += entry.latency
+                return "semantic", entry
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, query_embedding, retrieved_chunks: List[Dict], answer: str, latency: float):
+        chunk_set = frozenset(chunk["id"] for chunk in retrieved_chunks)
+        key = (self.normalize(query), chunk_set)
+        entry = CachedAnswer(
+            query=query,
+            answer=answer,
+            embedding=self._unit(query_embedding),
+            chunk_ids=chunk_set,
+            doc_ids={chunk["metadata"].get("doc_id") for chunk in retrieved_chunks},
+            created_at=time.monotonic(),
+            latency=latency,
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._by_chunks.setdefault(chunk_set, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_doc(self, doc_id: str) -> int:
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if doc_id in entry.doc_ids]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return time.monotonic() - entry.created_at > self.ttl
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        group = self._by_chunks.get(entry.chunk_ids)
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._by_chunks[entry.chunk_ids]
@@ -0,0 +1,444 @@
+import io
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from app.core.config import Config
+from app.core.metrics import Stage
+
+# Processed artifacts of every ingested document, kept in PROCESSED_BUCKET so the
+# vector store, keyword index and registry can be rebuilt without touching a PDF
+# (python -m app.cli.rebuild):
+#   {ARTIFACT_PREFIX}{doc_id}/text.txt        - the cleaned text, pages in order
+#   {ARTIFACT_PREFIX}{doc_id}/embeddings.npy  - float32 (chunks, dim), row i for chunk i
+#   {ARTIFACT_PREFIX}{doc_id}/manifest.jsonl  - a header line (the process_document
+#                                               result, embedding model id, dimension),
+#                                               then one line per chunk in document order
+# The manifest is written last: a document without one has no usable artifact.
+
+MANIFEST = "manifest.jsonl"
+EMBEDDINGS = "embeddings.npy"
+TEXT = "text.txt"
+#ArtifactSpool parts: chunk lines without the header, and the new embeddings
+#in arrival order without an .npy header
+SPOOLED_CHUNKS = "chunks.jsonl"
+SPOOLED_EMBEDDINGS = "embeddings.f32"
+#rows copied into embeddings.npy at a time
+COPY_ROWS = 4096
+
+
+class ArtifactStore:
+    def __init__(self, s3_manager, bucket: str = Config.PROCESSED_BUCKET, prefix: str = Config.ARTIFACT_PREFIX):
+        self.s3_manager = s3_manager
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def key(self, doc_id: str, name: str) -> str:
+        return f"{self.prefix}{doc_id}/{name}"
+
+    def write(self, doc_id: str, manifest_path: str, embeddings_path: str, text_path: Optional[str]):
+        #Streams the parts from local files, manifest last; text_path None keeps
+        #the stored text (a rewrite for a new embedding model)
+        parts = (
+            (EMBEDDINGS, embeddings_path, "application/octet-stream"),
+            (TEXT, text_path, "text/plain; charset=utf-8"),
+            (MANIFEST, manifest_path, "application/x-ndjson"),
+        )
+        for name, path, content_type in parts:
+            if path is not None:
+                with open(path, "rb") as f:
+                    self.s3_manager.upload_fileobj(self.bucket, self.key(doc_id, name), f, content_type)
+
+    def load(self, doc_id: str) -> Optional[Dict]:
+        #Returns {"header", "chunks", "embeddings"}, or None if the document has no manifest
+        try:
+            manifest = self.s3_manager.download_file(self.bucket, self.key(doc_id, MANIFEST))
+        except Exception as e:
+            if _missing(e):
+                return None
+            raise
+        lines = manifest.decode("utf-8").splitlines()
+        artifact = {
+            "header": json.loads(lines[0]),
+            "chunks": [json.loads(line) for line in lines[1:] if line],
+            "embeddings": np.load(
+                io.BytesIO(self.s3_manager.download_file(self.bucket, self.key(doc_id, EMBEDDINGS))), allow_pickle=False
+            ),
+        }
+        if len(artifact["embeddings"]) != len(artifact["chunks"]):
+            raise ValueError(f"artifact of {doc_id} has {len(artifact['chunks'])} chunks but "
+                             f"{len(artifact['embeddings'])} embeddings")
+        return artifact
+
+    def delete(self, doc_id: str):
+        #manifest first, so a half-deleted artifact is never loaded
+        for name in (MANIFEST, EMBEDDINGS, TEXT):
+            self.s3_manager.delete_object(self.bucket, self.key(doc_id, name))
+
+    def iter_doc_ids(self) -> Iterator[str]:
+        for page in self.s3_manager.iter_objects(self.bucket, self.prefix):
+            for obj in page:
+                doc_id, _, name = obj["Key"][len(self.prefix):].partition("/")
+                if name == MANIFEST:
+                    yield doc_id
+
+
+def _missing(error: Exception) -> bool:
+    #NoSuchKey / 404 client errors
+    response = getattr(error, "response", None) or {}
+    return response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound")
+
+
+class ArtifactSpool:
+    #One document's artifact parts, appended to files in a temporary directory
+    #under UPLOAD_DIR while ingestion produces them: cleaned pages as they are
+    #read, chunk lines as they are cut, new embeddings batch by batch. Nothing
+    #of the document is held in memory but the positions of chunks whose
+    #embedding was reused rather than spooled.
+
+    def __init__(self, directory: str = Config.UPLOAD_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = tempfile.mkdtemp(dir=directory, prefix="artifact-")
+        self.chunk_count = 0
+        self.dimension: Optional[int] = None
+        self.embedded_rows = 0
+        #chunk positions without a spooled embedding
+        self.reused: List[int] = []
+        self.has_text = False
+        self._chunks = open(self.part(SPOOLED_CHUNKS), "w", encoding="utf-8")
+        self._embeddings = open(self.part(SPOOLED_EMBEDDINGS), "wb")
+        self._text = None
+
+    def part(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def add_text(self, page: str):
+        if self._text is None:
+            self._text = open(self.part(TEXT), "w", encoding="utf-8")
+        elif self.has_text:
+            self._text.write("\n")
+        self._text.write(page)
+        self.has_text = True
+
+    def add_chunk(self, chunk: Dict, embedded: bool = True):
+        #embedded: its embedding will follow through add_embeddings, in chunk order
+        if not embedded:
+            self.reused.append(self.chunk_count)
+        self._chunks.write(json.dumps(chunk) + "\n")
+        self.chunk_count += 1
+
+    def add_embeddings(self, embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(np.atleast_2d(embeddings), dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = embeddings.shape[1]
+        self._embeddings.write(embeddings.tobytes())
+        self.embedded_rows += len(embeddings)
+
+    def close(self):
+        for f in (self._chunks, self._embeddings, self._text):
+            if f is not None:
+                f.close()
+
+    def size(self) -> int:
+        #bytes on disk
+        return sum(os.path.getsize(self.part(name)) for name in (SPOOLED_CHUNKS, SPOOLED_EMBEDDINGS, TEXT)
+                   if os.path.exists(self.part(name)))
+
+    def iter_chunks(self) -> Iterator[Dict]:
+        with open(self.part(SPOOLED_CHUNKS), "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def embeddings(self) -> Optional[np.ndarray]:
+        #the spooled rows, memory-mapped
+        if not self.embedded_rows:
+            return None
+        return np.memmap(self.part(SPOOLED_EMBEDDINGS), dtype=np.float32, mode="r",
+                         shape=(self.embedded_rows, self.dimension))
+
+    def discard(self):
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class ArtifactWriter:
+    #Write-behind persistence: ingestion spools a document's parts to disk while
+    #it runs (spool()), hands the spool over when the document is done and moves
+    #on; one background thread writes artifacts and deletions in order, so a
+    #document deleted or re-ingested meanwhile ends up as its last operation left
+    #it. Spools waiting to be written total at most ARTIFACT_QUEUE_MB on disk,
+    #then submit() waits. A failed write is logged and counted; the document
+    #stays ingested and is rebuilt from its PDF instead.
+    #
+    #Chunks whose embedding was reused rather than computed (unchanged text in a
+    #new version) take it from the previous artifact, or are embedded again.
+
+    def __init__(self, store: ArtifactStore, embedding_manager, queue_mb: int = Config.ARTIFACT_QUEUE_MB):
+        self.store = store
+        self.embedding_manager = embedding_manager
+        self.max_queued_bytes = max(1, queue_mb) * 1024 * 1024
+        self._queue: "queue.Queue" = queue.Queue()
+        self._queued_bytes = 0
+        self._space = threading.Condition()
+        self._lock = threading.Lock()
+        self.stats_counts = {"written": 0, "deleted": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._worker, name="artifact-writer", daemon=True)
+        self._thread.start()
+
+    def spool(self) -> ArtifactSpool:
+        return ArtifactSpool()
+
+    def submit(self, result: Dict, spool: ArtifactSpool):
+        #result is the process_document result; the writer owns the spool from here
+        spool.close()
+        size = spool.size()
+        with self._space:
+            #a spool larger than the whole budget still goes, alone
+            while self._queued_bytes and self._queued_bytes + size > self.max_queued_bytes:
+                self._space.wait()
+            self._queued_bytes += size
+        self._queue.put(("write", result, spool, size))
+
+    def delete(self, doc_id: str):
+        self._queue.put(("delete", doc_id))
+
+    def flush(self):
+        #waits until everything submitted so far is written
+        self._queue.join()
+
+    def stop(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats_counts, pending=self.pending(), queued_mb=round(self._queued_bytes / 1e6, 1))
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                if item[0] == "delete":
+                    self.store.delete(item[1])
+                    self._count("deleted")
+                else:
+                    with Stage("artifact_write"):
+                        self._write(item[1], item[2])
+                    self._count("written")
+            except Exception as e:
+                doc_id = item[1] if item[0] == "delete" else item[1]["doc_id"]
+                print(f"Error writing artifacts of doc_id {doc_id}: {e}")
+                self._count("failed")
+            finally:
+                if item is not None and item[0] == "write":
+                    item[2].discard()
+                    with self._space:
+                        self._queued_bytes -= item[3]
+                        self._space.notify_all()
+                self._queue.task_done()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.stats_counts[outcome] += 1
+
+    def _write(self, result: Dict, spool: ArtifactSpool):
+        doc_id = result["doc_id"]
+        model_id = self.embedding_manager.model_id
+        #embeddings of the reused chunks, by chunk position
+        filled: Dict[int, np.ndarray] = {}
+        if spool.reused:
+            positions = set(spool.reused)
+            reused = {i: chunk for i, chunk in enumerate(spool.iter_chunks()) if i in positions}
+            previous = self.store.load(doc_id)
+            if previous is not None and previous["header"].get("model") == model_id:
+                rows = {chunk["id"]: row for row, chunk in enumerate(previous["chunks"])}
+                for i, chunk in reused.items():
+                    if chunk["id"] in rows:
+                        filled[i] = previous["embeddings"][rows[chunk["id"]]]
+            missing = [i for i in reused if i not in filled]
+            if missing:
+                for i, vector in zip(missing, self.embedding_manager.embed_texts([reused[i]["text"] for i in missing])):
+                    filled[i] = vector
+
+        dimension = spool.dimension if spool.dimension is not None else len(next(iter(filled.values())))
+        embeddings = np.lib.format.open_memmap(
+            spool.part(EMBEDDINGS), mode="w+", dtype=np.float32, shape=(spool.chunk_count, dimension)
+        )
+        spooled = spool.embeddings()
+        if spooled is not None:
+            new_rows = np.setdiff1d(np.arange(spool.chunk_count), spool.reused)
+            for start in range(0, len(new_rows), COPY_ROWS):
+                embeddings[new_rows[start:start + COPY_ROWS]] = spooled[start:start + COPY_ROWS]
+            del spooled
+        for i, vector in filled.items():
+            embeddings[i] = vector
+        embeddings.flush()
+        del embeddings
+
+        #chunks were tagged with the doc type known when they were cut; store the final one
+        doc_type = result["metadata"].get("doc_type")
+        header = {
+            "doc_id": doc_id,
+            "result": {k: v for k, v in result.items() if k in ("doc_id", "filename", "metadata", "chunk_count", "content_hash")},
+            "model": model_id,
+            "dimension": int(dimension),
+            "chunk_count": spool.chunk_count,
+            "written_at": datetime.now().isoformat(),
+        }
+        manifest_path = spool.part(MANIFEST)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for chunk in spool.iter_chunks():
+                f.write(json.dumps(dict(chunk, doc_id=doc_id, doc_type=doc_type)) + "\n")
+        self.store.write(doc_id, manifest_path, spool.part(EMBEDDINGS), spool.part(TEXT) if spool.has_text else None)
+
+
+class ArtifactRebuilder:
+    #Repopulates the vector store, keyword index and registry from artifacts.
+    #Artifacts are downloaded io_workers at a time; chunks of several documents
+    #are written batch_size at a time. A document embedded with the current model
+    #id is written with its stored embeddings; any other (or every one, with
+    #reembed) is embedded again, and with a writer given its artifact is
+    #rewritten for the current model. Chunks a document no longer has are
+    #deleted, so every rebuilt document matches its artifact exactly.
+
+    def __init__(self, store: ArtifactStore, embedding_manager, vector_store, bm25_index=None, registry=None,
+                 writer: Optional[ArtifactWriter] = None, io_workers: int = Config.BULK_IO_WORKERS,
+                 batch_size: int = Config.BULK_EMBED_BATCH_SIZE, reembed: bool = False, progress_every: float = 5.0):
+        self.store = store
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.bm25_index = bm25_index
+        self.registry = registry
+        self.writer = writer
+        self.io_workers = max(1, io_workers)
+        self.batch_size = max(1, batch_size)
+        self.reembed = reembed
+        self.progress_every = progress_every
+        self.stats = {"documents": 0, "reembedded": 0, "missing": 0, "failed": 0, "chunks": 0, "embedded_chunks": 0}
+
+    def run(self, doc_ids: Optional[Iterable[str]] = None) -> Dict:
+        #Rebuilds the given documents, or every document with an artifact
+        self.start = self._last_progress = time.perf_counter()
+        self.buffer: List[tuple] = []
+        self.spools: Dict[str, ArtifactSpool] = {}
+        doc_ids = iter(doc_ids if doc_ids is not None else self.store.iter_doc_ids())
+        downloads: Dict[object, str] = {}
+        exhausted = False
+        try:
+            with ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="rebuild-io") as pool:
+                while True:
+                    while not exhausted and len(downloads) < self.io_workers * 2:
+                        doc_id = next(doc_ids, None)
+                        if doc_id is None:
+                            exhausted = True
+                        else:
+                            downloads[pool.submit(self.store.load, doc_id)] = doc_id
+                    if not downloads:
+                        break
+                    done, _ = wait(list(downloads), timeout=self.progress_every, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        doc_id = downloads.pop(future)
+                        try:
+                            artifact = future.result()
+                        except Exception as e:
+                            print(f"Failed loading artifacts of doc_id {doc_id}: {e}")
+                            self.stats["failed"] += 1
+                            continue
+                        if artifact is None:
+                            self.stats["missing"] += 1
+                            continue
+                        self._add(artifact, reuse=not self.reembed and artifact["header"].get("model") == self.embedding_manager.model_id)
+                    self._progress()
+                if self.buffer:
+                    self._write_batch(self.buffer)
+                    self.buffer = []
+        finally:
+            #spools of documents a failed run did not finish
+            for spool in self.spools.values():
+                spool.discard()
+        self._progress(final=True)
+        return dict(self.stats, seconds=time.perf_counter() - self.start)
+
+    def _add(self, artifact: Dict, reuse: bool):
+        doc = {
+            "header": artifact["header"],
+            "chunks": artifact["chunks"],
+            "remaining": len(artifact["chunks"]),
+            #the rewritten artifact of a re-embedded document, spooled as its batches are embedded
+            "spool": None,
+        }
+        if not reuse:
+            self.stats["reembedded"] += 1
+            if self.writer is not None:
+                doc["spool"] = self.spools[artifact["header"]["doc_id"]] = self.writer.spool()
+                for chunk in artifact["chunks"]:
+                    doc["spool"].add_chunk(chunk)
+        for i, chunk in enumerate(artifact["chunks"]):
+            self.buffer.append((doc, chunk, artifact["embeddings"][i] if reuse else None))
+        while len(self.buffer) >= self.batch_size:
+            batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[tuple]):
+        chunks = [chunk for _, chunk, _ in batch]
+        missing = [i for i, (_, _, vector) in enumerate(batch) if vector is None]
+        vectors = [vector for _, _, vector in batch]
+        if missing:
+            with Stage("embedding"):
+                fresh = self.embedding_manager.embed_texts([chunks[i]["text"] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                if batch[i][0]["spool"] is not None:
+                    batch[i][0]["spool"].add_embeddings(vector)
+            self.stats["embedded_chunks"] += len(missing)
+        with Stage("vector_upsert"):
+            self.vector_store.add_chunks(chunks, None, np.stack(vectors).astype(np.float32, copy=False))
+            if self.bm25_index is not None:
+                self.bm25_index.add_chunks(chunks, None)
+        self.stats["chunks"] += len(chunks)
+        for doc, _, _ in batch:
+            doc["remaining"] -= 1
+            if doc["remaining"] == 0:
+                self._finish(doc)
+
+    def _finish(self, doc: Dict):
+        header, chunks = doc["header"], doc["chunks"]
+        seen = {chunk["id"] for chunk in chunks}
+        stale = [chunk_id for chunk_id in self.vector_store.doc_chunks(header["doc_id"]) if chunk_id not in seen]
+        if stale:
+            self.vector_store.delete_chunks(stale)
+            if self.bm25_index is not None:
+                self.bm25_index.delete_chunks(stale)
+        if self.registry is not None:
+            self.registry.put(header["result"])
+        if doc["spool"] is not None:
+            self.writer.submit(header["result"], self.spools.pop(header["doc_id"]))
+        self.stats["documents"] += 1
+
+    def _progress(self, final: bool = False):
+        now = time.perf_counter()
+        if not final and now - self._last_progress < self.progress_every:
+            return
+        self._last_progress = now
+        elapsed = max(now - self.start, 1e-9)
+        stats = self.stats
+        print(
+            f"{'done' if final else 'progress'}: {stats['documents']} documents ({stats['reembedded']} re-embedded), "
+            f"{stats['missing']} missing, {stats['failed']} failed | {stats['documents'] / elapsed:.1f} docs/s, "
+            f"{stats['chunks'] / elapsed:.0f} chunks/s ({stats['embedded_chunks']} embedded) | {elapsed:.0f}s",
+            flush=True,
+        )
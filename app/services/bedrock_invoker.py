@@ -0,0 +1,208 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Dict, Iterator, Optional
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ConnectTimeoutError, ReadTimeoutError
+from app.core.config import Config
+from app.core.metrics import BEDROCK_CONCURRENCY_LIMIT, BEDROCK_HEDGES, BEDROCK_RETRIES, count
+
+# Bedrock calls go through one BedrockInvoker per client:
+#   limiter - AIMD: the number of calls in flight grows by about one per
+#             `limit` successful calls and is halved on throttling, so it settles
+#             just under the account's request rate instead of hammering it
+#   retries - throttling and connection errors are retried with exponential
+#             backoff and full jitter; after BEDROCK_MAX_RETRIES the error is raised
+#   hedging - with BEDROCK_HEDGE_AFTER_MS set, an invoke_model call still running
+#             after that long gets a second identical request if the limiter has
+#             room, and the first answer wins (streams are not hedged)
+
+THROTTLE_CODES = {
+    "throttlingexception", "toomanyrequestsexception", "serviceunavailableexception", "modelnotreadyexception",
+}
+
+
+class BedrockThrottledError(Exception):
+    #Bedrock was still throttling after all retries
+    pass
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    #"throttle", "connection" or None if the error is not worth retrying
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if code.lower() in THROTTLE_CODES or status in (429, 503):
+            return "throttle"
+        return None
+    if isinstance(error, (BotoConnectionError, ConnectTimeoutError, ReadTimeoutError)):
+        return "connection"
+    return None
+
+
+class AdaptiveLimiter:
+    #Additive-increase / multiplicative-decrease limit on calls in flight.
+    #A throttle only lowers the limit if its call started after the last
+    #decrease, so one burst of rejections counts as one signal.
+
+    def __init__(self, max_limit: int = Config.BEDROCK_CONCURRENCY, min_limit: int = Config.BEDROCK_MIN_CONCURRENCY,
+                 initial: Optional[float] = None, decrease: float = Config.BEDROCK_AIMD_DECREASE):
+        self.max_limit = max_limit
+        self.min_limit = max(1, min(min_limit, max_limit))
+        self.limit = float(initial if initial is not None else max_limit)
+        self.decrease = decrease
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        #blocks for a slot; returns the start time to pass back to release()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def try_acquire(self) -> Optional[float]:
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started: float, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                if started >= self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = time.monotonic()
+                    self.decreases += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            limit = self.limit
+            self._cond.notify_all()
+        if Config.METRICS_ENABLED:
+            BEDROCK_CONCURRENCY_LIMIT.set(int(limit))
+
+
+class BedrockInvoker:
+    def __init__(self, client, limiter: Optional[AdaptiveLimiter] = None, max_retries: int = Config.BEDROCK_MAX_RETRIES,
+                 backoff_base: float = Config.BEDROCK_BACKOFF_BASE, backoff_max: float = Config.BEDROCK_BACKOFF_MAX,
+                 hedge_after_ms: float = Config.BEDROCK_HEDGE_AFTER_MS):
+        self.client = client
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after_ms / 1000
+        #primary and hedge requests of up to max_limit calls
+        self._hedge_pool = ThreadPoolExecutor(
+            max_workers=2 * self.limiter.max_limit, thread_name_prefix="bedrock-hedge"
+        ) if self.hedge_after > 0 else None
+        self._lock = threading.Lock()
+        self.retries = {"throttle": 0, "connection": 0}
+        self.hedges = {"primary": 0, "hedge": 0}
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry(self, error: Exception, attempt: int, retryable: bool = True):
+        #sleeps before the next attempt, or raises if there is none
+        reason = retry_reason(error)
+        if reason is None or not retryable:
+            raise error
+        if attempt >= self.max_retries:
+            if reason == "throttle":
+                raise BedrockThrottledError(f"Bedrock throttled the request {attempt + 1} times: {error}") from error
+            raise error
+        with self._lock:
+            self.retries[reason] += 1
+        count(BEDROCK_RETRIES, reason)
+        time.sleep(self.backoff(attempt))
+
+    def invoke_model(self, **kwargs) -> Dict:
+        #Returns the parsed response body
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._hedge_pool is None:
+                    return self._call(kwargs)
+                return self._hedged_call(kwargs)
+            except Exception as e:
+                self._retry(e, attempt)
+
+    def _call(self, kwargs: Dict, started: Optional[float] = None) -> Dict:
+        #one request under a limiter slot (already held if started is given)
+        if started is None:
+            started = self.limiter.acquire()
+        throttled = False
+        try:
+            response = self.client.invoke_model(**kwargs)
+            return json.loads(response["body"].read())
+        except Exception as e:
+            throttled = retry_reason(e) == "throttle"
+            raise
+        finally:
+            self.limiter.release(started, throttled)
+
+    def _hedged_call(self, kwargs: Dict) -> Dict:
+        primary = self._hedge_pool.submit(self._call, kwargs)
+        try:
+            return primary.result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+        started = self.limiter.try_acquire()
+        if started is None:
+            return primary.result()
+        hedge = self._hedge_pool.submit(self._call, kwargs, started)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = "primary" if future is primary else "hedge"
+                    with self._lock:
+                        self.hedges[winner] += 1
+                    count(BEDROCK_HEDGES, winner)
+                    #the other request finishes in the background and frees its slot
+                    return future.result()
+        #both failed: the primary's error decides whether to retry
+        return primary.result()
+
+    def invoke_stream(self, **kwargs) -> Iterator[Dict]:
+        #Yields the parsed stream events. A failure before the first event is
+        #retried like invoke_model; after that it is raised, since part of the
+        #answer has already gone to the caller.
+        for attempt in range(self.max_retries + 1):
+            started = self.limiter.acquire()
+            throttled, streamed = False, False
+            try:
+                response = self.client.invoke_model_with_response_stream(**kwargs)
+                for event in response["body"]:
+                    chunk = event.get("chunk")
+                    if chunk:
+                        streamed = True
+                        yield json.loads(chunk["bytes"])
+                return
+            except Exception as e:
+                throttled = retry_reason(e) == "throttle"
+                error = e
+            finally:
+                self.limiter.release(started, throttled)
+            self._retry(error, attempt, retryable=not streamed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "concurrency_limit": int(self.limiter.limit),
+                "in_flight": self.limiter.in_flight,
+                "limit_decreases": self.limiter.decreases,
+                "retries": dict(self.retries),
+                "hedges_won": dict(self.hedges),
+            }
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
@@ -1,17 +1,42 @@
 import json
+from typing import Iterator
 import boto3
+from botocore.config import Config as BotoConfig
 from app.core.config import Config
+from app.core.metrics import BEDROCK_TOKENS, count
+from app.services.bedrock_invoker import BedrockInvoker
 
-class BedrockLLM:
-    def __init__(self):
-        self.client = boto3.client(
+def create_bedrock_client():
+    if Config.LLM_BACKEND == "stub":
+        from app.services.local_clients import StubBedrockClient
+        return StubBedrockClient(
+            Config.STUB_LLM_FIRST_TOKEN_LATENCY, Config.STUB_LLM_TOKEN_LATENCY, Config.STUB_LLM_TOKENS
+        )
+    if Config.LLM_BACKEND == "bedrock":
+        return boto3.client(
             'bedrock-runtime',
             region_name=Config.AWS_REGION,
             aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY
+            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+            #a connection per call in flight (hedges included); BedrockInvoker does the retrying
+            config=BotoConfig(
+                max_pool_connections=Config.BEDROCK_MAX_POOL_CONNECTIONS,
+                connect_timeout=Config.BEDROCK_CONNECT_TIMEOUT,
+                read_timeout=Config.BEDROCK_READ_TIMEOUT,
+                retries={"total_max_attempts": 1, "mode": "standard"},
+            ),
         )
+    raise ValueError(f"Unknown LLM_BACKEND '{Config.LLM_BACKEND}' (expected 'bedrock' or 'stub')")
 
-    def generate_response(self, query, context) -> str:
+
+class BedrockLLM:
+    def __init__(self, client=None, invoker=None):
+        self.client = client or create_bedrock_client()
+        #pooled, rate-adaptive calls with retries; errors are raised to the caller
+        self.invoker = invoker or BedrockInvoker(self.client)
+
+    @staticmethod
+    def build_request_body(query, context) -> dict:
         prompt = f"""You are a AI assistant helping a user understand EULA (End User License Agreement) and ToS (Terms of Service) Documents.
         Use ONLY the following excerpts from legal documents, provide a clear, accurate, and helpful answer to the user's question. If the answer is not in the provided excerpts, simply state "I don't know": 
         
@@ -30,19 +55,48 @@ class BedrockLLM:
         Answer:
         """
 
-        request_body = {
+        return {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": 2000,
             "temperature": 0.7,
             "messages": [{"role": "user", "content": prompt}],
         }
 
-        try:
-            response = self.client.invoke_model(
-                modelId=Config.BEDROCK_MODEL_ID,
-                body=json.dumps(request_body),
-            )
-            response_body = json.loads(response["body"].read())
-            return response_body["content"][0]["text"]
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
+    def generate_response(self, query, context) -> str:
+        request_body = self.build_request_body(query, context)
+
+        response_body = self.invoker.invoke_model(
+            modelId=Config.BEDROCK_MODEL_ID,
+            body=json.dumps(request_body),
+        )
+        self._count_usage(response_body.get("usage"))
+        return response_body["content"][0]["text"]
+
+    def stream_response(self, query, context) -> Iterator[str]:
+        #Yields answer text deltas as Bedrock produces them
+        request_body = self.build_request_body(query, context)
+
+        for payload in self.invoker.invoke_stream(
+            modelId=Config.BEDROCK_MODEL_ID,
+            body=json.dumps(request_body),
+        ):
+            if payload.get("type") == "content_block_delta":
+                delta = payload.get("delta", {})
+                if delta.get("type") == "text_delta":
+                    yield delta["text"]
+            elif payload.get("type") == "message_start":
+                #input tokens arrive first; the closing message_delta has the output total
+                usage = payload.get("message", {}).get("usage", {})
+                count(BEDROCK_TOKENS, "input", amount=usage.get("input_tokens", 0))
+            elif payload.get("type") == "message_delta":
+                count(BEDROCK_TOKENS, "output", amount=payload.get("usage", {}).get("output_tokens", 0))
+
+    @staticmethod
+    def _count_usage(usage):
+        if not usage:
+            return
+        count(BEDROCK_TOKENS, "input", amount=usage.get("input_tokens", 0))
+        count(BEDROCK_TOKENS, "output", amount=usage.get("output_tokens", 0))
+
+    def close(self):
+        self.invoker.close()
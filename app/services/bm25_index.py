@@ -0,0 +1,390 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.core.config import Config
+from app.services.vector_store import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: the log is then appended without a lock
+    fcntl = None
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+# dropped at index and query time; they carry no signal for clause lookup
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    #lowercased words and numbers; dotted references like "12.3" stay one token
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    #In-process inverted index for keyword (BM25) retrieval over chunk text.
+    #
+    #Postings are integer arrays: a compacted CSR snapshot (offsets / rows /
+    #term frequencies as NumPy arrays) plus per-term array("i") buffers for
+    #rows added since the last snapshot. Deletes are tombstones; rows keep
+    #their numbers for the life of the log.
+    #
+    #  chunks.jsonl  - {"op": "add", "id", "doc_id", "text"} per row and
+    #                  {"op": "delete", "ids": [...]} for tombstones
+    #  postings.npz  - snapshot of the postings for the first n_rows rows,
+    #                  so startup only re-tokenizes rows added after it
+    #
+    #Several processes (the app and the ingest CLI) can share one index. A row
+    #is the position of its add in the log, in every process: appends hold an
+    #exclusive lock on the log and first apply what others appended, and
+    #searches apply new records before scoring. Re-adding an id replaces its row.
+
+    def __init__(self, path: str = Config.BM25_INDEX_DIR, k1: float = Config.BM25_K1, b: float = Config.BM25_B,
+                 flush_postings: int = Config.BM25_FLUSH_POSTINGS):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.flush_postings = flush_postings
+        os.makedirs(path, exist_ok=True)
+        self.log_path = os.path.join(path, "chunks.jsonl")
+        self.snapshot_path = os.path.join(path, "postings.npz")
+
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.vocab: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.doc_rows: Dict[str, Set[int]] = {}
+        self.row_docs: List[str] = []
+        self.doc_len = array("i")
+        self.alive = bytearray()
+        self.live_docs = 0
+        self.live_tokens = 0
+        #bytes of the log applied so far
+        self._log_size = 0
+
+        #snapshot postings: rows of term t are base_rows[base_offsets[t]:base_offsets[t + 1]]
+        self.base_offsets = np.zeros(1, dtype=np.int64)
+        self.base_rows = np.zeros(0, dtype=np.int32)
+        self.base_tfs = np.zeros(0, dtype=np.uint16)
+        self.snapshot_rows = 0
+        #postings added since the snapshot: term id -> (rows, tfs)
+        self.delta: Dict[int, Tuple[array, array]] = {}
+        self.delta_postings = 0
+
+    # --- persistence -------------------------------------------------------
+
+    def _load(self, use_snapshot: bool = True):
+        snapshot = self._read_snapshot() if use_snapshot else None
+        pending: List[Tuple[int, str]] = []
+
+        for record in self._read_log():
+            row = self._replay(record)
+            if row is not None and (snapshot is None or row >= snapshot["n_rows"]):
+                pending.append((row, record["text"]))
+
+        if snapshot is not None and snapshot["n_rows"] <= len(self.ids):
+            self.vocab = {term: i for i, term in enumerate(snapshot["terms"])}
+            self.base_offsets = snapshot["offsets"]
+            self.base_rows = snapshot["rows"]
+            self.base_tfs = snapshot["tfs"]
+            self.snapshot_rows = snapshot["n_rows"]
+            self.doc_len[:self.snapshot_rows] = array("i", snapshot["doc_len"].tolist())
+        elif snapshot is not None:
+            #log is behind the snapshot (e.g. restored from an older copy): rebuild from the log
+            print("BM25 snapshot does not match chunks.jsonl; rebuilding from the log")
+            self._reset()
+            return self._load(use_snapshot=False)
+
+        for row, text in pending:
+            self._index_text(row, text)
+
+        self._recount()
+        print(f"BM25 index loaded: {self.live_docs} chunks, {len(self.vocab)} terms")
+
+    def _read_snapshot(self) -> Optional[Dict]:
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with np.load(self.snapshot_path, allow_pickle=False) as data:
+            terms_blob = data["terms"].tobytes().decode("utf-8")
+            return {
+                "terms": terms_blob.split("\n") if terms_blob else [],
+                "offsets": data["offsets"],
+                "rows": data["rows"],
+                "tfs": data["tfs"],
+                "doc_len": data["doc_len"],
+                "n_rows": int(data["n_rows"]),
+            }
+
+    def save(self):
+        #Compacts the delta buffers into the snapshot and writes it atomically
+        with self._lock:
+            if not self.delta and self.snapshot_rows == len(self.ids):
+                return
+            offsets, rows, tfs = [0], [], []
+            for term_id in range(len(self.vocab)):
+                base_rows, base_tfs = self._base_postings(term_id)
+                rows.append(base_rows)
+                tfs.append(base_tfs)
+                extra = self.delta.get(term_id)
+                if extra is not None:
+                    rows.append(np.frombuffer(extra[0], dtype=np.int32))
+                    tfs.append(np.frombuffer(extra[1], dtype=np.uint16))
+                    offsets.append(offsets[-1] + len(base_rows) + len(extra[0]))
+                else:
+                    offsets.append(offsets[-1] + len(base_rows))
+
+            self.base_offsets = np.array(offsets, dtype=np.int64)
+            self.base_rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+            self.base_tfs = np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.uint16)
+            self.snapshot_rows = len(self.ids)
+            self.delta = {}
+            self.delta_postings = 0
+
+            terms = sorted(self.vocab, key=self.vocab.get)
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                    offsets=self.base_offsets,
+                    rows=self.base_rows,
+                    tfs=self.base_tfs,
+                    doc_len=np.frombuffer(self.doc_len, dtype=np.int32).copy(),
+                    n_rows=np.array(self.snapshot_rows),
+                )
+            os.replace(tmp_path, self.snapshot_path)
+
+    def _read_log(self) -> List[Dict]:
+        #records appended since the last read; a line still being written is left for later
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_size)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._log_size += end
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+    def _catch_up(self):
+        #applies what other processes appended to the log since this one last read it
+        size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if size == self._log_size:
+            return
+        if size < self._log_size:
+            print("BM25 log is shorter than the part already loaded; reloading the index")
+            self._reset()
+            self._load()
+            return
+        for record in self._read_log():
+            row = self._replay(record)
+            if row is not None:
+                self._index_text(row, record["text"])
+                self.live_docs += 1
+                self.live_tokens += self.doc_len[row]
+
+    @contextmanager
+    def _log_writer(self):
+        #exclusive append to the log, after catching up with it
+        with open(self.log_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                yield f
+                f.flush()
+                self._log_size = f.tell()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_records(f, records: List[Dict]):
+        f.write("".join(json.dumps(record) + "\n" for record in records).encode("utf-8"))
+
+    def _replay(self, record: Dict) -> Optional[int]:
+        #applies one log record to the row tables; returns the new row of an add
+        if record["op"] == "add":
+            old = self.id_to_row.get(record["id"])
+            if old is not None:
+                self._kill_row(old)
+            return self._index_row(record["id"], record["doc_id"])
+        if "ids" in record:
+            for chunk_id in record["ids"]:
+                row = self.id_to_row.get(chunk_id)
+                if row is not None:
+                    self._kill_row(row)
+        else:
+            #row numbers, as tombstones were written before they recorded ids
+            for row in record["rows"]:
+                self._kill_row(row)
+        return None
+
+    # --- indexing ------------------------------------------------------------
+
+    def _index_row(self, chunk_id: str, doc_id: str) -> int:
+        row = len(self.ids)
+        self.ids.append(chunk_id)
+        self.id_to_row[chunk_id] = row
+        self.doc_rows.setdefault(doc_id, set()).add(row)
+        self.row_docs.append(doc_id)
+        self.doc_len.append(0)
+        self.alive.append(1)
+        return row
+
+    def _unindex_row(self, row: int):
+        chunk_id = self.ids[row]
+        if self.id_to_row.get(chunk_id) == row:
+            del self.id_to_row[chunk_id]
+        rows = self.doc_rows.get(self.row_docs[row])
+        if rows is not None:
+            rows.discard(row)
+
+    def _kill_row(self, row: int):
+        if self.alive[row]:
+            self.alive[row] = 0
+            self.live_docs -= 1
+            self.live_tokens -= self.doc_len[row]
+        self._unindex_row(row)
+
+    def _index_text(self, row: int, text: str):
+        counts = Counter(tokenize(text))
+        self.doc_len[row] = sum(counts.values())
+        for term, tf in counts.items():
+            term_id = self.vocab.setdefault(term, len(self.vocab))
+            postings = self.delta.get(term_id)
+            if postings is None:
+                postings = self.delta[term_id] = (array("i"), array("H"))
+            postings[0].append(row)
+            postings[1].append(min(tf, 65535))
+        self.delta_postings += len(counts)
+
+    def _recount(self):
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        self.live_docs = int(alive.sum())
+        self.live_tokens = int(np.frombuffer(self.doc_len, dtype=np.int32)[alive].sum())
+
+    def add_chunks(self, chunks: List[Dict], doc_id: str, start: int = 0):
+        #Indexes chunks under the same ids the vector store uses; re-adding an id replaces it.
+        #As in VectorStore.add_chunks, a chunk's own "doc_id" overrides doc_id.
+        if not chunks:
+            return
+        ids = VectorStore.chunk_ids(chunks, doc_id, start)
+
+        with self._lock, self._log_writer() as log:
+            records = []
+            for chunk_id, chunk in zip(ids, chunks):
+                record = {"op": "add", "id": chunk_id, "doc_id": chunk.get("doc_id", doc_id), "text": chunk["text"]}
+                row = self._replay(record)
+                self._index_text(row, chunk["text"])
+                self.live_docs += 1
+                self.live_tokens += self.doc_len[row]
+                records.append(record)
+            self._write_records(log, records)
+
+            if self.delta_postings >= self.flush_postings:
+                self.save()
+
+    def delete_by_doc_id(self, doc_id: str):
+        with self._lock, self._log_writer() as log:
+            self._delete_ids(log, [self.ids[row] for row in sorted(self.doc_rows.get(doc_id, ()))])
+            self.doc_rows.pop(doc_id, None)
+
+    def delete_chunks(self, ids: List[str]):
+        with self._lock, self._log_writer() as log:
+            self._delete_ids(log, [i for i in ids if i in self.id_to_row])
+
+    def _delete_ids(self, log, ids: List[str]):
+        if not ids:
+            return
+        self._replay({"op": "delete", "ids": ids})
+        self._write_records(log, [{"op": "delete", "ids": ids}])
+
+    # --- search --------------------------------------------------------------
+
+    def _base_postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if term_id + 1 >= len(self.base_offsets):
+            return self.base_rows[:0], self.base_tfs[:0]
+        lo, hi = self.base_offsets[term_id], self.base_offsets[term_id + 1]
+        return self.base_rows[lo:hi], self.base_tfs[lo:hi]
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows, tfs = self._base_postings(term_id)
+        extra = self.delta.get(term_id)
+        if extra is not None:
+            #copy: the buffers may grow while the result is in use
+            rows = np.concatenate([rows, np.array(extra[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.array(extra[1], dtype=np.uint16)])
+        return rows, tfs
+
+    def search(self, query: str, n_results: int = 5, doc_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        #Returns [(chunk_id, bm25 score)] best first, optionally within some documents.
+        #Statistics (idf, average length) stay corpus-wide either way.
+        with self._lock:
+            self._catch_up()
+            term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+            if not term_ids or not self.live_docs or n_results <= 0:
+                return []
+            alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+            if doc_ids:
+                scope = np.zeros(len(alive), dtype=bool)
+                for doc_id in doc_ids:
+                    scope[list(self.doc_rows.get(doc_id, ()))] = True
+            doc_len = np.frombuffer(self.doc_len, dtype=np.int32).astype(np.float32)
+            n_docs, avgdl = self.live_docs, max(self.live_tokens / self.live_docs, 1.0)
+            postings = [self._postings(t) for t in term_ids]
+            ids = self.ids
+
+        scores = np.zeros(len(alive), dtype=np.float32)
+        for rows, tfs in postings:
+            live = alive[rows]
+            rows, tfs = rows[live], tfs[live].astype(np.float32)
+            df = len(rows)
+            if df == 0:
+                continue
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            if doc_ids:
+                in_scope = scope[rows]
+                rows, tfs = rows[in_scope], tfs[in_scope]
+            norm = self.k1 * (1.0 - self.b + self.b * doc_len[rows] / avgdl)
+            scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > n_results:
+            hits = hits[np.argpartition(-scores[hits], n_results - 1)[:n_results]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(ids[r], float(scores[r])) for r in hits]
+
+    def count(self) -> int:
+        with self._lock:
+            self._catch_up()
+            return self.live_docs
+
+    def stats(self) -> Dict:
+        return {
+            "chunks": self.live_docs,
+            "terms": len(self.vocab),
+            "snapshot_postings": int(len(self.base_rows)),
+            "pending_postings": self.delta_postings,
+        }
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = Config.RRF_K) -> List[Tuple[str, float]]:
+    #Fuses ranked id lists: score(id) = sum over lists of 1 / (k + rank), rank from 1
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,372 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.config import Config
+from app.core.metrics import CHUNKS, DOCUMENTS, Stage, count
+from app.services.chunking import SemanticChunker
+from app.services.pdf_processor import MetadataAccumulator, PDFProcessor
+from app.services.vector_store import VectorStore
+
+# Bulk ingestion of many PDFs (python -m app.cli.ingest), tuned for throughput
+# rather than per-document latency:
+#   io pool      - BULK_IO_WORKERS threads download PDFs and upload them to RAW_BUCKET
+#   process pool - BULK_WORKERS processes extract, clean and chunk whole documents
+#   main thread  - gathers chunks from all documents into BULK_EMBED_BATCH_SIZE
+#                  batches; each batch is embedded in one call and written with one
+#                  vector store upsert (behind the next batch's embedding)
+# Documents are identified and deduplicated as in DocumentProcessor (doc_id =
+# md5 of the key, content hash registry lookup, content-addressed chunk ids),
+# so bulk and /upload ingestion can be mixed. Only bytes already ingested under
+# the same key are skipped; under another key they are ingested as a document
+# of their own, with duplicate_of set, and replacements of an unrelated file
+# under a stored key are reported (or refused) as in DocumentProcessor. A finished document is appended
+# to the checkpoint file, and a rerun skips every key already done at the
+# same version (size and modification time). With an artifact writer, each
+# document's cleaned text and chunks are spooled to disk when it is queued and
+# its embeddings batch by batch, and the spool is written behind when it finishes.
+
+Item = Tuple[str, str]  # (key, version)
+
+
+def iter_s3_items(s3_manager, bucket: str, prefix: str = "") -> Iterator[Item]:
+    for page in s3_manager.iter_objects(bucket, prefix):
+        for obj in page:
+            if obj["Key"].lower().endswith(".pdf"):
+                modified = obj.get("LastModified")
+                yield obj["Key"], f"{obj.get('Size')}:{modified.isoformat() if hasattr(modified, 'isoformat') else modified}"
+
+
+def iter_dir_items(root: str) -> Iterator[Item]:
+    #keys are paths relative to root, with forward slashes
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".pdf"):
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _init_worker():
+    #a document per worker process; no nested page-level pool
+    Config.PDF_WORKERS = 1
+
+
+def prepare_document(pdf_bytes: bytes, filename: str) -> Dict:
+    #Runs in a pool worker: extraction, cleaning, metadata and chunking of one
+    #PDF, with the same chunk ids and metadata DocumentProcessor would give it
+    processor = PDFProcessor()
+    metadata = MetadataAccumulator(filename)
+    doc_id = hashlib.md5(filename.encode()).hexdigest()
+    pages: List[str] = []
+
+    def lines():
+        for page in processor.iter_pages(pdf_bytes):
+            clean_page = processor.clean_text(page)
+            metadata.update(clean_page)
+            pages.append(clean_page)
+            yield from clean_page.split("\n")
+
+    chunks: List[Dict] = []
+    occurrences: Dict[str, int] = {}
+    for chunk in SemanticChunker().iter_chunks(lines(), Config.CHUNK_SIZE, Config.CHUNK_OVERLAP):
+        chunk["filename"] = filename
+        base_id = VectorStore.content_chunk_id(doc_id, chunk)
+        occurrence = occurrences.get(base_id, 0)
+        occurrences[base_id] = occurrence + 1
+        chunk["id"] = VectorStore.content_chunk_id(doc_id, chunk, occurrence)
+        chunk["doc_id"] = doc_id
+        chunks.append(chunk)
+    if not chunks:
+        raise ValueError("No extractable text found")
+
+    for chunk in chunks:
+        chunk["doc_type"] = metadata.doc_type
+    return {"doc_id": doc_id, "filename": filename, "metadata": metadata.result(), "chunks": chunks, "text": "\n".join(pages)}
+
+
+class Checkpoint:
+    #Append-only JSON lines, one per finished key:
+    #  {"key", "version", "status": "ingested" | "duplicate" | "failed", ...}
+    #The last line for a key wins; failed keys are retried on the next run.
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    self.entries[entry["key"]] = entry
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def is_done(self, key: str, version: str) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry["version"] == version and entry["status"] != "failed"
+
+    def record(self, key: str, version: str, status: str, **fields):
+        entry = dict(key=key, version=version, status=status, **fields)
+        with self._lock:
+            self.entries[key] = entry
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BulkIngester:
+    def __init__(self, embedding_manager, vector_store, s3_manager=None, bm25_index=None, registry=None,
+                 checkpoint: Optional[Checkpoint] = None, workers: int = Config.BULK_WORKERS,
+                 io_workers: int = Config.BULK_IO_WORKERS, batch_size: int = Config.BULK_EMBED_BATCH_SIZE,
+                 progress_every: float = 5.0, artifacts=None):
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.s3_manager = s3_manager
+        self.bm25_index = bm25_index
+        self.registry = registry
+        self.checkpoint = checkpoint
+        self.workers = max(1, workers)
+        self.io_workers = max(1, io_workers)
+        self.batch_size = max(1, batch_size)
+        self.progress_every = progress_every
+        self.artifacts = artifacts
+
+        self.docs: Dict[str, Dict] = {}
+        self.buffer: List[Dict] = []
+        self.stats = {"ingested": 0, "duplicate": 0, "failed": 0, "skipped": 0, "chunks": 0, "embedded_chunks": 0}
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable[Item], fetch: Callable[[str], bytes], upload: bool = False) -> Dict:
+        #Ingests every (key, version) from items; fetch(key) returns the PDF bytes.
+        #upload also stores each ingested PDF in RAW_BUCKET under its key.
+        self.upload = upload
+        self.start = time.perf_counter()
+        self._last_progress = self.start
+        self.io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="bulk-io")
+        self.upsert_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-upsert")
+        self.pending: Optional[Tuple[object, List[Dict]]] = None
+        process_pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+        )
+
+        #documents downloading or in the process pool, at most two per worker
+        window = self.workers * 2
+        downloads: Dict[object, Item] = {}
+        extracts: Dict[object, Tuple[str, str, str, Optional[bytes], Optional[str]]] = {}
+        items = iter(items)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(downloads) + len(extracts) < window:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                    elif self.checkpoint is not None and self.checkpoint.is_done(*item):
+                        self.stats["skipped"] += 1
+                    else:
+                        downloads[self.io_pool.submit(fetch, item[0])] = item
+                if not downloads and not extracts:
+                    break
+
+                done, _ = wait(list(downloads) + list(extracts), timeout=self.progress_every, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in downloads:
+                        key, version = downloads.pop(future)
+                        try:
+                            pdf_bytes = future.result()
+                        except Exception as e:
+                            self._failed(key, version, f"download: {e}")
+                            continue
+                        content_hash = hashlib.sha256(pdf_bytes).hexdigest()
+                        doc_id = hashlib.md5(key.encode()).hexdigest()
+                        duplicate = self.registry.find_by_hash(content_hash, doc_id) if self.registry is not None else None
+                        if duplicate is not None and duplicate["doc_id"] == doc_id:
+                            self._record(key, version, "duplicate", doc_id=doc_id)
+                            continue
+                        task = process_pool.submit(prepare_document, pdf_bytes, key)
+                        extracts[task] = (key, version, content_hash, pdf_bytes if upload else None,
+                                          duplicate["doc_id"] if duplicate is not None else None)
+                    else:
+                        key, version, content_hash, pdf_bytes, duplicate_of = extracts.pop(future)
+                        try:
+                            doc = future.result()
+                        except Exception as e:
+                            self._failed(key, version, str(e))
+                            continue
+                        doc.update(key=key, version=version, content_hash=content_hash, pdf_bytes=pdf_bytes,
+                                   duplicate_of=duplicate_of)
+                        self._add(doc)
+                self._progress()
+
+            #the last partial batch, then every upload
+            if self.buffer:
+                self._write_batch(self.buffer)
+                self.buffer = []
+            self._wait_upsert()
+            self.io_pool.shutdown(wait=True)
+        finally:
+            #spools of documents a failed run did not finish
+            for doc in self.docs.values():
+                if doc["spool"] is not None:
+                    doc["spool"].discard()
+            process_pool.shutdown(wait=False, cancel_futures=True)
+            self.io_pool.shutdown(wait=False, cancel_futures=True)
+            self.upsert_pool.shutdown(wait=True)
+        self._progress(final=True)
+        return dict(self.stats, seconds=time.perf_counter() - self.start)
+
+    def _add(self, doc: Dict):
+        #queues a prepared document's new chunks for embedding
+        stored = self.vector_store.doc_chunks(doc["doc_id"])
+        new = [chunk for chunk in doc["chunks"] if chunk["id"] not in stored]
+        doc.update(stored=stored, remaining=len(new), embedded=len(new), spool=None)
+        text = doc.pop("text")
+        if self.artifacts is not None:
+            doc["spool"] = self.artifacts.spool()
+            doc["spool"].add_text(text)
+            for chunk in doc["chunks"]:
+                doc["spool"].add_chunk(chunk, embedded=chunk["id"] not in stored)
+        self.docs[doc["doc_id"]] = doc
+        if not new:
+            self._finish(doc)
+            return
+        self.buffer.extend(new)
+        while len(self.buffer) >= self.batch_size:
+            batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict]):
+        with Stage("embedding"):
+            embeddings = self.embedding_manager.embed_texts([chunk["text"] for chunk in batch])
+        if self.artifacts is not None:
+            for chunk, vector in zip(batch, embeddings):
+                self.docs[chunk["doc_id"]]["spool"].add_embeddings(vector)
+        self._wait_upsert()
+        self.pending = (self.upsert_pool.submit(self._upsert, batch, embeddings), batch)
+
+    def _upsert(self, batch: List[Dict], embeddings):
+        with Stage("vector_upsert"):
+            self.vector_store.add_chunks(batch, None, embeddings)
+            if self.bm25_index is not None:
+                self.bm25_index.add_chunks(batch, None)
+
+    def _wait_upsert(self):
+        #an upsert error stops the run; the checkpoint lets it resume from there
+        if self.pending is None:
+            return
+        future, batch = self.pending
+        self.pending = None
+        future.result()
+        for chunk in batch:
+            doc = self.docs[chunk["doc_id"]]
+            doc["remaining"] -= 1
+            if doc["remaining"] == 0:
+                self._finish(doc)
+
+    def _finish(self, doc: Dict):
+        #every chunk is stored: retire what an older version had, then upload and record
+        del self.docs[doc["doc_id"]]
+        stored, chunks = doc.pop("stored"), doc.pop("chunks")
+        seen = {chunk["id"] for chunk in chunks}
+        kept = sum(1 for chunk_id in stored if chunk_id in seen)
+        replaced = bool(stored) and kept < Config.INGEST_REPLACE_MIN_REUSED * len(stored)
+        if replaced and not Config.INGEST_ALLOW_REPLACE:
+            #leave the stored document as it was
+            added = [chunk["id"] for chunk in chunks if chunk["id"] not in stored]
+            self.vector_store.delete_chunks(added)
+            if self.bm25_index is not None:
+                self.bm25_index.delete_chunks(added)
+            if doc["spool"] is not None:
+                doc["spool"].discard()
+            self._failed(doc["key"], doc["version"], f"shares {kept} of {len(stored)} chunks with the stored document "
+                         f"of that name; delete it first to replace it (INGEST_ALLOW_REPLACE=false)")
+            return
+        if replaced:
+            print(f"'{doc['key']}' replaces a different stored document of that name ({kept} of {len(stored)} chunks kept)")
+        updates = [
+            (chunk["id"], metadata)
+            for chunk, metadata in zip(chunks, VectorStore.chunk_metadatas(chunks, doc["doc_id"]))
+            if chunk["id"] in stored and stored[chunk["id"]] != metadata
+        ]
+        if updates:
+            self.vector_store.update_metadatas([u[0] for u in updates], [u[1] for u in updates])
+        stale = [chunk_id for chunk_id in stored if chunk_id not in seen]
+        if stale:
+            self.vector_store.delete_chunks(stale)
+            if self.bm25_index is not None:
+                self.bm25_index.delete_chunks(stale)
+
+        result = {
+            "doc_id": doc["doc_id"],
+            "filename": doc["filename"],
+            "metadata": doc["metadata"],
+            "chunk_count": len(chunks),
+            "content_hash": doc["content_hash"],
+            "duplicate_of": doc["duplicate_of"],
+            "deduplicated": False,
+            "replaced": replaced,
+            "reused_chunks": len(chunks) - doc["embedded"],
+            "embedded_chunks": doc["embedded"],
+            "deleted_chunks": len(stale),
+        }
+        if doc["spool"] is not None:
+            self.artifacts.submit(result, doc.pop("spool"))
+        self.io_pool.submit(self._store, doc["key"], doc["version"], doc.pop("pdf_bytes"), result)
+
+    def _store(self, key: str, version: str, pdf_bytes: Optional[bytes], result: Dict):
+        try:
+            if pdf_bytes is not None:
+                with Stage("s3_upload"):
+                    self.s3_manager.upload_fileobj(Config.RAW_BUCKET, key, io.BytesIO(pdf_bytes), "application/pdf")
+            if self.registry is not None:
+                self.registry.put(result)
+        except Exception as e:
+            self._failed(key, version, f"store: {e}")
+            return
+        count(CHUNKS, "embedded", amount=result["embedded_chunks"])
+        count(CHUNKS, "reused", amount=result["reused_chunks"])
+        count(CHUNKS, "deleted", amount=result["deleted_chunks"])
+        with self._lock:
+            self.stats["chunks"] += result["chunk_count"]
+            self.stats["embedded_chunks"] += result["embedded_chunks"]
+        self._record(key, version, "ingested", doc_id=result["doc_id"], chunks=result["chunk_count"])
+
+    def _record(self, key: str, version: str, status: str, **fields):
+        count(DOCUMENTS, "deduplicated" if status == "duplicate" else status)
+        with self._lock:
+            self.stats[status] += 1
+        if self.checkpoint is not None:
+            self.checkpoint.record(key, version, status, **fields)
+
+    def _failed(self, key: str, version: str, error: str):
+        print(f"Failed ingesting '{key}': {error}")
+        self._record(key, version, "failed", error=error)
+
+    def _progress(self, final: bool = False):
+        now = time.perf_counter()
+        if not final and now - self._last_progress < self.progress_every:
+            return
+        self._last_progress = now
+        elapsed = max(now - self.start, 1e-9)
+        with self._lock:
+            stats = dict(self.stats)
+        finished = stats["ingested"] + stats["duplicate"]
+        print(
+            f"{'done' if final else 'progress'}: {stats['ingested']} ingested, {stats['duplicate']} duplicate, "
+            f"{stats['failed']} failed, {stats['skipped']} already done | {finished / elapsed:.1f} docs/s, "
+            f"{stats['chunks'] / elapsed:.0f} chunks/s ({stats['embedded_chunks']} embedded) | {elapsed:.0f}s",
+            flush=True,
+        )
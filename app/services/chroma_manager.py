@@ -1,9 +1,34 @@
-from typing import Dict, List
-import chromadb
+import threading
+from typing import Dict, Iterator, List, Optional
+import numpy as np
 from app.core.config import Config
+from app.services.vector_store import QueryFilter, VectorStore
 
-class ChromaDBManager:
+class ChromaDBManager(VectorStore):
+    #chromadb is imported and the cloud client connected on first use (or
+    #warm_up()), not at construction
     def __init__(self):
+        self.client = None
+        self._collection = None
+        self._connect_lock = threading.Lock()
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._connect_lock:
+                if self._collection is None:
+                    self._connect()
+        return self._collection
+
+    @property
+    def ready(self) -> bool:
+        return self._collection is not None
+
+    def warm_up(self):
+        return self.collection
+
+    def _connect(self):
+        import chromadb
         self.client = chromadb.CloudClient(
             tenant=Config.CHROMA_TENANT,
             database=Config.CHROMA_DATABASE,
@@ -13,50 +38,59 @@ class ChromaDBManager:
 
     def _initialize_collection(self):
         try:
-            self.collection = self.client.get_collection(Config.COLLECTION_NAME)
+            self._collection = self.client.get_collection(Config.COLLECTION_NAME)
         except Exception:
-            self.collection = self.client.create_collection(
+            self._collection = self.client.create_collection(
                 name=Config.COLLECTION_NAME,
                 metadata={"description": "EULA and ToS document embeddings"},
             )
 
-    def add_chunks(self, chunks: List[Dict], doc_id: str, embeddings: List[List[float]]):
-        ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
+    def add_chunks(self, chunks: List[Dict], doc_id: str, embeddings: np.ndarray, start: int = 0):
+        ids = self.chunk_ids(chunks, doc_id, start)
         documents = [chunk["text"] for chunk in chunks]
-        metadatas = [
-            {
-                "doc_id": doc_id,
-                "section": chunk.get("section", "unknown"),
-                "chunk_index": chunk.get("chunk_index", i),
-            }
-            for i, chunk in enumerate(chunks)
-        ]
-
-        self.collection.add(
+        metadatas = self.chunk_metadatas(chunks, doc_id, start)
+
+        self.collection.upsert(
             ids=ids,
             documents=documents,
             embeddings=embeddings,
             metadatas=metadatas
         )
 
-    def query(self, query_embedding: List[float], n_results: int = 5) -> Dict:
-        results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
-
-        # Filter out any chunks with negative relevance (distance < 0)
-        if "distances" in results and results["distances"]:
-            filtered_ids, filtered_docs, filtered_meta, filtered_dist = [], [], [], []
-            for i, dist in enumerate(results["distances"][0]):
-                if dist < 1:  # keep only non-negative relevance
-                    filtered_ids.append(results["ids"][0][i])
-                    filtered_docs.append(results["documents"][0][i])
-                    filtered_meta.append(results["metadatas"][0][i])
-                    filtered_dist.append(dist)
-            results["ids"][0] = filtered_ids
-            results["documents"][0] = filtered_docs
-            results["metadatas"][0] = filtered_meta
-            results["distances"][0] = filtered_dist
-
-        return results
+    def query(self, query_embedding: np.ndarray, n_results: int = 5, filters: Optional[QueryFilter] = None) -> Dict:
+        return self.query_many([query_embedding], n_results, filters)
+
+    def query_many(self, query_embeddings: np.ndarray, n_results: int = 5, filters: Optional[QueryFilter] = None) -> Dict:
+        #one round trip for any number of query embeddings. doc ids and doc type
+        #go into the where clause; Chroma has no prefix operator for metadata,
+        #so a section prefix is applied to an overfetched result instead
+        where = filters.where() if filters is not None else None
+        prefix = filters is not None and filters.section_prefix
+        n_fetch = n_results * Config.SECTION_FILTER_OVERFETCH if prefix else n_results
+
+        results = self.collection.query(query_embeddings=list(query_embeddings), n_results=n_fetch, where=where)
+        if prefix:
+            for q, metadatas in enumerate(results["metadatas"]):
+                keep = [i for i, metadata in enumerate(metadatas) if filters.matches(metadata)][:n_results]
+                for key in ("ids", "documents", "metadatas", "distances"):
+                    if results.get(key):
+                        results[key][q] = [results[key][q][i] for i in keep]
+        return self.filter_by_distance(results)
+
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        if not ids:
+            return []
+        results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            chunk_id: {"id": chunk_id, "text": document, "metadata": metadata}
+            for chunk_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [found[i] for i in ids if i in found]
+
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        results = self.collection.get(ids=ids, include=["embeddings"])
+        found = dict(zip(results["ids"], results["embeddings"]))
+        return np.array([found[i] for i in ids], dtype=np.float32)
 
     def delete_by_doc_id(self, doc_id: str):
         try:
@@ -65,3 +99,25 @@ class ChromaDBManager:
                 self.collection.delete(ids=results["ids"])
         except Exception as e:
             print(f"Error deleting doc_id {doc_id}: {e}")
+
+    def delete_chunks(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def doc_chunks(self, doc_id: str) -> Dict[str, Dict]:
+        results = self.collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+        return dict(zip(results["ids"], results["metadatas"]))
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+
+    def iter_metadatas(self, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        offset = 0
+        while True:
+            results = self.collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            metadatas = results.get("metadatas") or []
+            if not metadatas:
+                break
+            yield metadatas
+            offset += len(metadatas)
@@ -1,62 +1,93 @@
 import re
-from typing import Dict, List
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+# anything other than single spaces between words
+_IRREGULAR_SPACE = re.compile(r"\s{2,}|[^\S ]")
+_WORD = re.compile(r"\S+")
+_NUMBERED_HEADER = re.compile(r"^\d+\.")
+_CAPS_HEADER = re.compile(r"^[A-Z\s]{3,}$")
+
 
 class SemanticChunker:
     @staticmethod
     def chunk_by_sentences(text: str, chunk_size: int, overlap: int) -> List[str]:
-        chunk_size = int(chunk_size)
-        overlap = int(overlap)
-        
+        normalized, spans = SemanticChunker.chunk_spans_by_sentences(text, chunk_size, overlap)
+        return [normalized[start:end] for start, end in spans]
+
+    @staticmethod
+    def chunk_spans_by_sentences(text: str, chunk_size: int, overlap: int) -> Tuple[str, List[Tuple[int, int]]]:
+        #Returns the whitespace-normalized text and each chunk as a (start, end) span into it
+        text = _WHITESPACE.sub(" ", text)
+        return text, SemanticChunker._sentence_spans(text, int(chunk_size), int(overlap))
+
+    @staticmethod
+    def _sentence_spans(text: str, chunk_size: int, overlap: int) -> List[Tuple[int, int]]:
+        #text must already be whitespace-normalized. Sentences are split and
+        #word-counted once; a chunk is always a run of consecutive sentences,
+        #which are separated by exactly one space, so its span covers exactly
+        #the text " ".join(sentences) would build.
+
         #Split by punctuation into sentences
-        text = re.sub(r"\s+", " ", text)
-        sentences = re.split(r"(?<=[.!?])\s+", text)
-        chunks = []
-        current_chunk: List[str] = []
-        current_size = 0 #current word count for chunk
+        sentences = _SENTENCE_BREAK.split(text)
+        lengths = list(map(len, sentences))
+        counts = list(map(len, map(str.split, sentences)))
+        starts = list(accumulate((length + 1 for length in lengths[:-1]), initial=0))
 
-        for sentence in sentences:
-            words = sentence.split()
-            sentence_size = len(words)
+        spans = []
+        first = 0 #first sentence of current chunk
+        current_size = 0 #current word count for chunk
 
+        for i, sentence_size in enumerate(counts):
             #end curr chunk if size exceeded by sentence
-            if current_size + sentence_size > chunk_size and current_chunk:
-                chunks.append(" ".join(current_chunk))
+            if current_size + sentence_size > chunk_size and i > first:
+                spans.append((starts[first], starts[i - 1] + lengths[i - 1]))
 
-                overlap_sentences: List[str] = []
+                #keep trailing sentences that fit in the overlap budget
+                overlap_first = i
                 overlap_count = 0
-                for s in reversed(current_chunk):
-                    w = s.split()
-                    if overlap_count + len(w) <= overlap:
-                        overlap_sentences.insert(0, s)
-                        overlap_count += len(w)
-                    else:
-                        break
-
-                current_chunk = overlap_sentences
+                while overlap_first > first and overlap_count + counts[overlap_first - 1] <= overlap:
+                    overlap_first -= 1
+                    overlap_count += counts[overlap_first]
+
+                first = overlap_first
                 current_size = overlap_count
 
             #Add sentence to curr chunk
-            current_chunk.append(sentence)
             current_size += sentence_size
 
         #add final chunk
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
+        if len(counts) > first:
+            spans.append((starts[first], len(text)))
 
-        return chunks
+        return spans
 
     @staticmethod
     def chunk_by_sections(text: str, chunk_size: int, overlap: int) -> List[Dict]:
         #Split into sections then use sentence splitting method
-        #Returns dict of chunked text, section titles, and chunk idx
+        #Returns dict of chunked text, section titles, chunk idx and the
+        #chunk's [start, end) character offsets in text
+        return list(SemanticChunker.iter_chunks(text.split("\n"), chunk_size, overlap))
+
+    @staticmethod
+    def iter_chunks(lines: Iterable[str], chunk_size: int, overlap: int) -> Iterator[Dict]:
+        #Streaming form of chunk_by_sections: consumes lines lazily and yields
+        #each section's chunks as soon as the next header closes it.
+        #Offsets are into "\n".join(lines).
 
         #Attempt to identify headers/titles
-        lines = text.split("\n")
-        sections = []
-        current_section = {"title": "Introduction", "content": ""}
+        title = "Introduction"
+        content: List[Tuple[str, int]] = []
+        position = 0
+
+        for raw_line in lines:
+            line = raw_line.strip()
+            offset = position + len(raw_line) - len(raw_line.lstrip())
+            position += len(raw_line) + 1
 
-        for line in lines:
-            line = line.strip()
             #skip empties
             if not line:
                 continue
@@ -64,24 +95,57 @@ class SemanticChunker:
             if (
                 #check for headers/titles
                 len(line) < 100
-                and (line.isupper() or re.match(r"^\d+\.", line) or re.match(r"^[A-Z\s]{3,}$", line))
+                and (line.isupper() or _NUMBERED_HEADER.match(line) or _CAPS_HEADER.match(line))
             ):
-                if current_section["content"]:
-                    sections.append(current_section) # save prev
-                current_section = {"title": line, "content": ""} #new section 
+                if content:
+                    yield from SemanticChunker._section_chunks(title, content, chunk_size, overlap) # save prev
+                title, content = line, [] #new section
             else:
-                current_section["content"] += line + " "
+                content.append((line, offset))
+
+        if content:
+            yield from SemanticChunker._section_chunks(title, content, chunk_size, overlap)
 
-        if current_section["content"]:
-            sections.append(current_section)
+    @staticmethod
+    def _section_chunks(title: str, content: List[Tuple[str, int]], chunk_size: int, overlap: int) -> Iterator[Dict]:
+        #Builds the section text (lines joined by spaces, whitespace normalized)
+        #together with a piecewise map from section positions back to source
+        #offsets: one segment per line, or per word where normalizing a line
+        #changed its length.
+        parts: List[str] = []
+        segment_starts: List[int] = []
+        segment_sources: List[int] = []
+        length = 0
+
+        for line, offset in content:
+            if _IRREGULAR_SPACE.search(line) is None:
+                pieces = [(line, offset)]
+            else:
+                pieces = [(m.group(), offset + m.start()) for m in _WORD.finditer(line)]
+            for piece, source in pieces:
+                segment_starts.append(length)
+                segment_sources.append(source)
+                parts.append(piece)
+                length += len(piece) + 1
+
+        section_text = " ".join(parts) + " "
+
+        def to_source(position: int) -> int:
+            segment = bisect_right(segment_starts, position) - 1
+            return segment_sources[segment] + position - segment_starts[segment]
 
         #sections into sentences
-        all_chunks: List[Dict] = []
-        for section in sections:
-            section_chunks = SemanticChunker.chunk_by_sentences(
-                section["content"], chunk_size, overlap
-            )
-            for i, chunk in enumerate(section_chunks):
-                all_chunks.append({"text": chunk, "section": section["title"], "chunk_index": i})
-
-        return all_chunks
\ No newline at end of file
+        spans = SemanticChunker._sentence_spans(section_text, int(chunk_size), int(overlap))
+        for i, (start, end) in enumerate(spans):
+            text = section_text[start:end]
+
+            #offsets cover the chunk's first to last non-space character
+            lead = len(text) - len(text.lstrip(" "))
+            trail = len(text) - len(text.rstrip(" "))
+            if start + lead < end - trail:
+                source_start = to_source(start + lead)
+                source_end = to_source(end - trail - 1) + 1
+            else:
+                source_start = source_end = to_source(start) if segment_starts else 0
+
+            yield {"text": text, "section": title, "chunk_index": i, "start": source_start, "end": source_end}
@@ -0,0 +1,183 @@
+import math
+import re
+from typing import Dict, List, Set, Tuple
+from app.core.config import Config
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    #~4 characters per token for English prose; Bedrock's tokenizer is not available locally
+    return math.ceil(len(text) / 4)
+
+
+def format_passage(section: str, text: str) -> str:
+    return f"[Section: {section}]\n{text}"
+
+
+class ContextBuilder:
+    #Turns retrieved chunks (best first) into the prompt context under a token budget:
+    #  merge  - chunks of one document section with consecutive chunk_index become
+    #           one passage, and the CHUNK_OVERLAP text they share appears once
+    #  dedupe - sentences already given by a more relevant passage are left
+    #           out of mostly repeated passages
+    #  trim   - passages are added best first until the budget is spent; the first
+    #           one that does not fit is cut at a sentence boundary and the rest
+    #           are dropped
+    #A passage ranks as its best chunk, and passages keep that order.
+
+    def __init__(self, token_budget: int = Config.CONTEXT_TOKEN_BUDGET,
+                 dedup_threshold: float = Config.CONTEXT_DEDUP_THRESHOLD,
+                 min_tail_tokens: int = Config.CONTEXT_MIN_TAIL_TOKENS,
+                 max_overlap_words: int = int(Config.CHUNK_OVERLAP)):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.min_tail_tokens = min_tail_tokens
+        self.max_overlap_words = max_overlap_words
+
+    def build(self, chunks: List[Dict]) -> Tuple[str, Dict]:
+        #Returns (context, stats); stats compare against joining every chunk verbatim
+        tokens_before = estimate_tokens(
+            "\n\n".join(format_passage(c["metadata"].get("section", "unknown"), c["text"]) for c in chunks)
+        )
+
+        passages = self._merge(chunks)
+        merged = len(chunks) - len(passages)
+        passages, duplicates = self._dedupe(passages)
+        passages, trimmed = self._trim(passages)
+
+        context = "\n\n".join(format_passage(p["section"], p["text"]) for p in passages)
+        return context, {
+            "tokens_before": tokens_before,
+            "tokens_after": estimate_tokens(context),
+            "chunks": len(chunks),
+            "passages": len(passages),
+            "merged_chunks": merged,
+            "duplicates_removed": duplicates,
+            "trimmed_passages": trimmed,
+        }
+
+    # --- merge -----------------------------------------------------------------
+
+    def _merge(self, chunks: List[Dict]) -> List[Dict]:
+        groups: Dict[Tuple, List[Tuple[int, int, Dict]]] = {}
+        passages = []
+        seen: Set[str] = set()
+        for rank, chunk in enumerate(chunks):
+            if chunk.get("id") in seen:
+                continue
+            seen.add(chunk.get("id"))
+            metadata = chunk["metadata"]
+            if metadata.get("chunk_index") is None:
+                passages.append(self._passage(rank, chunk))
+                continue
+            key = (metadata.get("doc_id"), metadata.get("section"))
+            groups.setdefault(key, []).append((int(metadata["chunk_index"]), rank, chunk))
+
+        for members in groups.values():
+            members.sort(key=lambda member: member[0])
+            current, last_index = None, None
+            for chunk_index, rank, chunk in members:
+                if current is not None and chunk_index == last_index + 1:
+                    current["text"] = self._join_overlapping(current["text"], chunk["text"])
+                    current["rank"] = min(current["rank"], rank)
+                    current["chunk_ids"].append(chunk.get("id"))
+                else:
+                    current = self._passage(rank, chunk)
+                    passages.append(current)
+                last_index = chunk_index
+
+        passages.sort(key=lambda passage: passage["rank"])
+        return passages
+
+    @staticmethod
+    def _passage(rank: int, chunk: Dict) -> Dict:
+        return {
+            "rank": rank,
+            "section": chunk["metadata"].get("section", "unknown"),
+            "text": chunk["text"],
+            "chunk_ids": [chunk.get("id")],
+        }
+
+    def _join_overlapping(self, first: str, second: str) -> str:
+        #The chunker repeats at most CHUNK_OVERLAP trailing words of a chunk at
+        #the start of the next one; keep the longest such repeat only once
+        first_words, second_words = first.split(), second.split()
+        for k in range(min(self.max_overlap_words, len(first_words), len(second_words)), 0, -1):
+            if first_words[-k:] == second_words[:k]:
+                rest = second_words[k:]
+                return f"{first} {' '.join(rest)}" if rest else first
+        return f"{first} {second}"
+
+    # --- dedupe ----------------------------------------------------------------
+
+    def _dedupe(self, passages: List[Dict]) -> Tuple[List[Dict], int]:
+        #Sentence level: a passage made mostly (dedup_threshold of its text) of
+        #sentences already in a more relevant passage keeps only its new ones,
+        #and is dropped if it has none. A sentence differing in any word, such
+        #as a revised number, counts as new, so no distinct statement is lost.
+        seen: Set[str] = set()
+        kept, duplicates = [], 0
+        for passage in passages:
+            sentences = _SENTENCE_BREAK.split(passage["text"])
+            keys = [" ".join(sentence.lower().split()) for sentence in sentences]
+            repeated = [key in seen for key in keys]
+            seen.update(keys)
+
+            if all(repeated):
+                duplicates += 1
+                continue
+            repeated_chars = sum(len(sentence) for sentence, r in zip(sentences, repeated) if r)
+            if repeated_chars >= self.dedup_threshold * len(passage["text"]):
+                passage = dict(passage, text=self._without_repeats(sentences, repeated))
+            kept.append(passage)
+        return kept, duplicates
+
+    @staticmethod
+    def _without_repeats(sentences: List[str], repeated: List[bool]) -> str:
+        #new sentences in order, with "[...]" where repeated ones were left out
+        parts, gap = [], False
+        for sentence, r in zip(sentences, repeated):
+            if r:
+                gap = True
+                continue
+            if gap:
+                parts.append("[...]")
+                gap = False
+            parts.append(sentence)
+        if gap:
+            parts.append("[...]")
+        return " ".join(parts)
+
+    # --- trim ------------------------------------------------------------------
+
+    def _trim(self, passages: List[Dict]) -> Tuple[List[Dict], int]:
+        if self.token_budget <= 0:
+            return passages, 0
+
+        kept, used = [], 0
+        for i, passage in enumerate(passages):
+            #"\n\n" separators are counted with the passage that follows them
+            cost = estimate_tokens(format_passage(passage["section"], passage["text"])) + (1 if kept else 0)
+            if used + cost <= self.token_budget:
+                kept.append(passage)
+                used += cost
+                continue
+
+            remaining = self.token_budget - used - (cost - estimate_tokens(passage["text"]))
+            if remaining >= self.min_tail_tokens:
+                text = self._cut(passage["text"], remaining)
+                if text:
+                    kept.append(dict(passage, text=text))
+            return kept, len(passages) - i
+        return kept, 0
+
+    @staticmethod
+    def _cut(text: str, max_tokens: int) -> str:
+        #longest run of leading sentences within max_tokens
+        cut = 0
+        for match in _SENTENCE_BREAK.finditer(text):
+            if estimate_tokens(text[:match.start()]) > max_tokens:
+                break
+            cut = match.start()
+        return text[:cut]
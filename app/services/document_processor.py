@@ -1,58 +1,400 @@
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 from app.core.config import Config
+from app.core.metrics import CHUNKS, DOCUMENTS, STAGE_ERRORS, STAGE_IN_FLIGHT, Stage, count, observe_stage
 from app.services.s3_manager import S3Manager
-from app.services.pdf_processor import PDFProcessor
+from app.services.pdf_processor import MetadataAccumulator, PDFProcessor
 from app.services.chunking import SemanticChunker
 from app.services.embedding_manager import EmbeddingManager
-from app.services.chroma_manager import ChromaDBManager
+from app.services.ingestion_queue import INGEST_STAGES
+from app.services.upload_spool import SpooledPDF
+from app.services.vector_store import VectorStore, create_vector_store
+
+
+class _Stages:
+    #Tracks the stage currently running (for error messages) and reports
+    #on_stage(stage, done) the first time a stage starts and when it finishes.
+    #Stages overlap in the streaming pipeline, so several can be in progress.
+    #
+    #Time between enter() calls is charged to the stage being left, so each
+    #stage's total per document is known although the pipeline interleaves
+    #them; finish() records the totals in the stage metrics.
+
+    def __init__(self, on_stage):
+        self.on_stage = on_stage
+        self.current = "text_extraction"
+        self.started = set()
+        self.seconds: Dict[str, float] = {}
+        self._timed: Optional[str] = None
+        self._mark = time.perf_counter()
+
+    def _charge(self, stage: Optional[str]):
+        now = time.perf_counter()
+        if self._timed is not None:
+            self.seconds[self._timed] = self.seconds.get(self._timed, 0.0) + now - self._mark
+            count(STAGE_IN_FLIGHT, self._timed, amount=-1)
+        if stage is not None:
+            count(STAGE_IN_FLIGHT, stage)
+        self._timed, self._mark = stage, now
+
+    def enter(self, stage):
+        self.current = stage
+        if stage != self._timed:
+            self._charge(stage)
+        if stage not in self.started:
+            self.started.add(stage)
+            if self.on_stage is not None:
+                self.on_stage(stage, False)
+
+    def done(self, *stages):
+        for stage in stages:
+            if self.on_stage is not None:
+                self.on_stage(stage, True)
+
+    def finish(self, failed: bool = False):
+        self._charge(None)
+        for stage, seconds in self.seconds.items():
+            observe_stage(stage, seconds)
+        if failed:
+            count(STAGE_ERRORS, self.current)
+
+
+class _StoredMetadata:
+    #Stands in for MetadataAccumulator when a document's metadata comes from
+    #the registry instead of its pages
+    def __init__(self, metadata: Dict, filename: str):
+        self.metadata = dict(metadata, filename=filename)
+
+    @property
+    def doc_type(self) -> str:
+        return self.metadata.get("doc_type", "unknown")
+
+    def result(self) -> Dict:
+        return dict(self.metadata, timestamp=datetime.now().isoformat())
+
 
 class DocumentProcessor:
-    def __init__(self):
-        self.s3_manager = S3Manager()
+    def __init__(self, s3_manager=None, embedding_manager=None, vector_store=None, bm25_index=None, registry=None,
+                 artifacts=None):
+        self.s3_manager = s3_manager or S3Manager()
         self.pdf_processor = PDFProcessor()
         self.chunker = SemanticChunker()
-        self.embedding_manager = EmbeddingManager()
-        self.chroma_manager = ChromaDBManager()
+        self.embedding_manager = embedding_manager or EmbeddingManager()
+        self.vector_store = vector_store or create_vector_store()
+        #keyword index kept in step with the vector store (optional)
+        self.bm25_index = bm25_index
+        #document registry, for short-circuiting content already ingested (optional)
+        self.registry = registry
+        #ArtifactWriter persisting text, chunks and embeddings for rebuilds (optional)
+        self.artifacts = artifacts
+
+        #each document keeps at most one vector-store write in flight
+        self.upsert_executor = ThreadPoolExecutor(
+            max_workers=max(1, Config.INGEST_WORKERS), thread_name_prefix="upsert"
+        )
+        #and one raw PDF upload, which runs alongside processing for new documents
+        self.upload_executor = ThreadPoolExecutor(
+            max_workers=max(1, Config.INGEST_WORKERS), thread_name_prefix="s3-upload"
+        )
+
+    def process_document(self, pdf_bytes, filename, on_stage=None):
+        with Stage("ingest"):
+            try:
+                result = self._process_document(pdf_bytes, filename, on_stage)
+            except Exception:
+                count(DOCUMENTS, "failed")
+                raise
+        count(DOCUMENTS, "deduplicated" if result["deduplicated"] else "ingested")
+        count(CHUNKS, "embedded", amount=result["embedded_chunks"])
+        count(CHUNKS, "reused", amount=result["reused_chunks"])
+        count(CHUNKS, "deleted", amount=result["deleted_chunks"])
+        return result
+
+    def _process_document(self, pdf_bytes, filename, on_stage=None):
+        #Streaming pipeline: pages -> cleaned lines -> section chunks -> batches of
+        #INGEST_BATCH_SIZE chunks. Each batch is embedded while the previous one is
+        #being upserted, so memory is bounded by one section plus two batches.
+        #on_stage(name, done) reports stage progress for ingestion jobs.
+        #
+        #Ingestion is incremental: identical PDF bytes under the same name are
+        #answered from the registry without any processing, and chunk ids are
+        #content-addressed, so re-ingesting a document only embeds chunks whose
+        #text changed, refreshes the metadata of moved ones and deletes the ones
+        #now gone. Chunks are tagged with the doc type of the pages read so far;
+        #any whose tag differs from the final doc type are corrected at the end.
+        #
+        #Bytes already ingested under another name become a document of their
+        #own (listed, queried and deleted by its name) without extraction or
+        #embedding: the other document's stored chunks and embeddings are copied
+        #under the new doc_id, and the result names it in duplicate_of.
+        #
+        #A new version keeping fewer than INGEST_REPLACE_MIN_REUSED of the stored
+        #chunks is most likely a different file with the same name; the result
+        #reports it as replaced, and INGEST_ALLOW_REPLACE=false refuses it
+        #before the stored document is touched.
+        #
+        #pdf_bytes may be a SpooledPDF (an upload spooled to disk). The raw PDF
+        #of a new document is uploaded to S3 while it is processed, and deleted
+        #again if processing fails; a new version of an existing document is
+        #uploaded only once its chunks are in, so a failure leaves the old one intact.
+        #
+        #With an artifact writer, cleaned pages, chunk lines and each batch's new
+        #embeddings are appended to a spool on disk as they are produced, and the
+        #spool is handed to the writer at the end.
+        stages = _Stages(on_stage)
+        doc_id = hashlib.md5(filename.encode()).hexdigest()
+        pdf = SpooledPDF.of(pdf_bytes)
+        content_hash = pdf.sha256()
+
+        duplicate = self.registry.find_by_hash(content_hash, doc_id) if self.registry is not None else None
+        if duplicate is not None and duplicate["doc_id"] == doc_id:
+            stages.done(*INGEST_STAGES)
+            return dict(
+                duplicate,
+                deduplicated=True,
+                replaced=False,
+                reused_chunks=duplicate["chunk_count"],
+                embedded_chunks=0,
+                deleted_chunks=0,
+            )
+
+        source = None
+        if duplicate is not None:
+            source = self.vector_store.doc_chunks(duplicate["doc_id"])
+            if not source or len(source) != duplicate["chunk_count"]:
+                #the other copy's chunks are not all stored: process the bytes
+                source = duplicate = None
+
+        metadata = MetadataAccumulator(filename) if duplicate is None else _StoredMetadata(duplicate["metadata"], filename)
+        stored = self.vector_store.doc_chunks(doc_id)
+        seen: Dict[str, None] = {}
+        occurrences: Dict[str, int] = {}
+        added: List[str] = []
+        #(chunk id, metadata in the store, metadata it should have)
+        written: List[Tuple[str, Dict, Dict]] = []
+        pending = None
+        chunk_count = 0
+        upload = None if stored else self.upload_executor.submit(self._upload_raw, pdf, filename)
+        artifact = self.artifacts.spool() if self.artifacts is not None else None
 
-    def process_document(self, pdf_bytes, filename):
-        stage = "text_extraction"
         try:
-            text = self.pdf_processor.extract_text(pdf_bytes)
+            if source is None:
+                lines = self._iter_clean_lines(pdf, metadata, stages, artifact)
+                chunks = self.chunker.iter_chunks(lines, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
+            else:
+                chunks = self._iter_stored_chunks(source, stages)
+            batch: List[Dict] = []
+            #embeddings copied with the chunks of batch, when they come from another document
+            vectors: List[np.ndarray] = []
 
-            stage = "text_cleaning"
-            clean_text = self.pdf_processor.clean_text(text)
+            for chunk in chunks:
+                vector = chunk.pop("vector", None)
+                chunk["filename"] = filename
+                base_id = VectorStore.content_chunk_id(doc_id, chunk)
+                occurrence = occurrences.get(base_id, 0)
+                occurrences[base_id] = occurrence + 1
+                chunk["id"] = VectorStore.content_chunk_id(doc_id, chunk, occurrence)
+                chunk["doc_type"] = metadata.doc_type
+                seen[chunk["id"]] = None
+                chunk_count += 1
+                if artifact is not None:
+                    artifact.add_chunk(chunk, embedded=chunk["id"] not in stored)
 
-            if not clean_text.strip():
-                raise ValueError("No extractable text found")
+                chunk_metadata = VectorStore.chunk_metadatas([chunk], doc_id)[0]
+                written.append((chunk["id"], stored.get(chunk["id"], chunk_metadata), chunk_metadata))
+                if chunk["id"] in stored:
+                    #same text, already embedded; only its metadata may have changed
+                    continue
 
-            stage = "metadata"
-            metadata = self.pdf_processor.extract_metadata(clean_text, filename)
+                batch.append(chunk)
+                if vector is not None:
+                    vectors.append(vector)
+                if len(batch) >= Config.INGEST_BATCH_SIZE:
+                    pending = self._write_batch(batch, doc_id, pending, stages, artifact, vectors)
+                    added.extend(c["id"] for c in batch)
+                    batch, vectors = [], []
+                    stages.enter("chunking")
 
-            stage = "chunking"
-            chunks = self.chunker.chunk_by_sections(
-                clean_text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP
-            )
+            stages.done("chunking")
 
-            stage = "embedding"
-            chunk_texts = [c["text"] for c in chunks]
-            embeddings = self.embedding_manager.embed_texts(chunk_texts)
+            if batch:
+                pending = self._write_batch(batch, doc_id, pending, stages, artifact, vectors)
+                added.extend(c["id"] for c in batch)
 
-            stage = "vector_store"
-            doc_id = hashlib.md5(filename.encode()).hexdigest()
-            self.chroma_manager.add_chunks(chunks, doc_id, embeddings)
+            if chunk_count == 0:
+                stages.current = "text_cleaning"
+                raise ValueError("No extractable text found")
+            stages.done("embedding")
 
-            stage = "s3_upload"
-            self.s3_manager.upload_file(
-                Config.RAW_BUCKET, filename, pdf_bytes, "application/pdf"
-            )
+            stages.enter("vector_store")
+            if pending is not None:
+                pending.result()
+                pending = None
+
+            kept = sum(1 for chunk_id in stored if chunk_id in seen)
+            replaced = bool(stored) and kept < Config.INGEST_REPLACE_MIN_REUSED * len(stored)
+            if replaced:
+                if not Config.INGEST_ALLOW_REPLACE:
+                    raise ValueError(
+                        f"it shares {kept} of {len(stored)} chunks with the stored document of that name; "
+                        f"delete that document first to replace it (INGEST_ALLOW_REPLACE=false)"
+                    )
+                print(f"'{filename}' replaces a different stored document of that name ({kept} of {len(stored)} chunks kept)")
+
+            stages.enter("s3_upload")
+            if upload is None:
+                self._upload_raw(pdf, filename)
+            else:
+                upload.result()
+            stages.done("s3_upload")
 
-            return {
+            #the new version is complete: retire what the old one no longer has
+            stages.enter("vector_store")
+            stale = [chunk_id for chunk_id in stored if chunk_id not in seen]
+            doc_type = metadata.doc_type
+            updates = [
+                (chunk_id, dict(wanted, doc_type=doc_type))
+                for chunk_id, current, wanted in written
+                if dict(wanted, doc_type=doc_type) != current
+            ]
+            if updates:
+                self.vector_store.update_metadatas([u[0] for u in updates], [u[1] for u in updates])
+            self._delete_chunks(stale)
+            stages.done("vector_store")
+            stages.finish()
+
+            result = {
                 "doc_id": doc_id,
                 "filename": filename,
-                "metadata": metadata,
-                "chunk_count": len(chunks),
+                "metadata": metadata.result(),
+                "chunk_count": chunk_count,
+                "content_hash": content_hash,
+                "duplicate_of": duplicate["doc_id"] if duplicate is not None else None,
+                "deduplicated": duplicate is not None,
+                "replaced": replaced,
+                #copied chunks count as reused: none of them was embedded
+                "reused_chunks": chunk_count - len(added) if duplicate is None else chunk_count,
+                "embedded_chunks": len(added) if duplicate is None else 0,
+                "deleted_chunks": len(stale),
             }
+            if artifact is not None:
+                self.artifacts.submit(result, artifact)
+            return result
 
         except Exception as e:
-            raise RuntimeError(f"[{stage}] Failed processing '{filename}': {e}") from e
+            stages.finish(failed=True)
+            if artifact is not None:
+                artifact.discard()
+            if added:
+                self._rollback(doc_id, pending, added)
+            if upload is not None:
+                self._remove_raw(upload, filename)
+            raise RuntimeError(f"[{stages.current}] Failed processing '{filename}': {e}") from e
+
+    def _iter_clean_lines(self, pdf_bytes, metadata: MetadataAccumulator, stages: _Stages,
+                          artifact=None) -> Iterator[str]:
+        stages.enter("text_extraction")
+        for page in self.pdf_processor.iter_pages(pdf_bytes):
+            stages.enter("text_cleaning")
+            clean_page = self.pdf_processor.clean_text(page)
+            if artifact is not None:
+                artifact.add_text(clean_page)
+
+            stages.enter("metadata")
+            metadata.update(clean_page)
 
+            stages.enter("chunking")
+            yield from clean_page.split("\n")
+            stages.enter("text_extraction")
+
+        stages.done("text_extraction", "text_cleaning", "metadata")
+        stages.enter("chunking")
+
+    def _iter_stored_chunks(self, source: Dict[str, Dict], stages: _Stages) -> Iterator[Dict]:
+        #Chunks of another stored document ({chunk id: metadata}) in document
+        #order, INGEST_BATCH_SIZE read at a time, each with its stored "vector"
+        stages.done("text_extraction", "text_cleaning", "metadata")
+        ids = sorted(source, key=lambda i: (source[i].get("start_offset", 0), source[i].get("chunk_index", 0)))
+        for start in range(0, len(ids), Config.INGEST_BATCH_SIZE):
+            group = ids[start:start + Config.INGEST_BATCH_SIZE]
+            stages.enter("vector_store")
+            texts = {chunk["id"]: chunk["text"] for chunk in self.vector_store.get_chunks(group)}
+            embeddings = self.vector_store.get_embeddings(group)
+            stages.enter("chunking")
+            for chunk_id, vector in zip(group, embeddings):
+                metadata = source[chunk_id]
+                chunk = {
+                    "text": texts[chunk_id],
+                    "section": metadata.get("section", "unknown"),
+                    "chunk_index": metadata.get("chunk_index", 0),
+                    "vector": vector,
+                }
+                if "start_offset" in metadata:
+                    chunk["start"], chunk["end"] = metadata["start_offset"], metadata["end_offset"]
+                yield chunk
+
+    def _upload_raw(self, pdf: SpooledPDF, filename: str):
+        with pdf.open() as f:
+            self.s3_manager.upload_fileobj(Config.RAW_BUCKET, filename, f, "application/pdf")
+
+    def _remove_raw(self, upload, filename: str):
+        #undoes the concurrent upload of a new document that failed
+        try:
+            upload.result()
+            self.s3_manager.delete_object(Config.RAW_BUCKET, filename)
+        except Exception as e:
+            print(f"Error removing raw PDF '{filename}': {e}")
+
+    def _write_batch(self, batch: List[Dict], doc_id: str, pending, stages: _Stages, artifact=None,
+                     vectors: Optional[List[np.ndarray]] = None):
+        #vectors: the batch's embeddings when they were copied rather than computed
+        stages.enter("embedding")
+        if vectors:
+            embeddings = np.stack(vectors).astype(np.float32, copy=False)
+        else:
+            embeddings = self.embedding_manager.embed_texts([c["text"] for c in batch])
+        if artifact is not None:
+            artifact.add_embeddings(embeddings)
+
+        stages.enter("vector_store")
+        if pending is not None:
+            pending.result()
+        return self.upsert_executor.submit(self._upsert, batch, doc_id, embeddings)
+
+    def _upsert(self, batch: List[Dict], doc_id: str, embeddings):
+        #runs behind the pipeline, which only sees the wait for it ("vector_store")
+        with Stage("vector_upsert"):
+            self.vector_store.add_chunks(batch, doc_id, embeddings)
+            if self.bm25_index is not None:
+                self.bm25_index.add_chunks(batch, doc_id)
+
+    def _delete_chunks(self, ids: List[str]):
+        if not ids:
+            return
+        self.vector_store.delete_chunks(ids)
+        if self.bm25_index is not None:
+            self.bm25_index.delete_chunks(ids)
+
+    def delete_document(self, doc_id: str):
+        #removes a document's chunks from the vector store and keyword index, and its artifacts
+        self.vector_store.delete_by_doc_id(doc_id)
+        if self.bm25_index is not None:
+            self.bm25_index.delete_by_doc_id(doc_id)
+        if self.artifacts is not None:
+            self.artifacts.delete(doc_id)
+
+    def _rollback(self, doc_id: str, pending, added: List[str]):
+        #remove the chunks this run added; a previous version stays intact
+        try:
+            if pending is not None:
+                pending.result()
+        except Exception:
+            pass
+        try:
+            self._delete_chunks(added)
+        except Exception as e:
+            print(f"Error rolling back doc_id {doc_id}: {e}")
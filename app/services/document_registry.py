@@ -0,0 +1,210 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from app.core.config import Config
+
+_COLUMNS = "seq, doc_id, filename, doc_type, word_count, char_count, chunk_count, timestamp, source, content_hash, duplicate_of"
+
+
+class DocumentRegistry:
+    #Durable record of ingested documents (the process_document results).
+    #One SQLite row per doc_id; seq orders the listing newest first and doubles
+    #as the pagination cursor, so every page is an index range scan no matter
+    #how deep it is. Rows recovered by rebuild() have source "rebuild" and only
+    #the fields S3 and the vector store can supply. duplicate_of is the doc_id
+    #a document's chunks were copied from when its bytes were already ingested
+    #under another name; the copy is a document of its own.
+
+    def __init__(self, path: str = Config.REGISTRY_PATH):
+        self._lock = threading.Lock()
+        self.rebuilding = False
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT NOT NULL UNIQUE, filename TEXT NOT NULL, "
+            "doc_type TEXT NOT NULL, word_count INTEGER NOT NULL, char_count INTEGER NOT NULL, "
+            "chunk_count INTEGER NOT NULL, timestamp TEXT NOT NULL, source TEXT NOT NULL, content_hash TEXT, "
+            "duplicate_of TEXT)"
+        )
+        #registries created before content hashing / duplicate tracking
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        if "content_hash" not in columns:
+            self.conn.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+        if "duplicate_of" not in columns:
+            self.conn.execute("ALTER TABLE documents ADD COLUMN duplicate_of TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS documents_filename ON documents (filename)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash)")
+        self.conn.commit()
+        self.documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    @staticmethod
+    def _to_result(row) -> Dict:
+        #same shape as DocumentProcessor.process_document's return value
+        seq, doc_id, filename, doc_type, word_count, char_count, chunk_count, timestamp, source, content_hash, duplicate_of = row
+        return {
+            "doc_id": doc_id,
+            "filename": filename,
+            "metadata": {
+                "filename": filename,
+                "doc_type": doc_type,
+                "timestamp": timestamp,
+                "word_count": word_count,
+                "char_count": char_count,
+            },
+            "chunk_count": chunk_count,
+            "content_hash": content_hash,
+            "duplicate_of": duplicate_of,
+            "source": source,
+        }
+
+    def put(self, result: Dict):
+        #Records a process_document result; re-ingesting a doc_id replaces its row
+        metadata = result.get("metadata", {})
+        with self._lock:
+            exists = self.conn.execute("SELECT 1 FROM documents WHERE doc_id = ?", (result["doc_id"],)).fetchone()
+            self.conn.execute(
+                "INSERT INTO documents (doc_id, filename, doc_type, word_count, char_count, chunk_count, timestamp, source, "
+                "content_hash, duplicate_of) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'ingest', ?, ?) "
+                "ON CONFLICT (doc_id) DO UPDATE SET filename = excluded.filename, doc_type = excluded.doc_type, "
+                "word_count = excluded.word_count, char_count = excluded.char_count, "
+                "chunk_count = excluded.chunk_count, timestamp = excluded.timestamp, source = 'ingest', "
+                "content_hash = excluded.content_hash, duplicate_of = excluded.duplicate_of",
+                (
+                    result["doc_id"],
+                    result["filename"],
+                    metadata.get("doc_type", "unknown"),
+                    metadata.get("word_count", 0),
+                    metadata.get("char_count", 0),
+                    result.get("chunk_count", 0),
+                    metadata.get("timestamp", ""),
+                    result.get("content_hash"),
+                    result.get("duplicate_of"),
+                ),
+            )
+            self.conn.commit()
+            if not exists:
+                self.documents += 1
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(f"SELECT {_COLUMNS} FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return self._to_result(row) if row else None
+
+    def find_by_hash(self, content_hash: str, doc_id: Optional[str] = None) -> Optional[Dict]:
+        #Indexed lookup of a document with exactly these PDF bytes; doc_id's own
+        #row first, when it is one of them
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM documents WHERE content_hash = ? ORDER BY doc_id = ? DESC LIMIT 1",
+                (content_hash, doc_id),
+            ).fetchone()
+        return self._to_result(row) if row else None
+
+    def list(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        #Returns (page newest first, cursor for the next page or None)
+        params: list = []
+        where = ""
+        if cursor:
+            where = "WHERE seq < ?"
+            params.append(int(cursor))
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM documents {where} ORDER BY seq DESC LIMIT ?", params
+            ).fetchall()
+
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [self._to_result(row) for row in rows[:limit]], next_cursor
+
+    def delete(self, doc_id: str) -> bool:
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount
+            self.conn.commit()
+            self.documents -= deleted
+        return bool(deleted)
+
+    def count(self) -> int:
+        return self.documents
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- recovery --------------------------------------------------------------
+
+    def rebuild_async(self, s3_manager, vector_store):
+        #Repopulates an empty registry in the background; listing is served meanwhile
+        if self.documents:
+            return None
+        self.rebuilding = True
+        thread = threading.Thread(target=self.rebuild, args=(s3_manager, vector_store), name="registry-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+    def rebuild(self, s3_manager, vector_store):
+        #Recovers documents from the raw bucket listing (doc_id = md5(filename),
+        #as in process_document) and chunk counts from vector store metadata.
+        #Rows written by ingestion in the meantime are never overwritten.
+        self.rebuilding = True
+        try:
+            added = 0
+            for page in s3_manager.iter_objects(Config.RAW_BUCKET):
+                rows = [
+                    (
+                        hashlib.md5(obj["Key"].encode()).hexdigest(),
+                        obj["Key"],
+                        obj["LastModified"].isoformat() if hasattr(obj.get("LastModified"), "isoformat") else "",
+                    )
+                    for obj in page
+                ]
+                added += self._insert_recovered(rows)
+
+            chunk_counts: Counter = Counter()
+            filenames: Dict[str, str] = {}
+            for metadatas in vector_store.iter_metadatas():
+                for metadata in metadatas:
+                    doc_id = metadata.get("doc_id")
+                    chunk_counts[doc_id] += 1
+                    if metadata.get("filename"):
+                        filenames[doc_id] = metadata["filename"]
+
+            #documents whose raw PDF is missing but whose chunks record a filename
+            added += self._insert_recovered([
+                (doc_id, filename, "") for doc_id, filename in filenames.items()
+            ])
+            with self._lock:
+                self.conn.executemany(
+                    "UPDATE documents SET chunk_count = ? WHERE doc_id = ? AND source = 'rebuild'",
+                    [(count, doc_id) for doc_id, count in chunk_counts.items()],
+                )
+                self.conn.commit()
+            print(f"Document registry rebuilt: {added} documents recovered")
+        except Exception as e:
+            print(f"Error rebuilding document registry: {e}")
+        finally:
+            self.rebuilding = False
+
+    def _insert_recovered(self, rows: List[Tuple[str, str, str]]) -> int:
+        if not rows:
+            return 0
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO documents (doc_id, filename, doc_type, word_count, char_count, chunk_count, timestamp, source) "
+                "VALUES (?, ?, 'unknown', 0, 0, 0, ?, 'rebuild')",
+                rows,
+            )
+            self.conn.commit()
+            added = self.conn.total_changes - before
+            self.documents += added
+        return added
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from app.core.config import Config
+
+# Embedding backends for EmbeddingManager. Each returns an object with the two
+# SentenceTransformer methods the manager uses, encode() and
+# get_sentence_embedding_dimension():
+#   torch      - sentence-transformers on PyTorch, full precision
+#   torch-int8 - the same model with Linear layers dynamically quantized to int8
+#   onnx       - the transformer on ONNX Runtime, tokenized with `tokenizers`;
+#                pooling and normalization in NumPy, so torch is not needed
+#   onnx-int8  - the ONNX model with int8 weights (onnxruntime dynamic quantization)
+#
+# The ONNX backends read <ONNX_MODEL_DIR>/<model name>/ (model.onnx,
+# tokenizer.json, optionally modules.json). Missing files are fetched from the
+# model's Hugging Face repo when huggingface_hub is installed, or can be
+# exported once with torch:
+#   python -m app.services.embedding_backends export
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+def create_model(name: str, backend: str):
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name, device="cpu")
+    if backend == "torch-int8":
+        import torch
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(name, quantized=backend == "onnx-int8")
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of: {', '.join(BACKENDS)}")
+
+
+def model_dir(name: str, root: str = Config.ONNX_MODEL_DIR) -> str:
+    return os.path.join(root, name.replace("/", "__"))
+
+
+class OnnxEncoder:
+    #The sentence-transformers pipeline of a BERT-style model (tokenize,
+    #transformer, mean pooling, optional L2 normalization) on ONNX Runtime
+
+    def __init__(self, name: str, quantized: bool = False, directory: Optional[str] = None,
+                 max_length: int = Config.EMBED_MAX_SEQ_LENGTH, threads: int = Config.ONNX_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        directory = directory or model_dir(name)
+        model_path, tokenizer_path, modules_path = self._resolve_files(name, directory)
+        if quantized:
+            model_path = self._quantize(model_path, os.path.join(directory, "model_int8.onnx"))
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        #all-MiniLM-L6-v2 and most sentence-transformers models end in Normalize
+        self.normalize = True
+        if modules_path is not None:
+            with open(modules_path, "r", encoding="utf-8") as f:
+                self.normalize = any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+        self.dimension: Optional[int] = None
+
+    @staticmethod
+    def _resolve_files(name: str, directory: str) -> Tuple[str, str, Optional[str]]:
+        paths = {
+            "model.onnx": os.path.join(directory, "model.onnx"),
+            "tokenizer.json": os.path.join(directory, "tokenizer.json"),
+            "modules.json": os.path.join(directory, "modules.json"),
+        }
+        missing = [f for f, path in paths.items() if not os.path.exists(path)]
+        if "model.onnx" in missing or "tokenizer.json" in missing:
+            try:
+                from huggingface_hub import hf_hub_download
+            except ImportError:
+                hf_hub_download = None
+            if hf_hub_download is None:
+                raise FileNotFoundError(
+                    f"ONNX model files not found in {directory}; install huggingface_hub or run "
+                    f"'python -m app.services.embedding_backends export'"
+                )
+            remote = {"model.onnx": "onnx/model.onnx", "tokenizer.json": "tokenizer.json", "modules.json": "modules.json"}
+            for f in missing:
+                try:
+                    paths[f] = hf_hub_download(name, remote[f])
+                except Exception:
+                    if f != "modules.json":
+                        raise
+        return paths["model.onnx"], paths["tokenizer.json"], paths["modules.json"] if os.path.exists(paths["modules.json"]) else None
+
+    @staticmethod
+    def _quantize(model_path: str, quantized_path: str) -> str:
+        #int8 weights, activations quantized on the fly; written once next to the model
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            os.makedirs(os.path.dirname(quantized_path), exist_ok=True)
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, convert_to_numpy: bool = True) -> np.ndarray:
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        out: List[np.ndarray] = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            out.append(pooled.astype(np.float32))
+
+        if not out:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        embeddings = np.concatenate(out)
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self.dimension is None:
+            self.dimension = int(self.encode(["dimension"]).shape[1])
+        return self.dimension
+
+
+def export_onnx(name: str, directory: str):
+    #One-off export of a sentence-transformers model's transformer to ONNX,
+    #for models whose repo has no onnx/model.onnx. Needs torch.
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(name, device="cpu")
+    transformer = model[0].auto_model.eval()
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)[0]
+
+    os.makedirs(directory, exist_ok=True)
+    model.tokenizer.save_pretrained(directory)
+    #records whether the pipeline normalizes, as the model repo's modules.json does
+    with open(os.path.join(directory, "modules.json"), "w", encoding="utf-8") as f:
+        json.dump([{"type": f"{type(m).__module__}.{type(m).__name__}"} for m in model], f)
+
+    sample = model.tokenizer(["export"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    torch.onnx.export(
+        LastHiddenState(),
+        tuple(sample[n] for n in names),
+        os.path.join(directory, "model.onnx"),
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+        opset_version=14,
+    )
+    print(f"Exported {name} to {directory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend utilities")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL)
+    parser.add_argument("--out", default=None, help="defaults to ONNX_MODEL_DIR/<model>")
+    args = parser.parse_args()
+    export_onnx(args.model, args.out or model_dir(args.model))
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from app.core.config import Config
+
+# SQL IN (...) lists are split into groups this size to stay under SQLite's variable limit
+_SQL_BATCH = 500
+
+
+class EmbeddingCache:
+    #On-disk content-addressed cache of chunk embeddings.
+    #Rows are keyed by (model name, sha256 of whitespace-normalized text) and
+    #evicted least-recently-used once max_entries is exceeded. Opening the
+    #cache with a different model than the one recorded drops every row.
+
+    def __init__(self, path: str = Config.EMBED_CACHE_PATH, model_name: str = Config.EMBEDDING_MODEL,
+                 max_entries: int = Config.EMBED_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, last_used INTEGER NOT NULL, "
+            "PRIMARY KEY (model, hash))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        self._check_model()
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _check_model(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+        if row is None or row[0] != self.model_name:
+            if row is not None:
+                print(f"Embedding model changed ({row[0]} -> {self.model_name}), clearing embedding cache")
+            self.conn.execute("DELETE FROM embeddings")
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('model', ?)", (self.model_name,))
+        self.conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        #Returns ({index: vector} for hits, [indexes of misses])
+        hashes = [self.text_hash(t) for t in texts]
+        found: Dict[str, bytes] = {}
+        unique = list(dict.fromkeys(hashes))
+
+        with self._lock:
+            for start in range(0, len(unique), _SQL_BATCH):
+                group = unique[start:start + _SQL_BATCH]
+                marks = ",".join("?" * len(group))
+                rows = self.conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({marks})",
+                    [self.model_name, *group],
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time_ns()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, self.model_name, h) for h in found],
+                )
+                self.conn.commit()
+
+            hits = {i: np.frombuffer(found[h], dtype=np.float32) for i, h in enumerate(hashes) if h in found}
+            missing = [i for i, h in enumerate(hashes) if h not in found]
+            self.hits += len(hits)
+            self.misses += len(missing)
+
+        return hits, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        now = time.time_ns()
+        rows = [
+            (self.model_name, self.text_hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            #entries is kept up to date from the rows each statement changed, not recounted
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            inserted = self.conn.total_changes - before
+            self.entries += inserted
+            if inserted < len(rows):
+                #rows already cached (or repeated in this batch): refresh them
+                self.conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_used = ? WHERE model = ? AND hash = ?",
+                    [(vector, used, model, h) for model, h, vector, used in rows],
+                )
+            overflow = self.entries - self.max_entries
+            if overflow > 0:
+                evicted = self.conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+                self.entries -= evicted
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": self.entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,16 +1,151 @@
-from typing import List
-from sentence_transformers import SentenceTransformer
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+import numpy as np
 from app.core.config import Config
+from app.services.embedding_cache import EmbeddingCache
+
+_models: Dict[Tuple[str, str], object] = {}
+_models_lock = threading.Lock()
+
+
+def load_model(name: str = Config.EMBEDDING_MODEL, backend: str = Config.EMBEDDING_BACKEND):
+    #One model per process, name and backend (see embedding_backends); the
+    #backend's libraries are imported on first use. Loaded in a parent process
+    #before workers fork (PRELOAD_EMBEDDING_MODEL), the weights are shared copy-on-write.
+    with _models_lock:
+        model = _models.get((name, backend))
+        if model is None:
+            from app.services.embedding_backends import create_model
+            model = _models[(name, backend)] = create_model(name, backend)
+        return model
+
+
+class QueryBatcher:
+    #Merges concurrent single-text embed requests into one forward pass.
+    #The first request opens a window of `window` seconds; everything that
+    #arrives before it closes (up to max_batch) is encoded together.
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], window: float, max_batch: int):
+        self.encode = encode
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                embeddings = self.encode([text for text, _ in batch])
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
 
 
 class EmbeddingManager:
-    def __init__(self):
-        self.model = SentenceTransformer(Config.EMBEDDING_MODEL)
+    #The model is loaded on first use (or by load()), so constructing the
+    #manager is cheap and the app can answer liveness checks meanwhile.
+    def __init__(self, model_name: str = Config.EMBEDDING_MODEL, backend: str = Config.EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self._model = None
+        self._dimension = None
+        self.cache = EmbeddingCache(model_name=self.model_id) if Config.EMBED_CACHE_ENABLED else None
+
+        self.batcher = None
+        if Config.EMBED_BATCH_WINDOW_MS > 0:
+            self.batcher = QueryBatcher(
+                self._encode,
+                window=Config.EMBED_BATCH_WINDOW_MS / 1000.0,
+                max_batch=Config.EMBED_MAX_QUERY_BATCH,
+            )
+
+    @property
+    def model_id(self) -> str:
+        #vectors differ slightly between backends, so each counts as its own model
+        return self.model_name if self.backend == "torch" else f"{self.model_name} ({self.backend})"
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_model(self.model_name, self.backend)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.model.get_sentence_embedding_dimension()
+        return self._dimension
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        return self.model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=Config.EMBED_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        #Returns a float32 (len(texts), dim) array.
+        #Cached rows are reused; only cache misses go through the model.
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        hits, missing = self.cache.get_many(texts)
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, vector in hits.items():
+            out[i] = vector
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = self._embed_uncached(missing_texts)
+            out[missing] = fresh
+            self.cache.put_many(missing_texts, fresh)
+        return out
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        #Texts are encoded in length-sorted batches so each forward pass pads
+        #to similar lengths; rows are scattered back into input order.
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return out
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        embeddings = self.model.encode(texts, show_progress_bar=False)
-        return embeddings.tolist()
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for start in range(0, len(order), Config.EMBED_BATCH_SIZE):
+            idx = order[start:start + Config.EMBED_BATCH_SIZE]
+            out[idx] = self._encode([texts[i] for i in idx])
+        return out
 
-    def embed_text(self, text: str) -> List[float]:
-        embedding = self.model.encode([text], show_progress_bar=False)
-        return embedding[0].tolist()
+    def embed_text(self, text: str) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.submit(text).result()
+        return self._encode([text])[0]
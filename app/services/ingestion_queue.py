@@ -0,0 +1,140 @@
+import queue
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app.core.config import Config
+from app.services.upload_spool import SpooledPDF
+
+# Stage names reported by DocumentProcessor.process_document, in order
+INGEST_STAGES = [
+    "text_extraction",
+    "text_cleaning",
+    "metadata",
+    "chunking",
+    "embedding",
+    "vector_store",
+    "s3_upload",
+]
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    filename: str
+    status: str = "queued"  # queued | running | completed | failed
+    started_stages: List[str] = field(default_factory=list)
+    completed_stages: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    result: Optional[Dict] = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def stage(self) -> Optional[str]:
+        #stages overlap while a document streams through; report the earliest unfinished one
+        for stage in INGEST_STAGES:
+            if stage in self.started_stages and stage not in self.completed_stages:
+                return stage
+        return None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "completed_stages": list(self.completed_stages),
+            "progress": len(self.completed_stages) / len(INGEST_STAGES),
+            "error": self.error,
+            "doc_id": self.result["doc_id"] if self.result else None,
+            "chunk_count": self.result["chunk_count"] if self.result else None,
+            "deduplicated": self.result.get("deduplicated") if self.result else None,
+            "duplicate_of": self.result.get("duplicate_of") if self.result else None,
+            "replaced": self.result.get("replaced") if self.result else None,
+            "reused_chunks": self.result.get("reused_chunks") if self.result else None,
+            "embedded_chunks": self.result.get("embedded_chunks") if self.result else None,
+            "deleted_chunks": self.result.get("deleted_chunks") if self.result else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class IngestionQueue:
+    def __init__(self, doc_processor, workers: int = Config.INGEST_WORKERS,
+                 on_complete: Optional[Callable[[Dict], None]] = None):
+        self.doc_processor = doc_processor
+        self.workers = workers
+        self.on_complete = on_complete
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    def submit(self, pdf_bytes, filename: str) -> IngestionJob:
+        #pdf_bytes: bytes or a SpooledPDF, whose spool file is removed once the job ends
+        job = IngestionJob(job_id=uuid.uuid4().hex, filename=filename)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._prune()
+        self._queue.put((job, pdf_bytes))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _prune(self):
+        #drop the oldest finished jobs once history exceeds the limit
+        overflow = len(self.jobs) - Config.INGEST_JOB_HISTORY
+        if overflow <= 0:
+            return
+        for job_id in [j.job_id for j in self.jobs.values() if j.status in ("completed", "failed")][:overflow]:
+            del self.jobs[job_id]
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, pdf_bytes = item
+            self._run(job, pdf_bytes)
+
+    def _run(self, job: IngestionJob, pdf_bytes):
+        def on_stage(stage, done):
+            if done:
+                job.completed_stages.append(stage)
+            else:
+                job.started_stages.append(stage)
+            job.updated_at = datetime.now().isoformat()
+
+        job.status = "running"
+        try:
+            result = self.doc_processor.process_document(pdf_bytes, job.filename, on_stage=on_stage)
+            job.result = result
+            job.status = "completed"
+            if self.on_complete is not None:
+                self.on_complete(result)
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            if isinstance(pdf_bytes, SpooledPDF):
+                pdf_bytes.close()
+        job.updated_at = datetime.now().isoformat()
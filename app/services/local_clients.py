@@ -0,0 +1,199 @@
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Tuple
+from botocore.exceptions import ClientError
+
+# In-process stand-ins for the boto3 clients S3Manager and BedrockLLM use, so the
+# app, the ingestion pipeline and the benchmarks run without AWS credentials:
+#   S3_BACKEND=memory LLM_BACKEND=stub VECTOR_BACKEND=local uvicorn app.main:app
+# They implement only the calls this codebase makes, with the same request and
+# response shapes, so S3Manager and BedrockLLM run unchanged on top of them.
+
+
+def _client_error(code: str, operation: str, message: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class InMemoryS3Client:
+    #Buckets are dicts of key -> (body, content type, last modified), kept
+    #for the life of the process.
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.buckets: Dict[str, Dict[str, Tuple[bytes, str, datetime]]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, bucket: str, operation: str) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        objects = self.buckets.get(bucket)
+        if objects is None:
+            raise _client_error("NoSuchBucket", operation, f"The specified bucket does not exist: {bucket}")
+        return objects
+
+    def head_bucket(self, Bucket: str):
+        with self._lock:
+            self._bucket(Bucket, "HeadBucket")
+        return {}
+
+    def create_bucket(self, Bucket: str, **kwargs):
+        with self._lock:
+            self.buckets.setdefault(Bucket, {})
+        return {"Location": f"/{Bucket}"}
+
+    def put_object(self, Bucket: str, Key: str, Body, ContentType: str = "binary/octet-stream", **kwargs):
+        data = Body.read() if hasattr(Body, "read") else bytes(Body)
+        with self._lock:
+            self._bucket(Bucket, "PutObject")[Key] = (data, ContentType, datetime.now(timezone.utc))
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, ExtraArgs: Optional[Dict] = None, Callback=None, Config=None):
+        #read part by part like a multipart transfer, with one request's latency per part
+        part_size = Config.multipart_chunksize if Config is not None else 8 * 1024 * 1024
+        parts = []
+        for part in iter(lambda: Fileobj.read(part_size), b""):
+            with self._lock:
+                self._bucket(Bucket, "UploadPart")
+            parts.append(part)
+            if Callback is not None:
+                Callback(len(part))
+        self.put_object(Bucket, Key, b"".join(parts), **(ExtraArgs or {}))
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        with self._lock:
+            item = self._bucket(Bucket, "GetObject").get(Key)
+        if item is None:
+            raise _client_error("NoSuchKey", "GetObject", "The specified key does not exist.")
+        data, content_type, modified = item
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), "ContentType": content_type, "LastModified": modified}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs):
+        with self._lock:
+            self._bucket(Bucket, "DeleteObject").pop(Key, None)
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", ContinuationToken: Optional[str] = None,
+                        MaxKeys: int = 1000, **kwargs):
+        with self._lock:
+            objects = self._bucket(Bucket, "ListObjectsV2")
+            keys = sorted(k for k in objects if k.startswith(Prefix) and (ContinuationToken is None or k > ContinuationToken))
+            page = [(k, objects[k]) for k in keys[:MaxKeys]]
+        response = {
+            "Contents": [{"Key": k, "Size": len(data), "LastModified": modified} for k, (data, _, modified) in page],
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1][0]
+        if not page:
+            del response["Contents"]
+        return response
+
+    def get_paginator(self, operation: str):
+        if operation != "list_objects_v2":
+            raise NotImplementedError(operation)
+        return _ListObjectsPaginator(self)
+
+
+class _ListObjectsPaginator:
+    def __init__(self, client: InMemoryS3Client):
+        self.client = client
+
+    def paginate(self, **kwargs) -> Iterator[Dict]:
+        token = None
+        while True:
+            page = self.client.list_objects_v2(ContinuationToken=token, **kwargs)
+            yield page
+            if not page["IsTruncated"]:
+                return
+            token = page["NextContinuationToken"]
+
+
+class StubBedrockClient:
+    #Stands in for boto3.client("bedrock-runtime") with Anthropic-format
+    #responses: the answer is n_tokens deltas, the first after
+    #first_token_latency and the rest token_latency apart. Answers and token
+    #usage depend only on the request, so runs are repeatable.
+    #Faults, for exercising BedrockInvoker:
+    #  max_tps       - requests beyond this many per second (token bucket with a
+    #                  one second burst) fail with ThrottlingException, like an account quota
+    #  throttle_rate - share of the other requests throttled at random
+    #  spike_rate    - share of requests whose first token waits spike_latency longer
+
+    def __init__(self, first_token_latency: float = 0.4, token_latency: float = 0.02, n_tokens: int = 100,
+                 max_tps: float = 0.0, throttle_rate: float = 0.0, spike_rate: float = 0.0, spike_latency: float = 0.0,
+                 seed: int = 0):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.n_tokens = n_tokens
+        self.max_tps = max_tps
+        self.throttle_rate = throttle_rate
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._tokens_left = max_tps
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _admit(self, operation: str) -> float:
+        #raises a throttle or returns the extra first token latency of this request
+        with self._lock:
+            self.calls += 1
+            throttled = self._random.random() < self.throttle_rate
+            if self.max_tps:
+                now = time.monotonic()
+                self._tokens_left = min(self.max_tps, self._tokens_left + (now - self._refilled) * self.max_tps)
+                self._refilled = now
+                if self._tokens_left < 1:
+                    throttled = True
+                elif not throttled:
+                    self._tokens_left -= 1
+            if throttled:
+                self.throttled += 1
+            spike = self.spike_latency if self._random.random() < self.spike_rate else 0.0
+        if throttled:
+            raise ClientError({
+                "Error": {"Code": "ThrottlingException", "Message": "Too many requests, please wait before trying again."},
+                "ResponseMetadata": {"HTTPStatusCode": 429},
+            }, operation)
+        return spike
+
+    def _tokens(self):
+        return [f"token{i} " for i in range(self.n_tokens)]
+
+    @staticmethod
+    def _input_tokens(body: str) -> int:
+        return len(json.loads(body)["messages"][0]["content"]) // 4
+
+    def invoke_model(self, modelId, body):
+        spike = self._admit("InvokeModel")
+        time.sleep(spike + self.first_token_latency + self.token_latency * (self.n_tokens - 1))
+        payload = {
+            "content": [{"type": "text", "text": "".join(self._tokens())}],
+            "usage": {"input_tokens": self._input_tokens(body), "output_tokens": self.n_tokens},
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode())}
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        spike = self._admit("InvokeModelWithResponseStream")
+        input_tokens = self._input_tokens(body)
+
+        def events():
+            start = {"type": "message_start", "message": {"usage": {"input_tokens": input_tokens, "output_tokens": 1}}}
+            yield {"chunk": {"bytes": json.dumps(start).encode()}}
+            for i, token in enumerate(self._tokens()):
+                time.sleep(spike + self.first_token_latency if i == 0 else self.token_latency)
+                delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}
+                yield {"chunk": {"bytes": json.dumps(delta).encode()}}
+            end = {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": self.n_tokens}}
+            yield {"chunk": {"bytes": json.dumps(end).encode()}}
+            yield {"chunk": {"bytes": json.dumps({"type": "message_stop"}).encode()}}
+
+        return {"body": events()}
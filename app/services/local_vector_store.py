@@ -0,0 +1,347 @@
+import json
+import os
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Set
+import numpy as np
+from app.core.config import Config
+from app.services.vector_store import QueryFilter, VectorStore
+
+try:
+    import hnswlib
+except ImportError:  # optional: only needed for LOCAL_INDEX_HNSW
+    hnswlib = None
+
+
+class LocalVectorStore(VectorStore):
+    #Embedded vector store: a memory-mapped float32 matrix on disk plus a
+    #JSON-lines log of row metadata. Search is an exact NumPy brute-force
+    #top-k, or an HNSW graph when LOCAL_INDEX_HNSW is set and hnswlib is
+    #installed. Deletes are tombstones; rows are never rewritten in place.
+    #doc_rows partitions rows by document, so a query filtered on doc ids
+    #searches only those documents' rows; doc type and section are kept as
+    #per-row integer codes so the other filters are vectorized.
+    #
+    #  meta.json    - {"dimension": d}, written with the first rows
+    #  vectors.f32  - row-major float32, one embedding per row
+    #  rows.jsonl   - {"op": "add", "id", "document", "metadata"} per row,
+    #                 {"op": "delete", "rows": [...]} for tombstones and
+    #                 {"op": "update", "rows": [...], "metadatas": [...]}
+    #
+    #Vectors are appended before their log records, so after a crash the
+    #matrix may run past the logged rows (or the log end in a partial line);
+    #loading truncates both back to the last complete record.
+
+    def __init__(self, path: str = Config.LOCAL_INDEX_DIR, use_hnsw: bool = Config.LOCAL_INDEX_HNSW,
+                 ef: int = Config.LOCAL_INDEX_HNSW_EF):
+        self.path = path
+        self.ef = ef
+        os.makedirs(path, exist_ok=True)
+        self.meta_path = os.path.join(path, "meta.json")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.rows_path = os.path.join(path, "rows.jsonl")
+
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.id_to_row: Dict[str, int] = {}
+        self.doc_rows: Dict[str, Set[int]] = {}
+        self.doc_type_codes: Dict[Optional[str], int] = {}
+        self.section_codes: Dict[Optional[str], int] = {}
+        self.row_doc_types = array("i")
+        self.row_sections = array("i")
+        self.dimension: Optional[int] = None
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.sq_norms = np.zeros(0, dtype=np.float32)
+
+        self.hnsw = None
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        if use_hnsw and hnswlib is None:
+            print("LOCAL_INDEX_HNSW is set but hnswlib is not installed; using exact search")
+
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- persistence -------------------------------------------------------
+
+    def _load(self):
+        alive: List[bool] = []
+        if os.path.exists(self.rows_path):
+            with open(self.rows_path, "rb") as f:
+                data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                print(f"Dropping a partial record at the end of {self.rows_path}")
+                os.truncate(self.rows_path, end)
+            for line in data[:end].splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        self._index_row(record["id"], record["document"], record["metadata"])
+                        alive.append(True)
+                    elif record["op"] == "update":
+                        for row, metadata in zip(record["rows"], record["metadatas"]):
+                            self._set_metadata(row, metadata)
+                    else:
+                        for row in record["rows"]:
+                            alive[row] = False
+                            self._unindex_row(row)
+
+        self.alive = np.array(alive, dtype=bool)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dimension = json.load(f)["dimension"]
+        elif self.ids:
+            #indexes written before meta.json: the matrix then holds exactly the logged rows
+            self.dimension = os.path.getsize(self.vectors_path) // (4 * len(self.ids))
+            self._write_meta()
+
+        if self.dimension is not None:
+            expected = 4 * self.dimension * len(self.ids)
+            size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            if size < expected:
+                raise ValueError(f"{self.vectors_path} holds {size} bytes, {expected} expected for {len(self.ids)} rows")
+            if size > expected:
+                #vectors of an add whose log records were never written
+                print(f"Dropping {(size - expected) // (4 * self.dimension)} unlogged rows from {self.vectors_path}")
+                os.truncate(self.vectors_path, expected)
+        self._remap()
+
+        if self.use_hnsw and self.ids:
+            self._build_hnsw()
+
+    def _remap(self):
+        if not self.ids:
+            return
+        self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dimension))
+        if len(self.sq_norms) != len(self.ids):
+            new = np.einsum("ij,ij->i", self.matrix[len(self.sq_norms):], self.matrix[len(self.sq_norms):])
+            self.sq_norms = np.concatenate([self.sq_norms, new.astype(np.float32)])
+
+    def _build_hnsw(self):
+        self.hnsw = hnswlib.Index(space="l2", dim=self.dimension)
+        self.hnsw.init_index(max_elements=max(1024, len(self.ids) * 2), ef_construction=200, M=16)
+        self.hnsw.set_ef(self.ef)
+        self.hnsw.add_items(np.asarray(self.matrix), np.arange(len(self.ids)))
+        for row in np.flatnonzero(~self.alive):
+            self.hnsw.mark_deleted(int(row))
+
+    def _write_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _append_log(self, records: List[Dict]):
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def _index_row(self, chunk_id: str, document: str, metadata: Dict):
+        row = len(self.ids)
+        self.ids.append(chunk_id)
+        self.documents.append(document)
+        self.metadatas.append(metadata)
+        self.id_to_row[chunk_id] = row
+        self.doc_rows.setdefault(metadata.get("doc_id"), set()).add(row)
+        self.row_doc_types.append(self._code(self.doc_type_codes, metadata.get("doc_type")))
+        self.row_sections.append(self._code(self.section_codes, metadata.get("section")))
+        return row
+
+    def _set_metadata(self, row: int, metadata: Dict):
+        self.metadatas[row] = metadata
+        self.row_doc_types[row] = self._code(self.doc_type_codes, metadata.get("doc_type"))
+        self.row_sections[row] = self._code(self.section_codes, metadata.get("section"))
+
+    @staticmethod
+    def _code(codes: Dict[Optional[str], int], value: Optional[str]) -> int:
+        return codes.setdefault(value, len(codes))
+
+    def _unindex_row(self, row: int):
+        chunk_id = self.ids[row]
+        if self.id_to_row.get(chunk_id) == row:
+            del self.id_to_row[chunk_id]
+        rows = self.doc_rows.get(self.metadatas[row].get("doc_id"))
+        if rows is not None:
+            rows.discard(row)
+
+    # --- VectorStore ---------------------------------------------------------
+
+    def add_chunks(self, chunks: List[Dict], doc_id: str, embeddings: np.ndarray, start: int = 0):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if not len(chunks):
+            return
+        ids = self.chunk_ids(chunks, doc_id, start)
+        metadatas = self.chunk_metadatas(chunks, doc_id, start)
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = embeddings.shape[1]
+                self._write_meta()
+            elif embeddings.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.dimension}")
+
+            #re-adding an existing id replaces the old row
+            replaced = [self.id_to_row[i] for i in ids if i in self.id_to_row]
+            if replaced:
+                self._delete_rows(replaced)
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(embeddings.tobytes())
+
+            first_row = len(self.ids)
+            records = []
+            for chunk_id, chunk, metadata in zip(ids, chunks, metadatas):
+                self._index_row(chunk_id, chunk["text"], metadata)
+                records.append({"op": "add", "id": chunk_id, "document": chunk["text"], "metadata": metadata})
+            self._append_log(records)
+
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            self._remap()
+
+            if self.use_hnsw:
+                if self.hnsw is None:
+                    self._build_hnsw()
+                else:
+                    if self.hnsw.get_max_elements() < len(self.ids):
+                        self.hnsw.resize_index(len(self.ids) * 2)
+                    self.hnsw.add_items(embeddings, np.arange(first_row, len(self.ids)))
+
+    def query(self, query_embedding: np.ndarray, n_results: int = 5, filters: Optional[QueryFilter] = None) -> Dict:
+        return self.query_many(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1), n_results, filters)
+
+    def query_many(self, query_embeddings: np.ndarray, n_results: int = 5, filters: Optional[QueryFilter] = None) -> Dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries.reshape(len(queries), -1)
+
+        with self._lock:
+            matrix, sq_norms, alive = self.matrix, self.sq_norms, self.alive
+            hnsw = self.hnsw
+            candidates = self._filter_rows(filters) if filters is not None and not filters.is_empty() else None
+
+        if candidates is not None:
+            candidates = candidates[alive[candidates]]
+            k = min(n_results, len(candidates))
+        else:
+            k = min(n_results, int(alive.sum()))
+        if k == 0:
+            empty = [[] for _ in range(len(queries))]
+            return {"ids": empty, "documents": list(empty), "metadatas": list(empty), "distances": list(empty)}
+
+        if candidates is not None:
+            #scoped queries search only the matching rows, exactly
+            rows, dists = self.exact_top_k_many(queries, matrix[candidates], sq_norms[candidates], None, k)
+            rows = candidates[rows]
+        elif hnsw is not None:
+            rows, dists = hnsw.knn_query(queries, k=k)
+        else:
+            rows, dists = self.exact_top_k_many(queries, matrix, sq_norms, alive, k)
+
+        results = {
+            "ids": [[self.ids[r] for r in row] for row in rows],
+            "documents": [[self.documents[r] for r in row] for row in rows],
+            "metadatas": [[self.metadatas[r] for r in row] for row in rows],
+            "distances": [[float(d) for d in row] for row in dists],
+        }
+        return self.filter_by_distance(results)
+
+    def _filter_rows(self, filters: QueryFilter) -> np.ndarray:
+        #Rows matching a filter (dead rows included; callers mask by alive).
+        #Doc ids pick partitions from doc_rows; doc type and section prefix
+        #compare the per-row codes against the codes of matching values.
+        if filters.doc_ids:
+            rows = [r for doc_id in dict.fromkeys(filters.doc_ids) for r in self.doc_rows.get(doc_id, ())]
+            rows = np.sort(np.array(rows, dtype=np.int64))
+        else:
+            rows = np.arange(len(self.ids), dtype=np.int64)
+
+        if filters.doc_type:
+            code = self.doc_type_codes.get(filters.doc_type, -1)
+            rows = rows[np.frombuffer(self.row_doc_types, dtype=np.int32)[rows] == code]
+        if filters.section_prefix:
+            prefix = filters.section_prefix.lower()
+            codes = [c for section, c in self.section_codes.items() if str(section or "").lower().startswith(prefix)]
+            rows = rows[np.isin(np.frombuffer(self.row_sections, dtype=np.int32)[rows], codes)]
+        return rows
+
+    @staticmethod
+    def exact_top_k(q: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray, alive: np.ndarray, k: int):
+        #squared L2: |x|^2 - 2 x.q + |q|^2, same metric as Chroma's default
+        dists = sq_norms - 2.0 * (matrix @ q) + float(q @ q)
+        dists[~alive] = np.inf
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top], kind="stable")]
+        return top, np.maximum(dists[top], 0.0)
+
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        with self._lock:
+            rows = [(i, self.id_to_row[i]) for i in ids if i in self.id_to_row]
+            return [{"id": i, "text": self.documents[r], "metadata": self.metadatas[r]} for i, r in rows]
+
+
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        with self._lock:
+            return np.array(self.matrix[[self.id_to_row[i] for i in ids]], dtype=np.float32)
+
+    @staticmethod
+    def exact_top_k_many(queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray, alive: Optional[np.ndarray], k: int):
+        #one matrix product per block of queries, blocks sized to keep the
+        #distance matrix around 64 MB
+        block = max(1, (1 << 24) // max(1, len(matrix)))
+        all_rows, all_dists = [], []
+        for start in range(0, len(queries), block):
+            q = queries[start:start + block]
+            dists = sq_norms[:, None] - 2.0 * (matrix @ q.T) + np.einsum("ij,ij->i", q, q)[None, :]
+            if alive is not None:
+                dists[~alive] = np.inf
+            top = np.argpartition(dists, k - 1, axis=0)[:k]
+            top_dists = np.take_along_axis(dists, top, axis=0)
+            order = np.argsort(top_dists, axis=0, kind="stable")
+            all_rows.append(np.take_along_axis(top, order, axis=0).T)
+            all_dists.append(np.maximum(np.take_along_axis(top_dists, order, axis=0).T, 0.0))
+        return np.concatenate(all_rows), np.concatenate(all_dists)
+
+    def delete_by_doc_id(self, doc_id: str):
+        with self._lock:
+            rows = sorted(self.doc_rows.get(doc_id, ()))
+            if rows:
+                self._delete_rows(rows)
+            self.doc_rows.pop(doc_id, None)
+
+    def delete_chunks(self, ids: List[str]):
+        with self._lock:
+            rows = [self.id_to_row[i] for i in ids if i in self.id_to_row]
+            if rows:
+                self._delete_rows(rows)
+
+    def doc_chunks(self, doc_id: str) -> Dict[str, Dict]:
+        with self._lock:
+            return {self.ids[r]: self.metadatas[r] for r in sorted(self.doc_rows.get(doc_id, ()))}
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        with self._lock:
+            updates = [(self.id_to_row[i], m) for i, m in zip(ids, metadatas) if i in self.id_to_row]
+            for row, metadata in updates:
+                self._set_metadata(row, metadata)
+            if updates:
+                self._append_log([{"op": "update", "rows": [r for r, _ in updates], "metadatas": [m for _, m in updates]}])
+
+    def _delete_rows(self, rows: List[int]):
+        alive = self.alive.copy()
+        alive[rows] = False
+        self.alive = alive
+        for row in rows:
+            self._unindex_row(row)
+            if self.hnsw is not None:
+                self.hnsw.mark_deleted(row)
+        self._append_log([{"op": "delete", "rows": rows}])
+
+    def iter_metadatas(self, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        with self._lock:
+            metadatas = [self.metadatas[r] for r in np.flatnonzero(self.alive)]
+        for start in range(0, len(metadatas), batch_size):
+            yield metadatas[start:start + batch_size]
+
+    def count(self) -> int:
+        return int(self.alive.sum())
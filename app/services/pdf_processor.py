@@ -1,38 +1,128 @@
+import multiprocessing
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from io import BytesIO
+from typing import Dict, Iterator, List
 import PyPDF2
+from app.core.config import Config
+from app.services.upload_spool import SpooledPDF
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    #one shared pool per process; spawn so worker start-up never forks
+    #a process that already has embedding / ingest threads running
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _open_stream(pdf_bytes):
+    #pdf_bytes may be a SpooledPDF, read through a memory map when it is on disk
+    return pdf_bytes.stream() if isinstance(pdf_bytes, SpooledPDF) else BytesIO(pdf_bytes)
+
+
+def _open_reader(stream) -> PyPDF2.PdfReader:
+    pdf_reader = PyPDF2.PdfReader(stream)
+
+    # Common issue: encrypted PDFs
+    if getattr(pdf_reader, "is_encrypted", False):
+        # Try empty password first; if it fails, treat as unsupported
+        try:
+            pdf_reader.decrypt("")
+        except Exception as e:
+            raise ValueError("PDF is encrypted and cannot be processed") from e
+
+    return pdf_reader
+
+
+def _extract_page_range(pdf_bytes, start: int, end: int, pdf_reader=None) -> List[str]:
+    #runs in a pool worker: each worker parses the bytes and extracts pages [start, end)
+    if pdf_reader is None:
+        with _open_stream(pdf_bytes) as stream:
+            return _extract_page_range(pdf_bytes, start, end, _open_reader(stream))
+
+    text_parts = []
+    for i in range(start, end):
+        try:
+            text_parts.append((pdf_reader.pages[i].extract_text() or "") + "\n")
+        except Exception as e:
+            raise ValueError(f"Failed extracting text from page {i}") from e
+        #PyPDF2 keeps every object it resolves, image streams included; the
+        #pages are already loaded, so drop the rest rather than hold the file
+        pdf_reader.resolved_objects.clear()
+    return text_parts
+
+
+# doc_type is the first rule with any phrase present in the lower-cased text
+DOC_TYPE_RULES = [
+    ("EULA", ("end user license agreement", "eula")),
+    ("ToS", ("terms of service", "tos", "terms and conditions")),
+    ("Privacy Policy", ("privacy policy",)),
+]
+
+
+def _doc_type(found) -> str:
+    for doc_type, phrases in DOC_TYPE_RULES:
+        if any(phrase in found for phrase in phrases):
+            return doc_type
+    return "Other"
 
 
 class PDFProcessor:
     @staticmethod
     def extract_text(pdf_bytes):
-        if not pdf_bytes:
+        return "".join(PDFProcessor.iter_pages(pdf_bytes))
+
+    @staticmethod
+    def iter_pages(pdf_bytes) -> Iterator[str]:
+        #Yields page texts in order, each ending in "\n"; pdf_bytes may be a SpooledPDF
+        if not (pdf_bytes.size if isinstance(pdf_bytes, SpooledPDF) else pdf_bytes):
             raise ValueError("pdf_bytes is empty")
 
+        pending = deque()
+        stream = None
         try:
-            pdf_file = BytesIO(pdf_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-            # Common issue: encrypted PDFs
-            if getattr(pdf_reader, "is_encrypted", False):
-                # Try empty password first; if it fails, treat as unsupported
-                try:
-                    pdf_reader.decrypt("")
-                except Exception as e:
-                    raise ValueError("PDF is encrypted and cannot be processed") from e
-
-            text_parts = []
-            for i, page in enumerate(pdf_reader.pages):
-                try:
-                    text_parts.append((page.extract_text() or "") + "\n")
-                except Exception as e:
-                    raise ValueError(f"Failed extracting text from page {i}") from e
-
-            return "".join(text_parts)
+            stream = _open_stream(pdf_bytes)
+            pdf_reader = _open_reader(stream)
+            page_count = len(pdf_reader.pages)
+
+            # Small documents: process start-up and re-parsing cost more than they save
+            if Config.PDF_WORKERS <= 1 or page_count < Config.PDF_PARALLEL_MIN_PAGES:
+                for i in range(page_count):
+                    yield _extract_page_range(pdf_bytes, i, i + 1, pdf_reader)[0]
+                return
+
+            # Shard page ranges across the pool, keeping at most 2 shards per
+            # worker in flight so a slow consumer never buffers the whole document
+            shard = max(1, min(Config.PDF_SHARD_PAGES, -(-page_count // Config.PDF_WORKERS)))
+            ranges = deque((s, min(s + shard, page_count)) for s in range(0, page_count, shard))
+            pool = _get_pool()
+
+            while ranges or pending:
+                while ranges and len(pending) < Config.PDF_WORKERS * 2:
+                    start, end = ranges.popleft()
+                    pending.append(pool.submit(_extract_page_range, pdf_bytes, start, end))
+                for page_text in pending.popleft().result():
+                    yield page_text
 
         except Exception as e:
             raise ValueError(f"Failed to read PDF: {e}") from e
+        finally:
+            for future in pending:
+                future.cancel()
+            if stream is not None:
+                stream.close()
 
     @staticmethod
     def clean_text(text):
@@ -78,17 +168,56 @@ class PDFProcessor:
 
         try:
             text_lower = text.lower()
-
-            if ("end user license agreement" in text_lower) or ("eula" in text_lower):
-                metadata["doc_type"] = "EULA"
-            elif ("terms of service" in text_lower) or ("tos" in text_lower) or ("terms and conditions" in text_lower):
-                metadata["doc_type"] = "ToS"
-            elif "privacy policy" in text_lower:
-                metadata["doc_type"] = "Privacy Policy"
-            else:
-                metadata["doc_type"] = "Other"
+            found = {phrase for _, phrases in DOC_TYPE_RULES for phrase in phrases if phrase in text_lower}
+            metadata["doc_type"] = _doc_type(found)
 
             return metadata
 
         except Exception as e:
             raise ValueError(f"Failed extracting metadata for '{filename}'") from e
+
+
+class MetadataAccumulator:
+    #Builds the same fields as PDFProcessor.extract_metadata one cleaned page
+    #at a time, so the streaming pipeline never holds the whole text.
+    #Pages are newline-separated, so no doc type phrase can span two pages.
+    #char_count counts pages joined by newlines, before blank-line collapsing.
+
+    def __init__(self, filename):
+        if filename is None:
+            raise ValueError("filename is None")
+        if not isinstance(filename, str):
+            raise TypeError("filename must be a string")
+
+        self.filename = filename
+        self.word_count = 0
+        self.char_count = 0
+        self.found = set()
+
+    def update(self, clean_page: str):
+        if not clean_page:
+            return
+        if self.char_count:
+            self.char_count += 1
+        self.char_count += len(clean_page)
+        self.word_count += len(clean_page.split())
+
+        text_lower = clean_page.lower()
+        for _, phrases in DOC_TYPE_RULES:
+            for phrase in phrases:
+                if phrase in text_lower:
+                    self.found.add(phrase)
+
+    @property
+    def doc_type(self) -> str:
+        #doc type of the pages seen so far
+        return _doc_type(self.found)
+
+    def result(self) -> Dict:
+        return {
+            "filename": self.filename,
+            "doc_type": self.doc_type,
+            "timestamp": datetime.now().isoformat(),
+            "word_count": self.word_count,
+            "char_count": self.char_count,
+        }
@@ -1,42 +1,348 @@
-from typing import Dict
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from app.core.config import Config
+from app.core.metrics import QUERIES, Stage, count, observe_stage
+from app.services.answer_cache import AnswerCache
 from app.services.bedrockllm import BedrockLLM
+from app.services.bm25_index import reciprocal_rank_fusion
+from app.services.context_builder import ContextBuilder
 from app.services.embedding_manager import EmbeddingManager
-from app.services.chroma_manager import ChromaDBManager
+from app.services.reranker import Reranker
+from app.services.vector_store import QueryFilter, create_vector_store
 
 class RAGSystem:
-    def __init__(self):
-        self.embedding_manager = EmbeddingManager()
-        self.chroma_manager = ChromaDBManager()
-        self.bedrock_llm = BedrockLLM()
+    def __init__(self, embedding_manager=None, vector_store=None, bedrock_llm=None, bm25_index=None, reranker=None):
+        self.embedding_manager = embedding_manager or EmbeddingManager()
+        self.vector_store = vector_store or create_vector_store()
+        self.bedrock_llm = bedrock_llm or BedrockLLM()
+        #shared with DocumentProcessor, which keeps it in sync; None = dense-only retrieval
+        self.bm25_index = bm25_index
+        #cross-encoder over RERANK_CANDIDATES retrieved chunks; None = retrieval order
+        self.reranker = reranker if reranker is not None else (Reranker() if Config.RERANK_ENABLED else None)
+        self.answer_cache = AnswerCache() if Config.ANSWER_CACHE_ENABLED else None
+        self.context_builder = ContextBuilder()
 
-    def query(self, query, top_k: int = Config.TOP_K_CHUNKS) -> Dict:
-        query_embedding = self.embedding_manager.embed_texts(query)
-        results = self.chroma_manager.query(query_embedding, n_results=top_k)
+        #bounded pools so encode / network calls never run on the event loop
+        self.embed_executor = ThreadPoolExecutor(
+            max_workers=Config.EMBED_WORKERS, thread_name_prefix="embed"
+        )
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=Config.VECTOR_CONCURRENCY + Config.BEDROCK_CONCURRENCY,
+            thread_name_prefix="rag-io",
+        )
+        self.vector_limit = asyncio.Semaphore(Config.VECTOR_CONCURRENCY)
+        self.bedrock_limit = asyncio.Semaphore(Config.BEDROCK_CONCURRENCY)
+
+    def query(self, query, top_k: int = Config.TOP_K_CHUNKS, filters: Optional[QueryFilter] = None) -> Dict:
+        #results carry "timings": seconds per stage of this query (see app.core.metrics)
+        timings: Dict[str, float] = {}
+        with Stage("query", timings):
+            query_embedding, retrieved_chunks = self.retrieve(query, top_k, filters, timings)
+            cached = self._cached_result(query, query_embedding, retrieved_chunks)
+            if cached is not None:
+                return self._timed(cached, timings)
+
+            with Stage("context_build", timings):
+                context, context_stats = self.context_builder.build(retrieved_chunks)
+
+            with Stage("llm_generation", timings):
+                answer = self.bedrock_llm.generate_response(query, context)
+            self._remember(query, query_embedding, retrieved_chunks, answer, timings["llm_generation"])
+
+            return self._timed(self._build_result(query, answer, retrieved_chunks, context_stats=context_stats), timings)
+
+    async def aquery(self, query, top_k: int = Config.TOP_K_CHUNKS, filters: Optional[QueryFilter] = None) -> Dict:
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+
+        with Stage("query", timings):
+            query_embedding, retrieved_chunks = await self._aretrieve(query, top_k, filters, timings)
+            cached = self._cached_result(query, query_embedding, retrieved_chunks)
+            if cached is not None:
+                return self._timed(cached, timings)
+
+            with Stage("context_build", timings):
+                context, context_stats = self.context_builder.build(retrieved_chunks)
+
+            async with self.bedrock_limit:
+                with Stage("llm_generation", timings):
+                    answer = await loop.run_in_executor(
+                        self.io_executor, self.bedrock_llm.generate_response, query, context
+                    )
+            self._remember(query, query_embedding, retrieved_chunks, answer, timings["llm_generation"])
+
+            return self._timed(self._build_result(query, answer, retrieved_chunks, context_stats=context_stats), timings)
+
+    async def astream(self, query, top_k: int = Config.TOP_K_CHUNKS,
+                      filters: Optional[QueryFilter] = None) -> AsyncIterator[Tuple[str, object]]:
+        #Yields ("chunks", [...]) first, then ("token", text) as the answer is
+        #generated, then ("done", result) with the full QueryResponse fields.
+        #The "done" timings also give llm_first_token, the wait for the first token.
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        query_embedding, retrieved_chunks = await self._aretrieve(query, top_k, filters, timings)
+        yield "chunks", retrieved_chunks
+
+        cached = self._cached_result(query, query_embedding, retrieved_chunks)
+        if cached is not None:
+            yield "token", cached["answer"]
+            timings["query"] = time.perf_counter() - start
+            observe_stage("query", timings["query"])
+            yield "done", self._timed(cached, timings)
+            return
+
+        with Stage("context_build", timings):
+            context, context_stats = self.context_builder.build(retrieved_chunks)
+        parts: List[str] = []
+
+        async with self.bedrock_limit:
+            with Stage("llm_generation", timings) as generation:
+                tokens = self.bedrock_llm.stream_response(query, context)
+                while True:
+                    token = await loop.run_in_executor(self.io_executor, next, tokens, None)
+                    if token is None:
+                        break
+                    if not parts:
+                        timings["llm_first_token"] = time.perf_counter() - generation.start
+                        observe_stage("llm_first_token", timings["llm_first_token"])
+                    parts.append(token)
+                    yield "token", token
+
+        answer = "".join(parts)
+        self._remember(query, query_embedding, retrieved_chunks, answer, timings["llm_generation"])
+        timings["query"] = time.perf_counter() - start
+        observe_stage("query", timings["query"])
+        yield "done", self._timed(self._build_result(query, answer, retrieved_chunks, context_stats=context_stats), timings)
+
+    def retrieve(self, query, top_k: int = Config.TOP_K_CHUNKS, filters: Optional[QueryFilter] = None,
+                 timings: Optional[Dict[str, float]] = None) -> Tuple[object, List[Dict]]:
+        #filters scope retrieval to documents, a doc type and/or a section prefix
+        with Stage("query_embed", timings):
+            query_embedding = self.embedding_manager.embed_text(query)
+        with Stage("vector_search", timings):
+            results = self.vector_store.query(query_embedding, n_results=self._dense_k(top_k), filters=filters)
+
+        retrieved_chunks = self._collect_chunks(results)
+        if self.bm25_index is not None:
+            with Stage("keyword_search", timings):
+                sparse = self.bm25_index.search(query, Config.HYBRID_CANDIDATES, doc_ids=filters.doc_ids if filters else None)
+            with Stage("fusion", timings):
+                retrieved_chunks = self._fuse(retrieved_chunks, sparse, self._candidate_k(top_k), filters)
+        return query_embedding, self._rerank(query, retrieved_chunks, top_k, timings)
+
+    async def query_batch(self, queries: List[str], top_k: int = Config.TOP_K_CHUNKS, filters: Optional[QueryFilter] = None,
+                          concurrency: int = Config.BATCH_LLM_CONCURRENCY) -> AsyncIterator[Dict]:
+        #Answers many questions at once: one embedding pass, one multi-embedding
+        #vector query (optionally filtered) and LLM calls fanned out at
+        #most `concurrency` at a time. Yields each result as soon as it is ready,
+        #tagged with its position in queries as "index". Timings of the shared
+        #embedding, search and fusion steps are for the whole batch.
+        loop = asyncio.get_running_loop()
+        queries = list(queries)
+        doc_ids = filters.doc_ids if filters else None
+        batch_timings: Dict[str, float] = {}
+
+        with Stage("query_embed", batch_timings):
+            embeddings = await loop.run_in_executor(self.embed_executor, self.embedding_manager.embed_texts, queries)
+
+        async with self.vector_limit:
+            with Stage("vector_search", batch_timings):
+                results = await loop.run_in_executor(
+                    self.io_executor,
+                    lambda: self.vector_store.query_many(embeddings, n_results=self._dense_k(top_k), filters=filters),
+                )
+        chunk_lists = [self._collect_chunks(results, i) for i in range(len(queries))]
+
+        if self.bm25_index is not None:
+            def fuse_all():
+                return [
+                    self._fuse(chunks, self.bm25_index.search(query, Config.HYBRID_CANDIDATES, doc_ids=doc_ids),
+                               self._candidate_k(top_k), filters)
+                    for query, chunks in zip(queries, chunk_lists)
+                ]
+            with Stage("fusion", batch_timings):
+                chunk_lists = await loop.run_in_executor(self.io_executor, fuse_all)
+
+        if self.reranker is not None:
+            def rerank_all():
+                return [self.reranker.rerank(query, chunks, top_k) for query, chunks in zip(queries, chunk_lists)]
+            with Stage("rerank", batch_timings):
+                chunk_lists = await loop.run_in_executor(self.embed_executor, rerank_all)
+
+        llm_limit = asyncio.Semaphore(concurrency)
+
+        async def answer(i: int) -> Dict:
+            query, query_embedding, retrieved_chunks = queries[i], embeddings[i], chunk_lists[i]
+            timings = dict(batch_timings)
+            try:
+                cached = self._cached_result(query, query_embedding, retrieved_chunks)
+                if cached is not None:
+                    return dict(self._timed(cached, timings), index=i)
 
+                with Stage("context_build", timings):
+                    context, context_stats = self.context_builder.build(retrieved_chunks)
+                async with llm_limit, self.bedrock_limit:
+                    with Stage("llm_generation", timings):
+                        answer = await loop.run_in_executor(
+                            self.io_executor, self.bedrock_llm.generate_response, query, context
+                        )
+                self._remember(query, query_embedding, retrieved_chunks, answer, timings["llm_generation"])
+                result = self._build_result(query, answer, retrieved_chunks, context_stats=context_stats)
+                return dict(self._timed(result, timings), index=i)
+            except Exception as e:
+                return {"index": i, "query": query, "error": str(e)}
+
+        tasks = [asyncio.ensure_future(answer(i)) for i in range(len(queries))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            #client went away: drop the answers not started yet
+            for task in tasks:
+                task.cancel()
+
+    async def _aretrieve(self, query, top_k: int, filters: Optional[QueryFilter] = None,
+                         timings: Optional[Dict[str, float]] = None):
+        loop = asyncio.get_running_loop()
+
+        with Stage("query_embed", timings):
+            batcher = getattr(self.embedding_manager, "batcher", None)
+            if batcher is not None:
+                #the batcher thread is the bounded CPU worker; just await its future
+                query_embedding = await asyncio.wrap_future(batcher.submit(query))
+            else:
+                query_embedding = await loop.run_in_executor(
+                    self.embed_executor, self.embedding_manager.embed_text, query
+                )
+
+        def dense_search():
+            with Stage("vector_search", timings):
+                return self.vector_store.query(query_embedding, n_results=self._dense_k(top_k), filters=filters)
+
+        def keyword_search():
+            with Stage("keyword_search", timings):
+                return self.bm25_index.search(query, Config.HYBRID_CANDIDATES, filters.doc_ids if filters else None)
+
+        def fuse(dense, sparse):
+            with Stage("fusion", timings):
+                return self._fuse(dense, sparse, self._candidate_k(top_k), filters)
+
+        async with self.vector_limit:
+            dense = loop.run_in_executor(self.io_executor, dense_search)
+            if self.bm25_index is None:
+                retrieved_chunks = self._collect_chunks(await dense)
+            else:
+                #keyword search runs while the vector query is in flight
+                sparse = await loop.run_in_executor(self.io_executor, keyword_search)
+                retrieved_chunks = self._collect_chunks(await dense)
+                retrieved_chunks = await loop.run_in_executor(self.io_executor, fuse, retrieved_chunks, sparse)
+
+        if self.reranker is not None:
+            #cross-encoder scoring is CPU work, like query embedding
+            retrieved_chunks = await loop.run_in_executor(
+                self.embed_executor, self._rerank, query, retrieved_chunks, top_k, timings
+            )
+        return query_embedding, retrieved_chunks
+
+    def _candidate_k(self, top_k: int) -> int:
+        #the reranker chooses top_k from a larger pool
+        return max(top_k, Config.RERANK_CANDIDATES) if self.reranker is not None else top_k
+
+    def _dense_k(self, top_k: int) -> int:
+        #fusion needs a deeper dense ranking than the final top_k
+        candidates = self._candidate_k(top_k)
+        return max(candidates, Config.HYBRID_CANDIDATES) if self.bm25_index is not None else candidates
+
+    def _rerank(self, query, chunks: List[Dict], top_k: int, timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        if self.reranker is None:
+            return chunks
+        with Stage("rerank", timings):
+            return self.reranker.rerank(query, chunks, top_k)
+
+    def _fuse(self, dense: List[Dict], sparse: List[Tuple[str, float]], top_k: int,
+              filters: Optional[QueryFilter] = None) -> List[Dict]:
+        #Reciprocal rank fusion of the vector and BM25 rankings. Keyword-only
+        #hits are fetched from the vector store and have distance None; the
+        #BM25 index only knows doc ids, so they are checked against filters here.
+        fused = reciprocal_rank_fusion([[chunk["id"] for chunk in dense], [chunk_id for chunk_id, _ in sparse]])
+
+        by_id = {chunk["id"]: chunk for chunk in dense}
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+        if missing:
+            for chunk in self.vector_store.get_chunks(missing):
+                if filters is not None and not filters.matches(chunk["metadata"]):
+                    continue
+                chunk["distance"] = None
+                by_id[chunk["id"]] = chunk
+        fused = [(chunk_id, score) for chunk_id, score in fused if chunk_id in by_id][:top_k]
+
+        bm25_scores = dict(sparse)
+        retrieved_chunks = []
+        for chunk_id, score in fused:
+            chunk = by_id[chunk_id]
+            chunk["rrf_score"] = score
+            chunk["bm25_score"] = bm25_scores.get(chunk_id)
+            retrieved_chunks.append(chunk)
+        return retrieved_chunks
+
+    def invalidate_doc(self, doc_id: str):
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_doc(doc_id)
+
+    def _cached_result(self, query, query_embedding, retrieved_chunks: List[Dict]):
+        if self.answer_cache is None or not retrieved_chunks:
+            return None
+        hit = self.answer_cache.lookup(query, query_embedding, [chunk["id"] for chunk in retrieved_chunks])
+        if hit is None:
+            return None
+        kind, entry = hit
+        return self._build_result(query, entry.answer, retrieved_chunks, cached=kind)
+
+    @staticmethod
+    def _timed(result: Dict, timings: Dict[str, float]) -> Dict:
+        #timings is still filled in by enclosing stages after this returns
+        result["timings"] = timings
+        count(QUERIES, result.get("cached") or "model")
+        return result
+
+    def _remember(self, query, query_embedding, retrieved_chunks: List[Dict], answer, latency: float):
+        if self.answer_cache is None or not retrieved_chunks:
+            return
+        self.answer_cache.store(query, query_embedding, retrieved_chunks, answer, latency)
+
+    def close(self):
+        self.embed_executor.shutdown(wait=False)
+        self.io_executor.shutdown(wait=False)
+
+    @staticmethod
+    def _collect_chunks(results: Dict, row: int = 0) -> List[Dict]:
+        #row selects the query in a multi-query result
         retrieved_chunks = []
-        for i in range(len(results["ids"][0])):
+        for i in range(len(results["ids"][row])):
             retrieved_chunks.append(
                 {
-                    "id": results["ids"][0][i],
-                    "text": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results.get("distances")[0][i]
+                    "id": results["ids"][row][i],
+                    "text": results["documents"][row][i],
+                    "metadata": results["metadatas"][row][i],
+                    "distance": results.get("distances")[row][i]
                     if "distances" in results
                     else None,
                 }
             )
+        return retrieved_chunks
 
-        context = "\n\n".join(
-            f"[Section: {chunk['metadata'].get('section', 'unknown')}]\n{chunk['text']}"
-            for chunk in retrieved_chunks
-        )
-
-        answer = self.bedrock_llm.generate_response(query, context)
-
+    @staticmethod
+    def _build_result(query, answer, retrieved_chunks: List[Dict], cached=None, context_stats=None) -> Dict:
+        #context_stats: prompt context token counts from ContextBuilder (None when cached)
         return {
             "query": query,
             "answer": answer,
             "retrieved_chunks": retrieved_chunks,
             "num_chunks": len(retrieved_chunks),
+            "cached": cached,
+            "context_stats": context_stats,
         }
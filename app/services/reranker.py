@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from app.core.config import Config
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def load_cross_encoder(name: str = Config.RERANK_MODEL):
+    #one CrossEncoder per process and model name, imported on first use
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = _models[name] = CrossEncoder(name, max_length=Config.RERANK_MAX_LENGTH, device="cpu")
+        return model
+
+
+class Reranker:
+    #Reorders retrieved candidates (best first) by cross-encoder relevance to
+    #the query and keeps top_k.
+    #  batches - candidates are scored batch_size at a time in retrieval order;
+    #            once budget_ms is spent no further batch starts, and the
+    #            unscored candidates follow the scored ones in retrieval order
+    #  cache   - scores are kept per (query hash, chunk id); chunk ids are
+    #            content hashes, so a score stays valid until the chunk is gone
+
+    def __init__(self, model=None, model_name: str = Config.RERANK_MODEL, batch_size: int = Config.RERANK_BATCH_SIZE,
+                 budget_ms: float = Config.RERANK_BUDGET_MS, cache_size: int = Config.RERANK_CACHE_SIZE):
+        self._model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.cutoffs = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_cross_encoder(self.model_name)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        return self.model
+
+    @staticmethod
+    def query_hash(query: str) -> str:
+        return hashlib.sha256(" ".join(query.lower().split()).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def passage(chunk: Dict) -> str:
+        #the section title helps the cross-encoder as it helps the LLM
+        section = chunk["metadata"].get("section")
+        return f"{section}\n{chunk['text']}" if section else chunk["text"]
+
+    def rerank(self, query: str, chunks: List[Dict], top_k: int) -> List[Dict]:
+        #Returns top_k chunks with "rerank_score" set (None if not scored in time)
+        if not chunks:
+            return chunks
+        key = self.query_hash(query)
+        scores: Dict[int, float] = {}
+        pending = []
+        with self._lock:
+            for i, chunk in enumerate(chunks):
+                score = self._cache.get((key, chunk["id"]))
+                if score is None:
+                    pending.append(i)
+                else:
+                    self._cache.move_to_end((key, chunk["id"]))
+                    scores[i] = score
+            self.hits += len(scores)
+
+        start = time.perf_counter()
+        for b in range(0, len(pending), self.batch_size):
+            if b and self.budget_ms > 0 and (time.perf_counter() - start) * 1000 >= self.budget_ms:
+                with self._lock:
+                    self.cutoffs += 1
+                break
+            batch = pending[b:b + self.batch_size]
+            predicted = self.model.predict(
+                [(query, self.passage(chunks[i])) for i in batch], batch_size=self.batch_size, show_progress_bar=False
+            )
+            with self._lock:
+                self.misses += len(batch)
+                for i, score in zip(batch, predicted):
+                    scores[i] = float(score)
+                    self._cache[(key, chunks[i]["id"])] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(chunks)) if i not in scores]
+        reranked = []
+        for i in (scored + unscored)[:top_k]:
+            chunk = chunks[i]
+            chunk["rerank_score"] = scores.get(i)
+            reranked.append(chunk)
+        return reranked
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "cached_scores": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "budget_cutoffs": self.cutoffs,
+            }
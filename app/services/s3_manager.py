@@ -1,15 +1,36 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 from app.core.config import Config
 
-class S3Manager:
-    def __init__(self):
+MB = 1024 * 1024
+
+
+def transfer_config() -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=Config.S3_MULTIPART_THRESHOLD_MB * MB,
+        multipart_chunksize=Config.S3_MULTIPART_CHUNK_MB * MB,
+        max_concurrency=Config.S3_MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+def create_s3_client():
+    if Config.S3_BACKEND == "memory":
+        from app.services.local_clients import InMemoryS3Client
+        return InMemoryS3Client()
+    if Config.S3_BACKEND == "aws":
         #credentials from config
-        self.s3_client = boto3.client(
+        return boto3.client(
             "s3",
             aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
             region_name=Config.AWS_REGION,
         )
+    raise ValueError(f"Unknown S3_BACKEND '{Config.S3_BACKEND}' (expected 'aws' or 'memory')")
+
+
+class S3Manager:
+    def __init__(self, client=None):
+        self.s3_client = client or create_s3_client()
 
 
     def create_buckets(self):
@@ -39,14 +60,32 @@ class S3Manager:
         )
 
 
+    def upload_fileobj(self, bucket: str, key: str, fileobj, content_type: str):
+        #streams a file object; large ones go up as a multipart upload with
+        #S3_MAX_CONCURRENCY parts in flight, so memory stays at a few parts
+        self.s3_client.upload_fileobj(
+            fileobj, bucket, key, ExtraArgs={"ContentType": content_type}, Config=transfer_config()
+        )
+
+
+    def download_file(self, bucket: str, key: str) -> bytes:
+        return self.s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
     def list_objects(self, bucket: str, prefix: str = ""):
         try:
-            #list all objects in bucket, with optional prefix
-            response = self.s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-            return response.get("Contents", [])
+            #list all objects in bucket, with optional prefix (every page; see iter_objects)
+            return [obj for page in self.iter_objects(bucket, prefix) for obj in page]
         except Exception:
             return []
 
 
+    def iter_objects(self, bucket: str, prefix: str = ""):
+        #yields one page (up to 1000 objects) at a time, for buckets of any size
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            yield page.get("Contents", [])
+
+
     def delete_object(self, bucket: str, key: str):
         self.s3_client.delete_object(Bucket=bucket, Key=key)
@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from typing import BinaryIO, Optional, Union
+from app.core.config import Config
+
+READ_SIZE = 1024 * 1024
+
+
+class SpooledPDF:
+    #An uploaded PDF: bytes in memory up to UPLOAD_SPOOL_MAX_MEMORY_MB, above that
+    #a file under UPLOAD_DIR that is read through read-only memory maps, so the
+    #pages PyPDF2 touches are paged in on demand and shared with the page cache
+    #instead of copied per upload. Pickles as its path (or bytes) for the PDF
+    #worker pool, where each worker maps the file itself.
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None):
+        if (data is None) == (path is None):
+            raise ValueError("SpooledPDF needs either data or path")
+        self.data = data
+        self.path = path
+
+    @classmethod
+    def of(cls, pdf: Union["SpooledPDF", bytes]) -> "SpooledPDF":
+        return pdf if isinstance(pdf, SpooledPDF) else cls(data=pdf)
+
+    @property
+    def spooled(self) -> bool:
+        return self.path is not None
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else os.path.getsize(self.path)
+
+    def stream(self):
+        #a new seekable, read-only view; each reader gets its own position
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        if self.size == 0:
+            return io.BytesIO(b"")
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def open(self) -> BinaryIO:
+        #a plain file object, for streaming uploads
+        return io.BytesIO(self.data) if self.data is not None else open(self.path, "rb")
+
+    def sha256(self) -> str:
+        if self.data is not None:
+            return hashlib.sha256(self.data).hexdigest()
+        digest = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(READ_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def close(self):
+        #removes the spool file; memory maps still open keep their pages until closed
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getstate__(self):
+        return {"data": self.data, "path": self.path}
+
+    def __setstate__(self, state):
+        self.data, self.path = state["data"], state["path"]
+
+
+async def spool_upload(upload, max_memory: int = Config.UPLOAD_SPOOL_MAX_MEMORY_MB * 1024 * 1024,
+                       directory: str = Config.UPLOAD_DIR) -> SpooledPDF:
+    #Reads an UploadFile READ_SIZE at a time: kept in memory while it is at most
+    #max_memory bytes, moved to a file in directory as soon as it is larger
+    loop = asyncio.get_running_loop()
+    buffer = bytearray()
+    spool = None
+    try:
+        while True:
+            block = await upload.read(READ_SIZE)
+            if not block:
+                break
+            if spool is None:
+                buffer += block
+                if len(buffer) <= max_memory:
+                    continue
+                os.makedirs(directory, exist_ok=True)
+                spool = tempfile.NamedTemporaryFile(dir=directory, prefix="upload-", suffix=".pdf", delete=False)
+                block, buffer = bytes(buffer), bytearray()
+            await loop.run_in_executor(None, spool.write, block)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+    if spool is None:
+        return SpooledPDF(data=bytes(buffer))
+    spool.close()
+    return SpooledPDF(path=spool.name)
@@ -0,0 +1,151 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from app.core.config import Config
+
+
+@dataclass
+class QueryFilter:
+    #Restricts retrieval to some documents, one doc type and/or sections whose
+    #title starts with section_prefix (case-insensitive). Empty fields match all.
+    doc_ids: Optional[List[str]] = None
+    doc_type: Optional[str] = None
+    section_prefix: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not (self.doc_ids or self.doc_type or self.section_prefix)
+
+    def where(self) -> Optional[Dict]:
+        #Chroma where clause for the fields it can express (not the prefix)
+        clauses = []
+        if self.doc_ids:
+            clauses.append({"doc_id": self.doc_ids[0]} if len(self.doc_ids) == 1 else {"doc_id": {"$in": list(self.doc_ids)}})
+        if self.doc_type:
+            clauses.append({"doc_type": self.doc_type})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def matches(self, metadata: Dict) -> bool:
+        if self.doc_ids and metadata.get("doc_id") not in self.doc_ids:
+            return False
+        if self.doc_type and metadata.get("doc_type") != self.doc_type:
+            return False
+        if self.section_prefix and not str(metadata.get("section", "")).lower().startswith(self.section_prefix.lower()):
+            return False
+        return True
+
+
+class VectorStore:
+    #Interface shared by the Chroma Cloud and local backends.
+    #query() returns Chroma-style results: {"ids": [[...]], "documents": [[...]],
+    #"metadatas": [[...]], "distances": [[...]]} with squared L2 distances;
+    #query_many() returns one inner list per query embedding. filters limit
+    #the search to matching chunks before ranking.
+
+    @property
+    def ready(self) -> bool:
+        #False until a lazily connected backend has connected
+        return True
+
+    def warm_up(self):
+        pass
+
+    def add_chunks(self, chunks: List[Dict], doc_id: str, embeddings: np.ndarray, start: int = 0):
+        #Upserts chunks under chunk["id"], or {doc_id}_chunk_{start + i} for chunks without one.
+        #A chunk's own "doc_id" overrides doc_id, so one call can write several documents.
+        raise NotImplementedError
+
+    def query(self, query_embedding: np.ndarray, n_results: int = 5, filters: Optional[QueryFilter] = None) -> Dict:
+        raise NotImplementedError
+
+    def query_many(self, query_embeddings: np.ndarray, n_results: int = 5, filters: Optional[QueryFilter] = None) -> Dict:
+        raise NotImplementedError
+
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        #Returns [{"id", "text", "metadata"}] in the order of ids, skipping unknown ids
+        raise NotImplementedError
+
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        #Returns the stored embeddings of existing chunks, one row per id in order
+        raise NotImplementedError
+
+    def delete_by_doc_id(self, doc_id: str):
+        raise NotImplementedError
+
+    def delete_chunks(self, ids: List[str]):
+        raise NotImplementedError
+
+    def doc_chunks(self, doc_id: str) -> Dict[str, Dict]:
+        #Returns {chunk id: metadata} for every stored chunk of the document
+        raise NotImplementedError
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        #Replaces the metadata of existing chunks without touching their embeddings
+        raise NotImplementedError
+
+    def iter_metadatas(self, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        #Yields the metadata of every stored chunk, batch_size at a time
+        raise NotImplementedError
+
+    @staticmethod
+    def chunk_ids(chunks: List[Dict], doc_id: str, start: int = 0) -> List[str]:
+        return [chunk.get("id") or f"{doc_id}_chunk_{i}" for i, chunk in enumerate(chunks, start=start)]
+
+    @staticmethod
+    def content_chunk_id(doc_id: str, chunk: Dict, occurrence: int = 0) -> str:
+        #Content-addressed id: unchanged chunks keep their id across versions of a
+        #document. occurrence numbers repeats of the same section and text.
+        digest = hashlib.sha1(f"{chunk.get('section', '')}\0{chunk['text']}".encode("utf-8")).hexdigest()[:16]
+        return f"{doc_id}_{digest}_{occurrence}"
+
+    @staticmethod
+    def chunk_metadatas(chunks: List[Dict], doc_id: str, start: int = 0) -> List[Dict]:
+        metadatas = []
+        for i, chunk in enumerate(chunks, start=start):
+            metadata = {
+                "doc_id": chunk.get("doc_id", doc_id),
+                "section": chunk.get("section", "unknown"),
+                "chunk_index": chunk.get("chunk_index", i),
+            }
+            if "filename" in chunk:
+                metadata["filename"] = chunk["filename"]
+            if "doc_type" in chunk:
+                metadata["doc_type"] = chunk["doc_type"]
+            #source span in the cleaned document text, for highlighting
+            if "start" in chunk:
+                metadata["start_offset"] = chunk["start"]
+                metadata["end_offset"] = chunk["end"]
+            metadatas.append(metadata)
+        return metadatas
+
+    @staticmethod
+    def filter_by_distance(results: Dict, max_distance: Optional[float] = None) -> Dict:
+        # Filter out chunks at max_distance (Config.MAX_DISTANCE) or farther; 0 keeps everything
+        max_distance = Config.MAX_DISTANCE if max_distance is None else max_distance
+        if max_distance > 0 and "distances" in results and results["distances"]:
+            for q, distances in enumerate(results["distances"]):
+                filtered_ids, filtered_docs, filtered_meta, filtered_dist = [], [], [], []
+                for i, dist in enumerate(distances):
+                    if dist < max_distance:
+                        filtered_ids.append(results["ids"][q][i])
+                        filtered_docs.append(results["documents"][q][i])
+                        filtered_meta.append(results["metadatas"][q][i])
+                        filtered_dist.append(dist)
+                results["ids"][q] = filtered_ids
+                results["documents"][q] = filtered_docs
+                results["metadatas"][q] = filtered_meta
+                results["distances"][q] = filtered_dist
+
+        return results
+
+
+def create_vector_store() -> VectorStore:
+    if Config.VECTOR_BACKEND == "local":
+        from app.services.local_vector_store import LocalVectorStore
+        return LocalVectorStore()
+    if Config.VECTOR_BACKEND == "chroma":
+        from app.services.chroma_manager import ChromaDBManager
+        return ChromaDBManager()
+    raise ValueError(f"Unknown VECTOR_BACKEND '{Config.VECTOR_BACKEND}' (expected 'chroma' or 'local')")
@@ -67,11 +67,17 @@ uploadBtn.addEventListener('click', async () => {
         const data = await response.json();
 
         if (response.ok) {
-            uploadSuccess.textContent = `✓ ${data.message} (${data.chunk_count} chunks created)`;
-            uploadSuccess.classList.add('active');
-            fileInfo.textContent = '';
-            selectedFile = null;
-            fileInput.value = '';
+            const job = await waitForJob(data.job_id);
+            if (job.status === 'completed') {
+                uploadSuccess.textContent = `✓ Document '${job.filename}' processed successfully (${job.chunk_count} chunks created)`;
+                uploadSuccess.classList.add('active');
+                fileInfo.textContent = '';
+                selectedFile = null;
+                fileInput.value = '';
+            } else {
+                uploadError.textContent = `✗ Error: ${job.error}`;
+                uploadError.classList.add('active');
+            }
         } else {
             uploadError.textContent = `✗ Error: ${data.detail}`;
             uploadError.classList.add('active');
@@ -85,6 +91,23 @@ uploadBtn.addEventListener('click', async () => {
     }
 });
 
+// Poll ingestion job until it finishes
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`/jobs/${jobId}`);
+        const job = await response.json();
+
+        if (!response.ok) {
+            return { status: 'failed', error: job.detail };
+        }
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+        fileInfo.textContent = `Processing: ${job.stage || 'queued'} (${Math.round(job.progress * 100)}%)`;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // Query documents
 queryBtn.addEventListener('click', async () => {
     const query = queryInput.value.trim();
@@ -95,7 +118,7 @@ queryBtn.addEventListener('click', async () => {
     resultsContainer.innerHTML = '';
 
     try {
-        const response = await fetch('/query', {
+        const response = await fetch('/query/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -103,13 +126,13 @@ queryBtn.addEventListener('click', async () => {
             body: JSON.stringify({ query, top_k: 5 })
         });
 
-        const data = await response.json();
-
-        if (response.ok) {
-            displayResults(data);
-        } else {
+        if (!response.ok) {
+            const data = await response.json();
             resultsContainer.innerHTML = `<div class="error-message active">Error: ${data.detail}</div>`;
+            return;
         }
+
+        await readQueryStream(response);
     } catch (error) {
         resultsContainer.innerHTML = `<div class="error-message active">Error: ${error.message}</div>`;
     } finally {
@@ -118,11 +141,44 @@ queryBtn.addEventListener('click', async () => {
     }
 });
 
+// Parse server-sent events from /query/stream: chunks, then answer tokens
+async function readQueryStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answerEl = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const event = raw.match(/^event: (.*)$/m)[1];
+            const data = JSON.parse(raw.match(/^data: (.*)$/m)[1]);
+
+            if (event === 'chunks') {
+                loading.classList.remove('active');
+                displayResults({ answer: '', num_chunks: data.num_chunks, retrieved_chunks: data.retrieved_chunks });
+                answerEl = document.getElementById('answerText');
+            } else if (event === 'token') {
+                answerEl.textContent += data.text;
+            } else if (event === 'error') {
+                resultsContainer.innerHTML = `<div class="error-message active">Error: ${data.detail}</div>`;
+            }
+        }
+    }
+}
+
 function displayResults(data) {
     let html = `
                 <div class="result-answer">
                     <h3 style="color: #667eea; margin-bottom: 15px;">💡 Answer</h3>
-                    <p style="white-space: pre-wrap; line-height: 1.8;">${data.answer}</p>
+                    <p id="answerText" style="white-space: pre-wrap; line-height: 1.8;">${data.answer}</p>
                 </div>
                 <h3 style="margin-bottom: 15px; color: #667eea;">📑 Retrieved Chunks (${data.num_chunks})</h3>
                 `;
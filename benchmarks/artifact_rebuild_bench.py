@@ -0,0 +1,183 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stubs import StubEmbeddingManager, eula_document, make_pdf, percentile
+from app.core.config import Config
+from app.services.artifact_store import ArtifactRebuilder, ArtifactStore, ArtifactWriter
+from app.services.bm25_index import BM25Index
+from app.services.bulk_ingest import BulkIngester, iter_s3_items
+from app.services.document_processor import DocumentProcessor
+from app.services.document_registry import DocumentRegistry
+from app.services.local_clients import InMemoryS3Client
+from app.services.local_vector_store import LocalVectorStore
+from app.services.s3_manager import S3Manager
+
+# Rebuilding the index from the processed artifacts in PROCESSED_BUCKET
+# (app.services.artifact_store) vs from the raw PDFs with bulk ingestion.
+#   python -m benchmarks.artifact_rebuild_bench --docs 200
+#
+# A generated corpus is ingested through DocumentProcessor.process_document with
+# the artifact writer on and off (the write-behind should not show in per-document
+# latency). Fresh indexes are then rebuilt three ways: from the PDFs
+# (BulkIngester), from the artifacts with the same model id (no embedding), and
+# from the artifacts with another model id (every chunk embedded again and the
+# artifacts rewritten). S3 costs --s3-latency per request and embedding
+# --embed-latency per call plus --embed-ms-per-chunk per text, roughly a small
+# sentence-transformer on CPU. The rebuilt stores are compared with the original.
+
+
+class ModelEmbedder(StubEmbeddingManager):
+    def __init__(self, latency: float, per_chunk: float, model_id: str):
+        super().__init__(latency, model_id)
+        self.per_chunk = per_chunk
+
+    def embed_texts(self, texts):
+        time.sleep(self.per_chunk * len(texts))
+        return super().embed_texts(texts)
+
+
+def snapshot(vector_store: LocalVectorStore):
+    #chunk id -> (text, metadata, embedding) of every live chunk
+    return {
+        chunk_id: (vector_store.documents[row], vector_store.metadatas[row], vector_store.matrix[row].tobytes())
+        for chunk_id, row in vector_store.id_to_row.items() if vector_store.alive[row]
+    }
+
+
+def stores(path: str, name: str):
+    root = os.path.join(path, name)
+    return (
+        LocalVectorStore(path=os.path.join(root, "vectors")),
+        BM25Index(path=os.path.join(root, "bm25")),
+        DocumentRegistry(path=os.path.join(root, "documents.sqlite3")),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=Config.BULK_WORKERS, help="extraction processes for the PDF rebuild")
+    parser.add_argument("--batch-size", type=int, default=Config.BULK_EMBED_BATCH_SIZE)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--embed-ms-per-chunk", type=float, default=2.0)
+    parser.add_argument("--s3-latency", type=float, default=0.01)
+    args = parser.parse_args()
+    Config.EMBED_CACHE_ENABLED = False
+
+    s3_manager = S3Manager(client=InMemoryS3Client(args.s3_latency))
+    s3_manager.create_buckets()
+    corpus = []
+    for d in range(args.docs):
+        pages, _ = eula_document(d, args.pages)
+        corpus.append((f"eula_{d:05d}.pdf", make_pdf(pages)))
+    embedder = ModelEmbedder(args.embed_latency, args.embed_ms_per_chunk / 1000, "model-a")
+    store = ArtifactStore(s3_manager)
+
+    with tempfile.TemporaryDirectory() as path:
+        print(f"{args.docs} PDFs, {sum(len(pdf) for _, pdf in corpus) / 1e6:.1f} MB\n")
+        print(f"{'ingest':>28} {'seconds':>8} {'doc p50 ms':>11} {'doc p99 ms':>11} {'drain s':>8}")
+        for name in ("without artifacts", "with artifacts"):
+            vector_store, bm25_index, registry = stores(path, name)
+            writer = ArtifactWriter(store, embedder) if name == "with artifacts" else None
+            processor = DocumentProcessor(
+                s3_manager=s3_manager, embedding_manager=embedder, vector_store=vector_store, bm25_index=bm25_index,
+                registry=registry, artifacts=writer,
+            )
+            latencies = []
+            start = time.perf_counter()
+            for filename, pdf in corpus:
+                t = time.perf_counter()
+                registry.put(processor.process_document(pdf, filename))
+                latencies.append(time.perf_counter() - t)
+            ingested = time.perf_counter() - start
+            drain = 0.0
+            if writer is not None:
+                t = time.perf_counter()
+                writer.stop()
+                drain = time.perf_counter() - t
+            print(f"{name:>28} {ingested:>8.1f} {percentile(latencies, 50) * 1000:>11.1f}"
+                  f" {percentile(latencies, 99) * 1000:>11.1f} {drain:>8.2f}")
+            registry.close()
+        reference = snapshot(vector_store)
+        if writer.stats()["failed"]:
+            print(f"artifact writes failed: {writer.stats()}")
+
+        sizes = {"raw": 0, "artifacts": 0}
+        for bucket, prefix, name in ((Config.RAW_BUCKET, "", "raw"), (Config.PROCESSED_BUCKET, Config.ARTIFACT_PREFIX, "artifacts")):
+            for page in s3_manager.iter_objects(bucket, prefix):
+                sizes[name] += sum(obj["Size"] for obj in page)
+        print(f"\nstored: {sizes['raw'] / 1e6:.1f} MB of PDFs, {sizes['artifacts'] / 1e6:.1f} MB of artifacts"
+              f" (text, chunks, {len(reference)} float32 embeddings)\n")
+
+        print(f"{'rebuild':>28} {'seconds':>8} {'docs/s':>7} {'chunks/s':>9} {'embedded':>9}  matches ingest")
+        items = list(iter_s3_items(s3_manager, Config.RAW_BUCKET))
+
+        def fetch(key):
+            return s3_manager.download_file(Config.RAW_BUCKET, key)
+
+        def report(name, seconds, documents, chunks, embedded, vector_store, same_vectors=True):
+            rebuilt = snapshot(vector_store)
+            if same_vectors:
+                same = rebuilt == reference
+            else:
+                same = {k: v[:2] for k, v in rebuilt.items()} == {k: v[:2] for k, v in reference.items()}
+            print(f"{name:>28} {seconds:>8.1f} {documents / seconds:>7.1f} {chunks / seconds:>9.0f} {embedded:>9}"
+                  f"  {'yes' if same else 'NO'}{'' if same_vectors else ' (text, metadata)'}")
+
+        vector_store, bm25_index, registry = stores(path, "from pdfs")
+        stats = BulkIngester(
+            embedding_manager=embedder, vector_store=vector_store, bm25_index=bm25_index, registry=registry,
+            workers=args.workers, batch_size=args.batch_size, progress_every=3600,
+        ).run(items, fetch)
+        report("from PDFs", stats["seconds"], stats["ingested"], stats["chunks"], stats["embedded_chunks"], vector_store)
+        registry.close()
+
+        vector_store, bm25_index, registry = stores(path, "from artifacts")
+        stats = ArtifactRebuilder(
+            store, embedder, vector_store, bm25_index, registry, batch_size=args.batch_size, progress_every=3600,
+        ).run()
+        report("from artifacts", stats["seconds"], stats["documents"], stats["chunks"], stats["embedded_chunks"], vector_store)
+        print(f"{'':>28} registry rows {registry.count()}, keyword index chunks {bm25_index.count()}")
+        registry.close()
+
+        new_model = ModelEmbedder(args.embed_latency, args.embed_ms_per_chunk / 1000, "model-b")
+        vector_store, bm25_index, registry = stores(path, "new model")
+        writer = ArtifactWriter(store, new_model)
+        start = time.perf_counter()
+        stats = ArtifactRebuilder(
+            store, new_model, vector_store, bm25_index, registry, writer=writer, batch_size=args.batch_size,
+            progress_every=3600,
+        ).run()
+        writer.stop()
+        seconds = time.perf_counter() - start
+        report("from artifacts, new model", seconds, stats["documents"], stats["chunks"], stats["embedded_chunks"],
+               vector_store, same_vectors=False)
+        models = {store.load(doc_id)["header"]["model"] for doc_id in store.iter_doc_ids()}
+        print(f"{'':>28} artifacts rewritten for {sorted(models)}, {writer.stats()['written']} written")
+        registry.close()
+
+        #an edited document only embeds its changed chunks; the artifact takes the rest from the old one
+        vector_store, bm25_index, registry = stores(path, "with artifacts")
+        writer = ArtifactWriter(store, new_model)
+        processor = DocumentProcessor(
+            s3_manager=s3_manager, embedding_manager=new_model, vector_store=vector_store, bm25_index=bm25_index,
+            artifacts=writer,
+        )
+        pages, _ = eula_document(0, args.pages)
+        pages[-1] = pages[-1] + ["This agreement was last amended to add a benchmark clause about rebuilds."]
+        result = processor.process_document(make_pdf(pages), corpus[0][0])
+        writer.stop()
+        artifact = store.load(result["doc_id"])
+        expected = new_model.embed_texts([chunk["text"] for chunk in artifact["chunks"]])
+        print(f"\nedited document: {result['embedded_chunks']} of {result['chunk_count']} chunks embedded,"
+              f" artifact {'matches' if np.array_equal(artifact['embeddings'], expected) else 'DIFFERS from'}"
+              f" a full re-embedding")
+
+
+if __name__ == "__main__":
+    main()
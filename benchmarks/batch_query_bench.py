@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import StubBedrockLLM, StubVectorStore, StubEmbeddingManager
+from app.services.rag_system import RAGSystem
+from app.services.vector_store import QueryFilter
+
+# A compliance question set run as serial /query calls vs one /query/batch,
+# on stub backends with per-call latencies.
+#   python -m benchmarks.batch_query_bench --questions 200 --concurrency 1 4 16
+
+
+async def serial(rag: RAGSystem, questions):
+    start = time.perf_counter()
+    for question in questions:
+        await rag.aquery(question, top_k=5)
+    return time.perf_counter() - start, None
+
+
+async def batch(rag: RAGSystem, questions, concurrency: int):
+    start = time.perf_counter()
+    first = None
+    done = 0
+    async for result in rag.query_batch(questions, top_k=5, filters=QueryFilter(doc_ids=["stub"]), concurrency=concurrency):
+        assert "error" not in result, result
+        done += 1
+        if first is None:
+            first = time.perf_counter() - start
+    assert done == len(questions)
+    return time.perf_counter() - start, first
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--vector-latency", type=float, default=0.03)
+    parser.add_argument("--bedrock-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rag = RAGSystem(
+        embedding_manager=StubEmbeddingManager(args.embed_latency),
+        vector_store=StubVectorStore(args.vector_latency),
+        bedrock_llm=StubBedrockLLM(args.bedrock_latency),
+    )
+    rag.answer_cache = None
+    questions = [f"Compliance question {i}: does the agreement allow clause {i}?" for i in range(args.questions)]
+
+    async def run_all():
+        rows = [("serial /query", *await serial(rag, questions))]
+        for concurrency in args.concurrency:
+            rows.append((f"batch, {concurrency} in flight", *await batch(rag, questions, concurrency)))
+        return rows
+
+    print(f"{'mode':>22} {'total s':>8} {'questions/s':>12} {'first result s':>15}")
+    for name, total, first in asyncio.run(run_all()):
+        first_s = f"{first:.2f}" if first is not None else "-"
+        print(f"{name:>22} {total:>8.2f} {len(questions) / total:>12.1f} {first_s:>15}")
+    rag.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import threading
+import time
+from collections import Counter
+
+from benchmarks.stubs import percentile
+from app.core.config import Config
+from app.services.bedrock_invoker import AdaptiveLimiter, BedrockInvoker
+from app.services.bedrockllm import BedrockLLM
+from app.services.local_clients import StubBedrockClient
+
+# BedrockInvoker against a fake Bedrock that enforces a request rate quota and
+# injects latency spikes. No AWS account needed.
+#   python -m benchmarks.bedrock_invoker_bench --calls 200 --clients 32
+#
+# Throttling: --clients threads call generate_response against an account
+# limit of --max-tps, first with the old behaviour (fixed concurrency, no
+# retries: throttles surface as failed answers), then with retries at fixed
+# concurrency, then with retries under the AIMD limiter. "requests" counts
+# every request the fake received, throttled ones included.
+# Latency spikes: no quota, but --spike-rate of requests wait --spike-latency
+# longer for the first token; hedging after --hedge-ms cuts that tail. This runs
+# with --spike-clients, below the concurrency limit, since a hedge needs a free slot.
+
+
+def run(llm: BedrockLLM, calls: int, clients: int):
+    latencies, errors = [], Counter()
+    pending = list(range(calls))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                i = pending.pop()
+            start = time.perf_counter()
+            try:
+                llm.generate_response(f"Question {i}: can I cancel at any time?", "Excerpt about cancellation.")
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(name: str, llm: BedrockLLM, fake: StubBedrockClient, calls: int, clients: int):
+    latencies, errors, elapsed = run(llm, calls, clients)
+    stats = llm.invoker.stats()
+    p50 = percentile(latencies, 50) * 1000 if latencies else float("nan")
+    p99 = percentile(latencies, 99) * 1000 if latencies else float("nan")
+    print(f"{name:>28} {len(latencies) / calls:>8.1%} {len(latencies) / elapsed:>7.1f} {p50:>8.0f} {p99:>8.0f}"
+          f" {fake.calls:>9} {sum(stats['retries'].values()):>8} {stats['concurrency_limit']:>6}"
+          f" {stats['hedges_won']['hedge']:>6}  {dict(errors) or ''}")
+    llm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=Config.BEDROCK_CONCURRENCY * 2)
+    parser.add_argument("--max-tps", type=float, default=20)
+    parser.add_argument("--first-token", type=float, default=0.1)
+    parser.add_argument("--tokens", type=int, default=10)
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--spike-latency", type=float, default=1.0)
+    parser.add_argument("--hedge-ms", type=float, default=300)
+    parser.add_argument("--spike-clients", type=int, default=8)
+    args = parser.parse_args()
+    Config.METRICS_ENABLED = False
+
+    def llm(fake, max_retries=Config.BEDROCK_MAX_RETRIES, adaptive=True, hedge_ms=0.0):
+        limiter = AdaptiveLimiter(args.concurrency, 1 if adaptive else args.concurrency)
+        invoker = BedrockInvoker(fake, limiter, max_retries=max_retries, hedge_after_ms=hedge_ms)
+        return BedrockLLM(client=fake, invoker=invoker)
+
+    def throttling_fake():
+        return StubBedrockClient(args.first_token, 0.01, args.tokens, max_tps=args.max_tps)
+
+    def spiky_fake():
+        return StubBedrockClient(args.first_token, 0.01, args.tokens, spike_rate=args.spike_rate,
+                                 spike_latency=args.spike_latency)
+
+    header = (f"{'':>28} {'answered':>8} {'ok/s':>7} {'p50 ms':>8} {'p99 ms':>8} {'requests':>9} {'retries':>8}"
+              f" {'limit':>6} {'hedged':>6}  errors")
+    print(f"{args.calls} calls from {args.clients} clients, up to {args.concurrency} in flight\n")
+    print(f"throttling: account limit {args.max_tps:g} requests/s")
+    print(header)
+    fake = throttling_fake()
+    report("fixed, no retries", llm(fake, max_retries=0, adaptive=False), fake, args.calls, args.clients)
+    fake = throttling_fake()
+    report("fixed, retries", llm(fake, adaptive=False), fake, args.calls, args.clients)
+    fake = throttling_fake()
+    report("AIMD, retries", llm(fake), fake, args.calls, args.clients)
+
+    print(f"\nlatency spikes: {args.spike_rate:.0%} of requests +{args.spike_latency * 1000:.0f} ms, {args.spike_clients} clients")
+    print(header)
+    fake = spiky_fake()
+    report("AIMD, retries", llm(fake), fake, args.calls, args.spike_clients)
+    fake = spiky_fake()
+    report(f"AIMD, retries, hedge {args.hedge_ms:g} ms", llm(fake, hedge_ms=args.hedge_ms), fake, args.calls, args.spike_clients)
+
+
+if __name__ == "__main__":
+    main()
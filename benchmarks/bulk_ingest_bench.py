@@ -0,0 +1,136 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.stubs import StubEmbeddingManager, eula_document, make_pdf
+from app.core.config import Config
+from app.services.bm25_index import BM25Index
+from app.services.bulk_ingest import BulkIngester, Checkpoint, iter_s3_items
+from app.services.document_processor import DocumentProcessor
+from app.services.document_registry import DocumentRegistry
+from app.services.local_clients import InMemoryS3Client
+from app.services.local_vector_store import LocalVectorStore
+from app.services.s3_manager import S3Manager
+
+# Bulk ingestion of a RAW_BUCKET prefix (app.services.bulk_ingest) vs feeding the
+# same PDFs one at a time through DocumentProcessor.process_document.
+#   python -m benchmarks.bulk_ingest_bench --docs 200 --workers 1 4
+#
+# The PDFs sit in an in-memory S3 with --s3-latency per request. Embedding costs
+# --embed-latency per call plus nothing per text, and vector upserts
+# --upsert-latency per call, which is what batching across documents saves on
+# a real model and a remote store. Afterwards the stored chunk ids and metadata
+# are compared with the per-document run, and a run interrupted halfway is resumed
+# from its checkpoint.
+
+
+class SlowVectorStore(LocalVectorStore):
+    def __init__(self, path: str, latency: float):
+        super().__init__(path=path)
+        self.latency = latency
+        self.upserts = 0
+
+    def add_chunks(self, chunks, doc_id, embeddings, start: int = 0):
+        time.sleep(self.latency)
+        self.upserts += 1
+        super().add_chunks(chunks, doc_id, embeddings, start)
+
+
+def snapshot(vector_store: LocalVectorStore):
+    #chunk id -> metadata of every live chunk
+    return {i: vector_store.metadatas[r] for i, r in vector_store.id_to_row.items() if vector_store.alive[r]}
+
+
+def stores(path: str, name: str, args):
+    root = os.path.join(path, name)
+    vector_store = SlowVectorStore(os.path.join(root, "vectors"), args.upsert_latency)
+    return vector_store, BM25Index(path=os.path.join(root, "bm25")), DocumentRegistry(path=os.path.join(root, "documents.sqlite3"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-size", type=int, default=Config.BULK_EMBED_BATCH_SIZE)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--upsert-latency", type=float, default=0.02)
+    parser.add_argument("--s3-latency", type=float, default=0.01)
+    args = parser.parse_args()
+    Config.EMBED_CACHE_ENABLED = False
+
+    s3_manager = S3Manager(client=InMemoryS3Client(args.s3_latency))
+    s3_manager.create_buckets()
+    for d in range(args.docs):
+        pages, _ = eula_document(d, args.pages)
+        s3_manager.upload_file(Config.RAW_BUCKET, f"bulk/eula_{d:05d}.pdf", make_pdf(pages), "application/pdf")
+    items = list(iter_s3_items(s3_manager, Config.RAW_BUCKET, "bulk/"))
+    print(f"{len(items)} PDFs under s3://{Config.RAW_BUCKET}/bulk/ ({os.cpu_count()} CPUs)\n")
+
+    def fetch(key):
+        return s3_manager.download_file(Config.RAW_BUCKET, key)
+
+    with tempfile.TemporaryDirectory() as path:
+        print(f"{'':>24} {'seconds':>8} {'docs/s':>7} {'chunks/s':>9} {'embed calls':>12} {'upserts':>8}")
+
+        embedder = StubEmbeddingManager(args.embed_latency)
+        vector_store, bm25_index, registry = stores(path, "serial", args)
+        processor = DocumentProcessor(
+            s3_manager=s3_manager, embedding_manager=embedder, vector_store=vector_store, bm25_index=bm25_index,
+            registry=registry,
+        )
+        calls = 0
+        original = embedder.embed_texts
+
+        def counted(texts):
+            nonlocal calls
+            calls += 1
+            return original(texts)
+        embedder.embed_texts = counted
+
+        start = time.perf_counter()
+        chunks = 0
+        for key, _ in items:
+            result = processor.process_document(fetch(key), key)
+            registry.put(result)
+            chunks += result["chunk_count"]
+        elapsed = time.perf_counter() - start
+        print(f"{'process_document':>24} {elapsed:>8.1f} {len(items) / elapsed:>7.1f} {chunks / elapsed:>9.0f}"
+              f" {calls:>12} {vector_store.upserts:>8}")
+        reference = snapshot(vector_store)
+        registry.close()
+
+        for workers in args.workers:
+            calls = 0
+            vector_store, bm25_index, registry = stores(path, f"bulk{workers}", args)
+            ingester = BulkIngester(
+                embedding_manager=embedder, vector_store=vector_store, s3_manager=s3_manager, bm25_index=bm25_index,
+                registry=registry, workers=workers, batch_size=args.batch_size, progress_every=3600,
+            )
+            stats = ingester.run(items, fetch)
+            name = f"bulk, {workers} worker{'s' if workers > 1 else ''}"
+            print(f"{name:>24} {stats['seconds']:>8.1f} {stats['ingested'] / stats['seconds']:>7.1f}"
+                  f" {stats['chunks'] / stats['seconds']:>9.0f} {calls:>12} {vector_store.upserts:>8}")
+            same = snapshot(vector_store) == reference
+            print(f"{'':>24} chunk ids and metadata {'match' if same else 'DIFFER from'} process_document,"
+                  f" {registry.count()} registry rows")
+            registry.close()
+
+        #stop halfway (the listing ends early), then rerun the whole prefix
+        vector_store, bm25_index, registry = stores(path, "resumed", args)
+        checkpoint_path = os.path.join(path, "checkpoint.jsonl")
+        for run_items in (items[:len(items) // 2], items):
+            checkpoint = Checkpoint(checkpoint_path)
+            stats = BulkIngester(
+                embedding_manager=embedder, vector_store=vector_store, bm25_index=bm25_index, registry=registry,
+                checkpoint=checkpoint, workers=args.workers[-1], batch_size=args.batch_size, progress_every=3600,
+            ).run(run_items, fetch)
+            checkpoint.close()
+        print(f"\nresumed run: {stats['skipped']} skipped from the checkpoint, {stats['ingested']} ingested;"
+              f" chunks {'match' if snapshot(vector_store) == reference else 'DIFFER'}")
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import random
+import re
+import time
+from typing import Dict, List
+
+from benchmarks.stubs import CLAUSES
+from app.services.chunking import SemanticChunker
+
+# Golden check and micro-benchmark for SemanticChunker.
+# The legacy implementation below is the chunker as it was before the
+# offset-based rewrite; the rewrite must reproduce its output byte for byte.
+#   python -m benchmarks.chunker_bench --mb 5 [--flat-mb 1]
+
+
+def legacy_chunk_by_sentences(text: str, chunk_size: int, overlap: int) -> List[str]:
+    chunk_size = int(chunk_size)
+    overlap = int(overlap)
+    text = re.sub(r"\s+", " ", text)
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    chunks = []
+    current_chunk: List[str] = []
+    current_size = 0
+    for sentence in sentences:
+        sentence_size = len(sentence.split())
+        if current_size + sentence_size > chunk_size and current_chunk:
+            chunks.append(" ".join(current_chunk))
+            overlap_sentences: List[str] = []
+            overlap_count = 0
+            for s in reversed(current_chunk):
+                w = s.split()
+                if overlap_count + len(w) <= overlap:
+                    overlap_sentences.insert(0, s)
+                    overlap_count += len(w)
+                else:
+                    break
+            current_chunk = overlap_sentences
+            current_size = overlap_count
+        current_chunk.append(sentence)
+        current_size += sentence_size
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def legacy_chunk_by_sections(text: str, chunk_size: int, overlap: int) -> List[Dict]:
+    sections = []
+    current_section = {"title": "Introduction", "content": ""}
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) < 100 and (line.isupper() or re.match(r"^\d+\.", line) or re.match(r"^[A-Z\s]{3,}$", line)):
+            if current_section["content"]:
+                sections.append(current_section)
+            current_section = {"title": line, "content": ""}
+        else:
+            current_section["content"] += line + " "
+    if current_section["content"]:
+        sections.append(current_section)
+    all_chunks = []
+    for section in sections:
+        for i, chunk in enumerate(legacy_chunk_by_sentences(section["content"], chunk_size, overlap)):
+            all_chunks.append({"text": chunk, "section": section["title"], "chunk_index": i})
+    return all_chunks
+
+
+def synthetic_contract(target_bytes: int, seed: int = 0, headers: bool = True) -> str:
+    #headers=False gives one huge section, the legacy chunker's quadratic case
+    rng = random.Random(seed)
+    lines, size, n = ["END USER LICENSE AGREEMENT"], 0, 0
+    while size < target_bytes:
+        title, body = CLAUSES[n % len(CLAUSES)]
+        n += 1
+        if headers:
+            lines.append(f"{n}. {title}")
+        for _ in range(rng.randint(1, 40)):
+            sentence = " ".join(rng.sample(body.split(), rng.randint(3, len(body.split())))) + rng.choice([".", "!", "?", ";"])
+            lines.append(sentence)
+            size += len(sentence) + 1
+    return "\n".join(lines)
+
+
+GOLDEN_CASES = [
+    "",
+    "   \n\t\n",
+    "no punctuation at all just words",
+    "One. Two! Three? Four.",
+    "INTRO\nText with  double  spaces.\tTabs\there.\n\n2. NEXT\nMore text. And more.",
+    "Leading text before any header. It continues.\nSECTION A\n  indented line. \n\x0bvertical tab\x0b line.",
+    "1. A\n" + "word " * 2500 + ".\n2. B\nshort.",
+    "x. " * 300,
+]
+
+
+def golden_check(seed_texts: List[str]) -> int:
+    cases = 0
+    for text in seed_texts:
+        for chunk_size, overlap in [(1000, 200), (50, 10), (5, 0), (3, 10), (1, 1), (0, 0)]:
+            expected = legacy_chunk_by_sections(text, chunk_size, overlap)
+            actual = SemanticChunker.chunk_by_sections(text, chunk_size, overlap)
+            assert [{k: c[k] for k in ("text", "section", "chunk_index")} for c in actual] == expected, \
+                f"chunk mismatch (chunk_size={chunk_size}, overlap={overlap}) for {text[:40]!r}"
+            for chunk in actual:
+                #the offsets cover the chunk's words in the source text
+                source = text[chunk["start"]:chunk["end"]]
+                assert " ".join(source.split()) == chunk["text"].strip(), f"bad offsets for {chunk!r}"
+            cases += 1
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=5.0)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--flat-mb", type=float, default=1.0, help="size of the single-section document")
+    args = parser.parse_args()
+
+    randomized = [synthetic_contract(20000, seed) for seed in range(20)]
+    print(f"golden: {golden_check(GOLDEN_CASES + randomized)} cases identical to the legacy chunker")
+
+    documents = (
+        ("sections", synthetic_contract(int(args.mb * 1e6))),
+        ("flat", synthetic_contract(int(args.flat_mb * 1e6), headers=False)),
+    )
+    for label, contract in documents:
+        print(f"{label}:")
+        for name, fn in (("legacy", legacy_chunk_by_sections), ("current", SemanticChunker.chunk_by_sections)):
+            start = time.perf_counter()
+            chunks = fn(contract, args.chunk_size, args.overlap)
+            print(f"{name:>8}: {len(contract) / 1e6:.1f} MB -> {len(chunks)} chunks in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
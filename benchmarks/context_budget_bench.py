@@ -0,0 +1,115 @@
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.stubs import CLAUSES
+from app.services.bm25_index import BM25Index
+from app.services.chunking import SemanticChunker
+from app.services.context_builder import ContextBuilder, estimate_tokens, format_passage
+
+# Prompt context size with and without ContextBuilder on a fixed corpus.
+#   python -m benchmarks.context_budget_bench --docs 40 --top-k 8 --budget 3000
+#
+# Every document exists in two versions, as re-uploaded ToS revisions do: the
+# revision rewords a few sentences and, in half of the documents, changes the
+# planted facts. Each section states one fact; a question asks for one fact of
+# the first version. BM25 retrieves top_k chunks, so the context holds the fact
+# chunk, its overlapping neighbours and the same text from the other version.
+# The fact sentence must still be in the context after merging, deduplication
+# and trimming.
+
+SUBJECTS = ["The Company", "The User", "Each party", "The Licensor", "The Provider", "The Customer", "Any affiliate", "The Service"]
+VERBS = ["may suspend", "shall retain", "must notify", "will not disclose", "may assign", "shall indemnify", "may review", "must preserve"]
+OBJECTS = ["account data", "usage records", "payment details", "submitted content", "support tickets", "license keys", "audit logs", "billing statements"]
+QUALIFIERS = ["without prior notice", "upon written request", "as required by law", "for a reasonable period",
+              "at its sole discretion", "within thirty days", "subject to this agreement", "where commercially reasonable"]
+
+
+def filler(rng: random.Random) -> str:
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}."
+
+
+def document(d: int, version: int, sentences: int):
+    #returns (lines, {section title: fact sentence})
+    rng = random.Random(d)
+    revision = random.Random(d * 1000 + version)
+    changes_facts = version and d % 2
+    lines, facts = [], {}
+    for j, (title, body) in enumerate(CLAUSES, start=1):
+        section = f"{j}. {title}"
+        days = rng.randint(2, 365)
+        fact = f"Under agreement {d} the {title.lower()} period is {days + 30 if changes_facts else days} days."
+        facts[section] = fact
+        body_sentences = [body] + [filler(rng) for _ in range(sentences)]
+        body_sentences.insert(rng.randint(1, len(body_sentences)), fact)
+        if version:
+            for k in revision.sample(range(1, len(body_sentences)), 3):
+                if body_sentences[k] != fact:
+                    body_sentences[k] = filler(revision)
+        lines.append(section)
+        lines.append(" ".join(body_sentences))
+    return lines, facts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--sentences", type=int, default=60, help="filler sentences per section")
+    parser.add_argument("--chunk-size", type=int, default=300)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=3000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    questions = []
+    with tempfile.TemporaryDirectory() as path:
+        index = BM25Index(path=os.path.join(path, "bm25"))
+        chunks_by_id = {}
+        for d in range(args.docs):
+            for version in range(2):
+                lines, facts = document(d, version, args.sentences)
+                doc_id = f"doc{d}v{version}"
+                chunks = list(SemanticChunker.iter_chunks(lines, args.chunk_size, args.overlap))
+                index.add_chunks(chunks, doc_id)
+                for i, chunk in enumerate(chunks):
+                    chunk_id = f"{doc_id}_chunk_{i}"
+                    chunks_by_id[chunk_id] = {
+                        "id": chunk_id,
+                        "text": chunk["text"],
+                        "metadata": {"doc_id": doc_id, "section": chunk["section"], "chunk_index": chunk["chunk_index"]},
+                    }
+                if version == 0:
+                    section, fact = rng.choice(sorted(facts.items()))
+                    title = section.split(". ", 1)[1].lower()
+                    questions.append((f"under agreement {d} what is the {title} period in days", fact))
+
+        builders = {
+            "verbatim": None,
+            "merge + dedupe": ContextBuilder(token_budget=0, max_overlap_words=args.overlap),
+            f"budget {args.budget}": ContextBuilder(token_budget=args.budget, max_overlap_words=args.overlap),
+        }
+        print(f"{len(chunks_by_id)} chunks, {len(questions)} questions, top_k={args.top_k}\n")
+        print(f"{'context':>16} {'avg tokens':>11} {'max tokens':>11} {'reduction':>10} {'fact kept':>10}")
+        baseline = None
+        for name, builder in builders.items():
+            sizes, kept = [], 0
+            for question, fact in questions:
+                retrieved = [chunks_by_id[chunk_id] for chunk_id, _ in index.search(question, args.top_k)]
+                if builder is None:
+                    context = "\n\n".join(format_passage(c["metadata"]["section"], c["text"]) for c in retrieved)
+                else:
+                    context, _ = builder.build(retrieved)
+                sizes.append(estimate_tokens(context))
+                kept += fact in context
+            average = sum(sizes) / len(sizes)
+            baseline = baseline or average
+            print(
+                f"{name:>16} {average:>11.0f} {max(sizes):>11} {1 - average / baseline:>9.0%}"
+                f" {kept / len(questions):>9.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.embedding_backends import BACKENDS
+
+# Embedding backends (EMBEDDING_BACKEND) compared on the same chunks:
+# cold start (import + load + first encode), embeddings/sec, resident memory,
+# and cosine similarity of every embedding to the torch backend's (or, without
+# torch, of the int8 ONNX model's to the full-precision ONNX model's).
+#   python -m benchmarks.embedding_backend_bench --chunks 1000
+#
+# Each backend runs in a fresh interpreter so cold start and memory are its own.
+# Backends whose libraries are not installed are reported and skipped. Exits
+# non-zero if a backend's mean cosine to the reference is below its PARITY threshold.
+
+PARITY = {"torch-int8": 0.98, "onnx": 0.999, "onnx-int8": 0.98}
+
+
+def child(backend: str, chunks: int, out: str):
+    from benchmarks.embedding_throughput import synthetic_chunks
+    from benchmarks.startup_bench import memory_mb
+
+    start = time.perf_counter()
+    try:
+        from app.services.embedding_manager import EmbeddingManager
+        manager = EmbeddingManager(backend=backend)
+        manager.embed_texts(["warm up"])
+    except ImportError as e:
+        print(json.dumps({"skipped": f"{e.name or e} not installed"}))
+        return
+    cold_start = time.perf_counter() - start
+
+    texts = synthetic_chunks(chunks)
+    start = time.perf_counter()
+    embeddings = manager.embed_texts(texts)
+    elapsed = time.perf_counter() - start
+    np.save(out, embeddings)
+    print(json.dumps({
+        "cold_start_s": cold_start,
+        "per_sec": len(texts) / elapsed,
+        "rss_mb": memory_mb()["rss"],
+    }))
+
+
+def run(backend: str, chunks: int, out: str, env: dict):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.embedding_backend_bench", "--child", backend,
+         "--chunks", str(chunks), "--out", out],
+        env=env, capture_output=True, text=True,
+    )
+    if output.returncode != 0:
+        return {"skipped": output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "failed"}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--child")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.chunks, args.out)
+        return
+
+    backends = args.backends.split(",")
+    failed = []
+    with tempfile.TemporaryDirectory() as path:
+        env = dict(os.environ, EMBED_CACHE_ENABLED="false", EMBED_BATCH_WINDOW_MS="0")
+        print(f"{args.chunks} chunks\n")
+        print(f"{'backend':>10} {'cold start s':>13} {'emb/sec':>9} {'RSS MB':>7} {'mean cos':>9} {'min cos':>8}")
+        reference, reference_name = None, None
+        for backend in backends:
+            out = os.path.join(path, f"{backend}.npy")
+            result = run(backend, args.chunks, out, env)
+            if "skipped" in result:
+                print(f"{backend:>10}  skipped: {result['skipped']}")
+                continue
+
+            embeddings = np.load(out)
+            parity = ""
+            if backend == "torch" or (reference is None and backend == "onnx"):
+                reference, reference_name = embeddings, backend
+            elif reference is not None:
+                a = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+                b = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+                cosine = (a * b).sum(axis=1)
+                parity = f" {cosine.mean():>9.4f} {cosine.min():>8.4f}"
+                if cosine.mean() < PARITY[backend]:
+                    failed.append(f"{backend}: mean cosine to {reference_name} {cosine.mean():.4f} < {PARITY[backend]}")
+            print(f"{backend:>10} {result['cold_start_s']:>13.2f} {result['per_sec']:>9.1f} {result['rss_mb']:>7.0f}{parity}")
+
+    if reference_name != "torch":
+        print(f"\ntorch backend unavailable, parity checked against: {reference_name or 'nothing'}")
+    for failure in failed:
+        print(f"PARITY FAILED {failure}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
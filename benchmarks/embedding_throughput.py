@@ -0,0 +1,71 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import CLAUSES, percentile
+from app.core.config import Config
+from app.services.embedding_manager import EmbeddingManager
+
+# Compares the old embedding path (one encode over the whole list + .tolist(),
+# one encode per query) with the batched float32 engine in EmbeddingManager.
+#   python -m benchmarks.embedding_throughput --chunks 2000 --clients 16
+
+
+def synthetic_chunks(n: int):
+    chunks = []
+    for i in range(n):
+        title, body = CLAUSES[i % len(CLAUSES)]
+        #vary lengths the way section chunks do
+        chunks.append(f"{title}. " + " ".join([body] * (1 + i % 7)) + f" Clause {i}.")
+    return chunks
+
+
+def legacy_embed_texts(manager: EmbeddingManager, texts):
+    return manager.model.encode(texts, show_progress_bar=False).tolist()
+
+
+def legacy_embed_text(manager: EmbeddingManager, text):
+    return manager.model.encode([text], show_progress_bar=False)[0].tolist()
+
+
+def query_latencies(fn, queries, clients: int):
+    def timed(q):
+        start = time.perf_counter()
+        fn(q)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = list(pool.map(timed, queries))
+    return latencies, len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+
+    manager = EmbeddingManager()
+    chunks = synthetic_chunks(args.chunks)
+    queries = [f"Is there an arbitration clause? ({i})" for i in range(args.queries)]
+    manager.embed_texts(chunks[:64])  # warm up
+
+    print(f"ingest: {len(chunks)} chunks, batch size {Config.EMBED_BATCH_SIZE}")
+    for name, fn in (("legacy", lambda: legacy_embed_texts(manager, chunks)), ("engine", lambda: manager.embed_texts(chunks))):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"  {name:>7}: {len(chunks) / elapsed:8.1f} embeddings/sec")
+
+    print(f"query: {len(queries)} single-text embeds from {args.clients} concurrent clients, "
+          f"window {Config.EMBED_BATCH_WINDOW_MS} ms")
+    for name, fn in (("legacy", lambda q: legacy_embed_text(manager, q)), ("engine", manager.embed_text)):
+        latencies, qps = query_latencies(fn, queries, args.clients)
+        print(f"  {name:>7}: p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  {qps:8.1f} queries/sec")
+
+
+if __name__ == "__main__":
+    main()
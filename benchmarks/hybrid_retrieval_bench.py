@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.stubs import CLAUSES, EMBED_DIM, StubBedrockLLM, percentile
+from app.services.bm25_index import BM25Index
+from app.services.local_vector_store import LocalVectorStore
+from app.services.rag_system import RAGSystem
+
+# Retrieval quality and latency of dense-only, BM25-only and hybrid (RRF)
+# retrieval on a synthetic clause corpus.
+#   python -m benchmarks.hybrid_retrieval_bench --docs 2000
+#
+# The stand-in embedder behaves like a small sentence model on legal text: it
+# knows what a clause is about (topic) but blurs exact references, so two
+# arbitration clauses embed alike whatever their section number. Two query
+# sets probe the two failure modes:
+#   exact      - "section 12.3 arbitration": one specific chunk is relevant
+#   paraphrase - no words shared with the clause text: any chunk of the topic is relevant
+
+PARAPHRASES = {
+    "LIMITATION OF LIABILITY": ["who pays if something breaks", "can they be held responsible for losses"],
+    "ARBITRATION": ["can I sue them in front of a judge", "how are disagreements settled"],
+    "TERMINATION": ["how do I end the contract", "can I quit and stop using it"],
+    "DATA COLLECTION": ["what do they track about me", "is my information gathered"],
+    "GOVERNING LAW": ["which state's courts apply", "what jurisdiction rules this"],
+    "WARRANTY DISCLAIMER": ["do they guarantee it works", "is there any promise of quality"],
+}
+PARTIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne"]
+
+
+class TopicEmbedder:
+    #unit vector = topic centre + per-text noise; topics are recognised from
+    #clause titles and paraphrase vocabulary
+    def __init__(self, noise: float = 0.6):
+        rng = np.random.default_rng(7)
+        self.centers = rng.standard_normal((len(CLAUSES), EMBED_DIM)).astype(np.float32)
+        self.noise = noise
+        self.keywords = []
+        for title, _ in CLAUSES:
+            words = set(title.lower().split()) | set(" ".join(PARAPHRASES[title]).lower().split())
+            self.keywords.append(words - {"of", "the", "can", "i", "is", "it", "me", "do", "how", "what", "they", "any"})
+
+    def embed_text(self, text: str) -> np.ndarray:
+        words = set(re.findall(r"[a-z']+", text.lower()))
+        weights = np.array([len(words & keywords) for keywords in self.keywords], dtype=np.float32)
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        noise = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+        topic = weights @ self.centers
+        topic = topic / (np.linalg.norm(topic) or 1.0)
+        vec = topic + self.noise * noise / np.linalg.norm(noise)
+        return vec / np.linalg.norm(vec)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        return np.array([self.embed_text(t) for t in texts], dtype=np.float32).reshape(len(texts), EMBED_DIM)
+
+
+def corpus(n_docs: int, seed: int = 0) -> Dict[str, List[Dict]]:
+    rng = random.Random(seed)
+    docs = {}
+    for d in range(1, n_docs + 1):
+        party = rng.choice(PARTIES)
+        chunks = []
+        for j, (title, body) in enumerate(CLAUSES, start=1):
+            words = body.split()
+            rng.shuffle(words)
+            text = f"Section {d}.{j} {title.title()}. {party} agreement. " + " ".join(words) + "."
+            chunks.append({"text": text, "section": f"{j}. {title}", "chunk_index": 0, "topic": title})
+        docs[f"doc{d}"] = chunks
+    return docs
+
+
+def build(path: str, docs: Dict[str, List[Dict]], embedder: TopicEmbedder):
+    store = LocalVectorStore(path=os.path.join(path, "vectors"), use_hnsw=False)
+    index = BM25Index(path=os.path.join(path, "bm25"))
+    bm25_s = 0.0
+    for doc_id, chunks in docs.items():
+        store.add_chunks(chunks, doc_id, embedder.embed_texts([c["text"] for c in chunks]))
+        start = time.perf_counter()
+        index.add_chunks(chunks, doc_id)
+        bm25_s += time.perf_counter() - start
+    return store, index, bm25_s
+
+
+def queries(docs: Dict[str, List[Dict]], n: int, seed: int = 1):
+    rng = random.Random(seed)
+    doc_ids = list(docs)
+    exact, paraphrase = [], []
+    for _ in range(n):
+        doc_id = rng.choice(doc_ids)
+        j = rng.randrange(len(CLAUSES))
+        title = CLAUSES[j][0]
+        exact.append((f"what does section {doc_id[3:]}.{j + 1} say about {title.lower()}", f"{doc_id}_chunk_{j}"))
+        paraphrase.append((rng.choice(PARAPHRASES[title]), title))
+    return exact, paraphrase
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = corpus(args.docs)
+    embedder = TopicEmbedder()
+    topic_of = {f"{doc_id}_chunk_{j}": c["topic"] for doc_id, chunks in docs.items() for j, c in enumerate(chunks)}
+    exact, paraphrase = queries(docs, args.queries)
+
+    with tempfile.TemporaryDirectory() as path:
+        store, index, bm25_s = build(path, docs, embedder)
+        n_chunks = index.count()
+        print(f"corpus: {args.docs} docs, {n_chunks} chunks; BM25 indexing {n_chunks / bm25_s:,.0f} chunks/s")
+
+        start = time.perf_counter()
+        index.save()
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index = BM25Index(path=os.path.join(path, "bm25"))
+        load_s = time.perf_counter() - start
+        size_mb = os.path.getsize(index.snapshot_path) / 1e6
+        print(f"snapshot: {size_mb:.1f} MB, save {save_s * 1000:.0f} ms, load {load_s * 1000:.0f} ms\n")
+
+        rag = RAGSystem(embedding_manager=embedder, vector_store=store, bedrock_llm=StubBedrockLLM(0), bm25_index=index)
+        rag.answer_cache = None
+
+        def dense(q):
+            rag.bm25_index = None
+            return [c["id"] for c in rag.retrieve(q, args.k)[1]]
+
+        def sparse(q):
+            return [chunk_id for chunk_id, _ in index.search(q, args.k)]
+
+        def hybrid(q):
+            rag.bm25_index = index
+            return [c["id"] for c in rag.retrieve(q, args.k)[1]]
+
+        print(f"{'mode':>7} {'exact recall@k':>15} {'exact MRR':>10} {'paraphrase P@k':>15} {'p50 ms':>7} {'p95 ms':>7}")
+        for name, fn in (("dense", dense), ("sparse", sparse), ("hybrid", hybrid)):
+            latencies, hits, rr, topical = [], 0, 0.0, 0.0
+            for q, target in exact:
+                start = time.perf_counter()
+                ids = fn(q)
+                latencies.append(time.perf_counter() - start)
+                if target in ids:
+                    hits += 1
+                    rr += 1.0 / (ids.index(target) + 1)
+            for q, topic in paraphrase:
+                start = time.perf_counter()
+                ids = fn(q)
+                latencies.append(time.perf_counter() - start)
+                topical += sum(topic_of[i] == topic for i in ids) / args.k
+            print(
+                f"{name:>7} {hits / len(exact):>15.3f} {rr / len(exact):>10.3f} {topical / len(paraphrase):>15.3f}"
+                f" {percentile(latencies, 50) * 1000:>7.2f} {percentile(latencies, 95) * 1000:>7.2f}"
+            )
+
+        rag.close()
+
+
+if __name__ == "__main__":
+    main()
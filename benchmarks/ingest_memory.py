@@ -0,0 +1,58 @@
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.stubs import StubEmbeddingManager, StubS3Manager, StubVectorStore, make_pdf, synthetic_pages
+from app.services.artifact_store import ArtifactSpool, ArtifactStore, ArtifactWriter
+from app.services.document_processor import DocumentProcessor
+from app.services.local_clients import InMemoryS3Client
+from app.services.s3_manager import S3Manager
+
+# Peak Python heap of process_document by document size. The PDF bytes are
+# allocated before tracing starts, so the peak is the pipeline's own working set.
+#   python -m benchmarks.ingest_memory --pages 50 200 800 [--artifacts]
+#
+# --artifacts adds an artifact writer; its parts are spooled to disk batch by
+# batch, so the peak should not grow with it.
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--artifacts", action="store_true", help="write processed artifacts behind ingestion")
+    args = parser.parse_args()
+
+    embedding_manager = StubEmbeddingManager(0)
+    writer = None
+    if args.artifacts:
+        s3_manager = S3Manager(client=InMemoryS3Client(0))
+        s3_manager.create_buckets()
+        spool_dir = tempfile.mkdtemp()
+        writer = ArtifactWriter(ArtifactStore(s3_manager), embedding_manager)
+        writer.spool = lambda: ArtifactSpool(spool_dir)
+    processor = DocumentProcessor(
+        s3_manager=StubS3Manager(0),
+        embedding_manager=embedding_manager,
+        vector_store=StubVectorStore(0),
+        artifacts=writer,
+    )
+
+    print(f"{'pages':>6} {'pdf MB':>7} {'chunks':>7} {'seconds':>8} {'peak MB':>8}")
+    for n_pages in args.pages:
+        pdf = make_pdf(synthetic_pages(n_pages))
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = processor.process_document(pdf, f"synthetic_{n_pages}.pdf")
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{n_pages:>6} {len(pdf) / 1e6:>7.1f} {result['chunk_count']:>7} {elapsed:>8.2f} {peak / 1e6:>8.1f}")
+        if writer is not None:
+            writer.flush()
+    if writer is not None:
+        writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import time
+
+from benchmarks.stubs import StubEmbeddingManager, StubS3Manager, StubVectorStore, make_pdf, synthetic_pages
+from app.services.document_processor import DocumentProcessor
+from app.services.ingestion_queue import IngestionQueue
+
+# Ingest throughput through the /upload job queue against local stand-ins.
+#   python -m benchmarks.ingest_throughput --docs 100 --workers 1 2 4 8
+
+
+def run(pdfs, workers: int, args) -> dict:
+    processor = DocumentProcessor(
+        s3_manager=StubS3Manager(args.s3_latency),
+        embedding_manager=StubEmbeddingManager(args.embed_latency),
+        vector_store=StubVectorStore(args.vector_latency),
+    )
+    ingest = IngestionQueue(processor, workers=workers)
+    ingest.start()
+
+    start = time.perf_counter()
+    jobs = [ingest.submit(pdf, f"synthetic_{i}.pdf") for i, pdf in enumerate(pdfs)]
+    while any(job.status in ("queued", "running") for job in jobs):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    ingest.stop()
+
+    failed = [job for job in jobs if job.status == "failed"]
+    if failed:
+        print(f"  {len(failed)} jobs failed, first error: {failed[0].error}")
+
+    return {
+        "workers": workers,
+        "docs": len(jobs) - len(failed),
+        "seconds": elapsed,
+        "docs_per_min": (len(jobs) - len(failed)) / elapsed * 60,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--vector-latency", type=float, default=0.03)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    pdfs = [make_pdf(synthetic_pages(args.pages, seed=i)) for i in range(args.docs)]
+    print(f"generated {len(pdfs)} PDFs ({sum(len(p) for p in pdfs) / 1e6:.1f} MB)")
+
+    print(f"{'workers':>8} {'docs':>6} {'seconds':>9} {'docs/min':>10}")
+    for workers in args.workers:
+        r = run(pdfs, workers, args)
+        print(f"{r['workers']:>8} {r['docs']:>6} {r['seconds']:>9.2f} {r['docs_per_min']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
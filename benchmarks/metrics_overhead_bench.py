@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import FakeBedrockRuntimeClient, StubEmbeddingManager, StubS3Manager, StubVectorStore, make_pdf, synthetic_pages
+from app.core import metrics
+from app.core.config import Config
+from app.services.bedrockllm import BedrockLLM
+from app.services.document_processor import DocumentProcessor
+from app.services.rag_system import RAGSystem
+
+# Cost of the stage timers on the query hot path, and the /metrics output they produce.
+#   python -m benchmarks.metrics_overhead_bench --queries 2000
+#
+# Queries run against zero-latency stand-ins, so the pipeline's own Python work
+# is all that is measured; the difference with METRICS_ENABLED off is the
+# instrumentation cost per query. Then a document is ingested and a few real
+# shaped Bedrock calls are made, and the exported series are checked.
+
+
+async def per_query_seconds(rag: RAGSystem, queries: int) -> float:
+    start = time.perf_counter()
+    for i in range(queries):
+        await rag.aquery(f"Can I cancel my subscription? ({i})", top_k=5)
+    return (time.perf_counter() - start) / queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    Config.ANSWER_CACHE_ENABLED = False
+    rag = RAGSystem(
+        embedding_manager=StubEmbeddingManager(0),
+        vector_store=StubVectorStore(0),
+        bedrock_llm=BedrockLLM(client=FakeBedrockRuntimeClient(0, 0, 10)),
+    )
+
+    timings = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            Config.METRICS_ENABLED = enabled
+            timings[enabled].append(asyncio.run(per_query_seconds(rag, args.queries)))
+    off, on = min(timings[False]), min(timings[True])
+    print(f"aquery with zero-latency backends, best of {args.rounds} x {args.queries}")
+    print(f"  metrics off: {off * 1e6:8.1f} us/query")
+    print(f"  metrics on:  {on * 1e6:8.1f} us/query  (+{(on - off) * 1e6:.1f} us, {on / off - 1:+.1%})")
+
+    n = 200000
+    start = time.perf_counter()
+    for _ in range(n):
+        with metrics.Stage("bench"):
+            pass
+    print(f"  one stage timer: {(time.perf_counter() - start) / n * 1e9:.0f} ns")
+
+    #what a scrape shows after some traffic
+    processor = DocumentProcessor(
+        s3_manager=StubS3Manager(0), embedding_manager=StubEmbeddingManager(0), vector_store=StubVectorStore(0),
+    )
+    processor.process_document(make_pdf(synthetic_pages(4)), "metrics.pdf")
+
+    async def stream():
+        async for _ in rag.astream("Is there an arbitration clause?", top_k=5):
+            pass
+    asyncio.run(stream())
+
+    output = metrics.render()
+    expected = [
+        'legal_rag_stage_seconds_count{stage="%s"}' % stage
+        for stage in ("text_extraction", "text_cleaning", "chunking", "embedding", "vector_store", "vector_upsert",
+                      "s3_upload", "ingest", "query_embed", "vector_search", "context_build", "llm_generation",
+                      "llm_first_token", "query")
+    ] + ['legal_rag_bedrock_tokens_total{type="input"}', 'legal_rag_bedrock_tokens_total{type="output"}',
+         'legal_rag_documents_total{outcome="ingested"}', 'legal_rag_stage_in_flight{stage="query"} 0']
+    missing = [series for series in expected if series not in output]
+    print(f"\n/metrics: {len(output.splitlines())} lines, {len(expected) - len(missing)}/{len(expected)} expected series present")
+    for series in missing:
+        print(f"  missing: {series}")
+    for line in output.splitlines():
+        if line.startswith(("legal_rag_bedrock_tokens_total", "legal_rag_chunks_total", "legal_rag_documents_total")):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import time
+
+from benchmarks.stubs import make_pdf, synthetic_pages
+from app.core.config import Config
+from app.services.pdf_processor import PDFProcessor, _get_pool
+
+# Serial vs process-pool page extraction on generated multi-hundred-page PDFs.
+#   python -m benchmarks.pdf_extract_bench --pages 100 200 400 800 --workers 4
+
+
+def timed_extract(pdf: bytes, workers: int, repeats: int):
+    Config.PDF_WORKERS = workers
+    best, text = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        text = PDFProcessor.extract_text(pdf)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 200, 400, 800])
+    parser.add_argument("--workers", type=int, default=Config.PDF_WORKERS)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    Config.PDF_WORKERS = args.workers
+    Config.PDF_PARALLEL_MIN_PAGES = 1
+    list(_get_pool().map(int, range(args.workers * 4)))  # start workers before timing
+
+    print(f"{'pages':>6} {'MB':>6} {'serial s':>9} {'pool s':>8} {'speedup':>8}")
+    for n_pages in args.pages:
+        pdf = make_pdf(synthetic_pages(n_pages, lines_per_page=60))
+        serial, serial_text = timed_extract(pdf, 1, args.repeats)
+        pooled, pooled_text = timed_extract(pdf, args.workers, args.repeats)
+        assert pooled_text == serial_text, "parallel extraction changed the text"
+        print(f"{n_pages:>6} {len(pdf) / 1e6:>6.1f} {serial:>9.2f} {pooled:>8.2f} {serial / pooled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
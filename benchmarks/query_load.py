@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import StubBedrockLLM, StubVectorStore, StubEmbeddingManager, percentile
+from app.services.rag_system import RAGSystem
+
+# Load test for the /query pipeline using stub backends.
+#   python -m benchmarks.query_load --requests 256 --bedrock-latency 0.5
+# --blocking runs the old synchronous RAGSystem.query on the event loop for comparison.
+
+
+async def run_level(rag: RAGSystem, clients: int, total: int, blocking: bool):
+    latencies = []
+    remaining = total
+    loop_lag = []
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            if blocking:
+                rag.query("Can I cancel my subscription?", top_k=5)
+            else:
+                await rag.aquery("Can I cancel my subscription?", top_k=5)
+            latencies.append(time.perf_counter() - start)
+
+    async def ticker():
+        #stands in for /health: how long the loop takes to get back to us
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            loop_lag.append(time.perf_counter() - start - 0.01)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    tick.cancel()
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": len(latencies) / elapsed,
+        "max_loop_lag_ms": max(loop_lag, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--vector-latency", type=float, default=0.03)
+    parser.add_argument("--bedrock-latency", type=float, default=0.5)
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+
+    rag = RAGSystem(
+        embedding_manager=StubEmbeddingManager(args.embed_latency),
+        vector_store=StubVectorStore(args.vector_latency),
+        bedrock_llm=StubBedrockLLM(args.bedrock_latency),
+    )
+    #every client asks the same question; measure the pipeline, not the answer cache
+    rag.answer_cache = None
+
+    async def run_all():
+        #one loop for every level: the RAGSystem semaphores bind to it
+        return [await run_level(rag, clients, args.requests, args.blocking) for clients in args.levels]
+
+    print(f"{'clients':>8} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'loop lag ms':>12}")
+    for r in asyncio.run(run_all()):
+        print(
+            f"{r['clients']:>8} {r['requests']:>9} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+            f"{r['throughput_rps']:>8.1f} {r['max_loop_lag_ms']:>12.1f}"
+        )
+
+    rag.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import StubS3Manager, percentile
+from app.api.routes import router
+from app.core.config import Config
+from app.core.state import AppState
+from app.services.document_registry import DocumentRegistry
+
+# Startup time and /documents latency of the document registry by size, plus
+# the time to rebuild an empty registry from an S3 listing and vector metadata.
+#   python -m benchmarks.registry_bench --sizes 1000 10000 100000
+
+
+class MetadataOnlyStore:
+    def __init__(self, doc_ids, chunks_per_doc: int = 20):
+        self.doc_ids = doc_ids
+        self.chunks_per_doc = chunks_per_doc
+
+    def iter_metadatas(self, batch_size: int = 1000):
+        batch = []
+        for doc_id in self.doc_ids:
+            for i in range(self.chunks_per_doc):
+                batch.append({"doc_id": doc_id, "section": "1. GENERAL", "chunk_index": i})
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+def result(i: int):
+    return {
+        "doc_id": f"{i:032x}",
+        "filename": f"contract_{i}.pdf",
+        "metadata": {"doc_type": "EULA", "timestamp": datetime.now().isoformat(), "word_count": 5000, "char_count": 30000},
+        "chunk_count": 20,
+    }
+
+
+def timed(fn, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'docs':>7} {'put/s':>8} {'open ms':>8} {'page1 p50':>10} {'deep p50':>9} {'deep p99':>9} {'get p50':>8} {'rebuild s':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "documents.sqlite3")
+            registry = DocumentRegistry(path)
+            start = time.perf_counter()
+            for i in range(size):
+                registry.put(result(i))
+            put_rate = size / (time.perf_counter() - start)
+            registry.close()
+
+            #startup: opening an existing registry
+            start = time.perf_counter()
+            registry = DocumentRegistry(path)
+            open_ms = (time.perf_counter() - start) * 1000
+
+            app = FastAPI()
+            app.include_router(router)
+            app.state.app_state = AppState(document_registry=registry)
+            client = TestClient(app)
+
+            page1, _ = timed(lambda: client.get("/documents", params={"limit": 50}), args.repeat)
+            #a cursor near the end of the listing: the oldest documents
+            deep_cursor = str(rng.randint(1, 100))
+            deep50, deep99 = timed(lambda: client.get("/documents", params={"limit": 50, "cursor": deep_cursor}), args.repeat)
+            get50, _ = timed(lambda: client.get(f"/documents/{rng.randrange(size):032x}"), args.repeat)
+            registry.close()
+
+            #rebuild an empty registry from listings
+            s3 = StubS3Manager(latency=0)
+            for i in range(size):
+                s3.objects[(Config.RAW_BUCKET, f"contract_{i}.pdf")] = b""
+            doc_ids = [hashlib.md5(f"contract_{i}.pdf".encode()).hexdigest() for i in range(size)]
+            rebuilt = DocumentRegistry(os.path.join(tmp, "rebuilt.sqlite3"))
+            start = time.perf_counter()
+            rebuilt.rebuild(s3, MetadataOnlyStore(doc_ids))
+            rebuild_s = time.perf_counter() - start
+            assert rebuilt.count() == size
+            rebuilt.close()
+
+        print(f"{size:>7} {put_rate:>8,.0f} {open_ms:>8.1f} {page1:>10.2f} {deep50:>9.2f} {deep99:>9.2f} {get50:>8.2f} {rebuild_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.stubs import StubEmbeddingManager, StubS3Manager, make_pdf, synthetic_pages
+from app.services.bm25_index import BM25Index
+from app.services.document_processor import DocumentProcessor
+from app.services.document_registry import DocumentRegistry
+from app.services.local_vector_store import LocalVectorStore
+
+# Incremental re-ingest: an unchanged upload, an edited new version and a
+# from-scratch ingest of the same edited version, on the local vector store.
+#   python -m benchmarks.reingest_bench --pages 200 --edited 5
+
+
+class CountingEmbeddingManager(StubEmbeddingManager):
+    #stands in for the model at a fixed cost per text, and counts texts embedded
+    def __init__(self, per_text: float):
+        super().__init__(latency=0)
+        self.per_text = per_text
+        self.embedded = 0
+
+    def embed_texts(self, texts):
+        self.embedded += len(texts)
+        time.sleep(self.per_text * len(texts))
+        return super().embed_texts(texts)
+
+
+def edit_pages(pages, every: int):
+    return [[line + " Amended." for line in lines] if p % every == 0 else lines for p, lines in enumerate(pages)]
+
+
+def make_processor(path: str, embedder: CountingEmbeddingManager) -> DocumentProcessor:
+    return DocumentProcessor(
+        s3_manager=StubS3Manager(0),
+        embedding_manager=embedder,
+        vector_store=LocalVectorStore(path=os.path.join(path, "vectors")),
+        bm25_index=BM25Index(path=os.path.join(path, "bm25")),
+        registry=DocumentRegistry(os.path.join(path, "documents.sqlite3")),
+    )
+
+
+def ingest(processor: DocumentProcessor, pdf: bytes, filename: str):
+    start = time.perf_counter()
+    result = processor.process_document(pdf, filename)
+    elapsed = time.perf_counter() - start
+    processor.registry.put(result)
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--edited", type=int, default=5, help="number of pages changed in the new version")
+    parser.add_argument("--per-text-ms", type=float, default=2.0, help="simulated embedding cost per chunk")
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    original = make_pdf(pages)
+    edited = make_pdf(edit_pages(pages, max(1, args.pages // max(1, args.edited))))
+
+    print(f"{'scenario':>22} {'seconds':>8} {'chunks':>7} {'reused':>7} {'embedded':>9} {'deleted':>8}")
+
+    def report(name, result, elapsed):
+        print(
+            f"{name:>22} {elapsed:>8.3f} {result['chunk_count']:>7} {result['reused_chunks']:>7}"
+            f" {result['embedded_chunks']:>9} {result['deleted_chunks']:>8}"
+        )
+
+    with tempfile.TemporaryDirectory() as path:
+        embedder = CountingEmbeddingManager(args.per_text_ms / 1000)
+        processor = make_processor(path, embedder)
+
+        report("first ingest", *ingest(processor, original, "contract.pdf"))
+        report("identical re-upload", *ingest(processor, original, "contract.pdf"))
+        report("same bytes, new name", *ingest(processor, original, "contract_copy.pdf"))
+        result, elapsed = ingest(processor, edited, "contract.pdf")
+        report("edited version", result, elapsed)
+        assert len(processor.vector_store.doc_chunks(result["doc_id"])) == result["chunk_count"]
+
+    with tempfile.TemporaryDirectory() as path:
+        processor = make_processor(path, CountingEmbeddingManager(args.per_text_ms / 1000))
+        report("edited, from scratch", *ingest(processor, edited, "contract.pdf"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import tempfile
+
+from benchmarks.reingest_bench import CountingEmbeddingManager, ingest, make_processor
+from benchmarks.stubs import make_pdf, synthetic_pages
+from app.core.config import Config
+
+# Checks the ingest identity rules next to reingest_bench: the same bytes under
+# a second name become a document of their own (no re-embedding) that outlives
+# the original, and an unrelated file under a stored name is reported as a
+# replacement, or refused with INGEST_ALLOW_REPLACE=false.
+#   python -m benchmarks.rename_check --pages 40
+
+
+def check_copy(pages: int):
+    original = make_pdf(synthetic_pages(pages))
+    with tempfile.TemporaryDirectory() as path:
+        embedder = CountingEmbeddingManager(0)
+        processor = make_processor(path, embedder)
+        first, _ = ingest(processor, original, "contract.pdf")
+        embedded = embedder.embedded
+        copy, _ = ingest(processor, original, "contract_copy.pdf")
+
+        assert copy["filename"] == "contract_copy.pdf" and copy["doc_id"] != first["doc_id"]
+        assert copy["duplicate_of"] == first["doc_id"] and copy["deduplicated"] and not copy["replaced"]
+        assert copy["embedded_chunks"] == 0 and embedder.embedded == embedded
+        assert copy["chunk_count"] == first["chunk_count"]
+        assert copy["metadata"]["filename"] == "contract_copy.pdf"
+        assert (Config.RAW_BUCKET, "contract_copy.pdf") in processor.s3_manager.objects
+        listed = {doc["filename"]: doc for doc in processor.registry.list(limit=10)[0]}
+        assert listed["contract_copy.pdf"]["duplicate_of"] == first["doc_id"]
+
+        processor.delete_document(first["doc_id"])
+        processor.registry.delete(first["doc_id"])
+        assert not processor.vector_store.doc_chunks(first["doc_id"])
+        assert len(processor.vector_store.doc_chunks(copy["doc_id"])) == copy["chunk_count"]
+        hits = processor.bm25_index.search("licensee", 5, [copy["doc_id"]])
+        assert hits, "copy lost its keyword index entries with the original"
+
+        again, _ = ingest(processor, original, "contract_copy.pdf")
+        assert again["doc_id"] == copy["doc_id"] and again["deduplicated"] and again["embedded_chunks"] == 0
+    print(f"same bytes, new name: own document, 0 embedded, survives deleting the original ({copy['chunk_count']} chunks)")
+
+
+def check_replace(pages: int):
+    contract = make_pdf(synthetic_pages(pages, seed=1))
+    unrelated = make_pdf(synthetic_pages(pages, seed=2))
+    allow = Config.INGEST_ALLOW_REPLACE
+    try:
+        with tempfile.TemporaryDirectory() as path:
+            processor = make_processor(path, CountingEmbeddingManager(0))
+            first, _ = ingest(processor, contract, "report.pdf")
+            stored = set(processor.vector_store.doc_chunks(first["doc_id"]))
+
+            Config.INGEST_ALLOW_REPLACE = False
+            try:
+                ingest(processor, unrelated, "report.pdf")
+            except RuntimeError as e:
+                print(f"refused: {e}")
+            else:
+                raise AssertionError("replacement was not refused")
+            assert set(processor.vector_store.doc_chunks(first["doc_id"])) == stored
+            assert processor.registry.get(first["doc_id"])["content_hash"] == first["content_hash"]
+            assert processor.s3_manager.objects[(Config.RAW_BUCKET, "report.pdf")] == contract
+
+            Config.INGEST_ALLOW_REPLACE = True
+            replaced, _ = ingest(processor, unrelated, "report.pdf")
+            assert replaced["replaced"] and replaced["doc_id"] == first["doc_id"]
+            edited, _ = ingest(processor, unrelated + b"\n", "report.pdf")
+            assert not edited["replaced"]
+    finally:
+        Config.INGEST_ALLOW_REPLACE = allow
+    print(f"unrelated file, same name: replaced={replaced['replaced']}, refused with INGEST_ALLOW_REPLACE=false")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+    check_copy(args.pages)
+    check_replace(args.pages)
+
+
+if __name__ == "__main__":
+    main()
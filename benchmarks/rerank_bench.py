@@ -0,0 +1,115 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+from benchmarks.stubs import StubCrossEncoder, StubEmbeddingManager, eula_document, make_pdf, percentile
+from app.core.config import Config
+from app.services.bm25_index import BM25Index
+from app.services.document_processor import DocumentProcessor
+from app.services.local_clients import InMemoryS3Client
+from app.services.local_vector_store import LocalVectorStore
+from app.services.rag_system import RAGSystem
+from app.services.reranker import Reranker, load_cross_encoder
+from app.services.s3_manager import S3Manager
+
+# Added retrieval latency vs answer-context precision of the cross-encoder
+# reranker, on labeled questions over a generated EULA corpus.
+#   python -m benchmarks.rerank_bench --docs 30 --top-k 5
+#   python -m benchmarks.rerank_bench --scorer model --embedder model   # real models
+#
+# Each question asks about one clause of one document; a retrieved chunk is
+# relevant if it comes from that document and a section with that clause's
+# title. precision@k is the relevant share of the top_k chunks that go into
+# the prompt, hit@k the share of questions with at least one. The stub scorer
+# (default) is a word-overlap stand-in with a per-pair cost, so the latency
+# columns show the batching and budget behaviour, not a real model's speed.
+
+
+def relevant(chunk, doc_id: str, title: str) -> bool:
+    return chunk["metadata"].get("doc_id") == doc_id and chunk["metadata"].get("section", "").endswith(f". {title}")
+
+
+def evaluate(rag: RAGSystem, questions, top_k: int):
+    latencies, precision, hits = [], 0.0, 0
+    for question, doc_id, title in questions:
+        start = time.perf_counter()
+        _, chunks = rag.retrieve(question, top_k)
+        latencies.append(time.perf_counter() - start)
+        n = sum(relevant(c, doc_id, title) for c in chunks)
+        precision += n / top_k
+        hits += n > 0
+    return latencies, precision / len(questions), hits / len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=30)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pools", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0, 25], help="ms, 0 = no limit")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--scorer", choices=["stub", "model"], default="stub")
+    parser.add_argument("--pair-latency", type=float, default=0.002, help="stub scorer seconds per pair")
+    parser.add_argument("--embedder", choices=["stub", "model"], default="stub")
+    args = parser.parse_args()
+
+    Config.ANSWER_CACHE_ENABLED = False
+    Config.EMBED_CACHE_ENABLED = False
+    Config.MAX_DISTANCE = 0
+
+    if args.embedder == "stub":
+        embedding_manager = StubEmbeddingManager(0)
+    else:
+        from app.services.embedding_manager import EmbeddingManager
+        embedding_manager = EmbeddingManager()
+    scorer = StubCrossEncoder(args.pair_latency) if args.scorer == "stub" else load_cross_encoder()
+
+    with tempfile.TemporaryDirectory() as path:
+        s3_manager = S3Manager(client=InMemoryS3Client())
+        s3_manager.create_buckets()
+        vector_store = LocalVectorStore(path=os.path.join(path, "vectors"))
+        bm25_index = BM25Index(path=os.path.join(path, "bm25"))
+        processor = DocumentProcessor(
+            s3_manager=s3_manager, embedding_manager=embedding_manager, vector_store=vector_store, bm25_index=bm25_index,
+        )
+
+        questions = []
+        for d in range(args.docs):
+            pages, doc_questions = eula_document(d, args.pages)
+            filename = f"eula_{d:05d}.pdf"
+            processor.process_document(make_pdf(pages), filename)
+            doc_id = hashlib.md5(filename.encode()).hexdigest()
+            questions.extend((question, doc_id, title) for question, title in doc_questions)
+        print(f"{args.docs} documents, {len(questions)} labeled questions, top_k={args.top_k}, {args.scorer} scorer\n")
+
+        print(f"{'retrieval':>26} {'p50 ms':>8} {'p95 ms':>8} {'added p50':>10} {'precision@k':>12} {'hit@k':>7} {'cutoffs':>8}")
+        rag = RAGSystem(embedding_manager=embedding_manager, vector_store=vector_store, bedrock_llm=object(), bm25_index=bm25_index)
+        latencies, precision, hit_rate = evaluate(rag, questions, args.top_k)
+        baseline = percentile(latencies, 50)
+        print(f"{'hybrid, no rerank':>26} {baseline * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}"
+              f" {'-':>10} {precision:>12.1%} {hit_rate:>7.1%} {'-':>8}")
+
+        reranker = None
+        for budget in args.budgets:
+            for pool in args.pools:
+                Config.RERANK_CANDIDATES = pool
+                reranker = Reranker(model=scorer, batch_size=args.batch_size, budget_ms=budget)
+                rag.reranker = reranker
+                latencies, precision, hit_rate = evaluate(rag, questions, args.top_k)
+                name = f"rerank {pool}" + (f", budget {budget:g} ms" if budget else "")
+                print(f"{name:>26} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}"
+                      f" {(percentile(latencies, 50) - baseline) * 1000:>+10.1f} {precision:>12.1%} {hit_rate:>7.1%}"
+                      f" {reranker.cutoffs:>8}")
+
+        #the same questions again: every score comes from the cache
+        latencies, precision, hit_rate = evaluate(rag, questions, args.top_k)
+        print(f"{'last, repeated (cached)':>26} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}"
+              f" {(percentile(latencies, 50) - baseline) * 1000:>+10.1f} {precision:>12.1%} {hit_rate:>7.1%} {'-':>8}")
+        rag.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stubs import percentile
+from benchmarks.vector_store_bench import synthetic_embeddings
+from app.services.local_vector_store import LocalVectorStore
+from app.services.vector_store import QueryFilter
+
+# Latency of filtered (scoped) vs global queries on the local vector store:
+# one document, a handful of documents, one doc type and a section prefix.
+#   python -m benchmarks.scoped_query_bench --docs 500 --chunks 200
+
+DOC_TYPES = ["terms_of_service", "privacy_policy", "eula", "nda", "employment_agreement"]
+SECTIONS = ["1. DEFINITIONS", "2. LICENSE", "3. FEES", "4. DATA COLLECTION", "5. TERMINATION",
+            "6. WARRANTY DISCLAIMER", "7. LIMITATION OF LIABILITY", "8. ARBITRATION", "9. GOVERNING LAW", "10. GENERAL"]
+
+
+def build(path: str, n_docs: int, n_chunks: int, dim: int, rng) -> LocalVectorStore:
+    store = LocalVectorStore(path=path, use_hnsw=False)
+    for d in range(n_docs):
+        chunks = [
+            {"text": f"doc {d} chunk {i}", "section": SECTIONS[i * len(SECTIONS) // n_chunks], "chunk_index": i,
+             "doc_type": DOC_TYPES[d % len(DOC_TYPES)]}
+            for i in range(n_chunks)
+        ]
+        store.add_chunks(chunks, f"doc{d}", synthetic_embeddings(n_chunks, dim, rng))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=200, help="chunks per document")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = synthetic_embeddings(args.queries, args.dim, rng)
+    scenarios = [
+        ("global", None),
+        ("one document", lambda i: QueryFilter(doc_ids=[f"doc{i % args.docs}"])),
+        ("five documents", lambda i: QueryFilter(doc_ids=[f"doc{(i + j * 7) % args.docs}" for j in range(5)])),
+        ("one doc type", lambda i: QueryFilter(doc_type=DOC_TYPES[i % len(DOC_TYPES)])),
+        ("document + section", lambda i: QueryFilter(doc_ids=[f"doc{i % args.docs}"], section_prefix="8.")),
+        ("section prefix", lambda i: QueryFilter(section_prefix="8.")),
+    ]
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        store = build(path, args.docs, args.chunks, args.dim, rng)
+        print(f"{store.count():,} chunks in {args.docs} documents, built in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'scenario':>20} {'rows searched':>14} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+        global_p50 = None
+        for name, make_filter in scenarios:
+            latencies, rows_searched = [], 0
+            for i, q in enumerate(queries):
+                filters = make_filter(i) if make_filter else None
+                begin = time.perf_counter()
+                results = store.query(q, n_results=args.k, filters=filters)
+                latencies.append(time.perf_counter() - begin)
+
+                if filters is not None:
+                    assert all(filters.matches(m) for m in results["metadatas"][0])
+                    rows_searched += len(store._filter_rows(filters))
+                else:
+                    rows_searched += store.count()
+
+            p50 = percentile(latencies, 50)
+            global_p50 = global_p50 or p50
+            print(
+                f"{name:>20} {rows_searched // len(queries):>14,} {p50 * 1000:>8.2f}"
+                f" {percentile(latencies, 95) * 1000:>8.2f} {global_p50 / p50:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Startup time and memory per worker: separate vs shared services, and N
+# workers loading the embedding model themselves vs forked from a parent that
+# preloaded it (PRELOAD_EMBEDDING_MODEL under gunicorn --preload).
+#   python -m benchmarks.startup_bench --workers 4
+#
+# Every scenario runs in a fresh interpreter. Memory is read from
+# /proc/self/smaps_rollup (Linux): PSS splits shared pages between the
+# processes mapping them, so summing PSS over workers gives their real total.
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb"]
+
+
+def memory_mb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "private": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def child(mode: str, workers: int):
+    start = time.perf_counter()
+    result = {}
+
+    if mode == "import":
+        import app.main  # noqa: F401
+        result["heavy"] = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    elif mode == "separate":
+        #what RAGSystem() and DocumentProcessor() did: one model each
+        from sentence_transformers import SentenceTransformer
+        from app.core.config import Config
+        models = [SentenceTransformer(Config.EMBEDDING_MODEL) for _ in range(2)]
+        for model in models:
+            model.encode(["warm up"])
+
+    elif mode == "shared":
+        from app.core.services import get_services
+        services = get_services()
+        services.warm_up(create_buckets=False)
+        services.embedding_manager.embed_texts(["warm up"])
+
+    elif mode == "app":
+        from fastapi.testclient import TestClient
+        from benchmarks.stubs import StubS3Manager
+        from app.core.services import get_services
+        from app.main import app
+        get_services()._services["s3_manager"] = StubS3Manager(0)
+        with TestClient(app) as client:
+            result["live_s"] = time.perf_counter() - start
+            while client.get("/health/ready").status_code != 200:
+                time.sleep(0.01)
+            result["ready_s"] = time.perf_counter() - start
+
+    elif mode in ("workers", "preloaded"):
+        from app.services.embedding_manager import load_model
+        if mode == "preloaded":
+            load_model()
+        pipes = []
+        for _ in range(workers):
+            read_fd, write_fd = os.pipe()
+            if os.fork() == 0:
+                os.close(read_fd)
+                load_model().encode(["warm up"])
+                os.write(write_fd, json.dumps(memory_mb()).encode())
+                os._exit(0)
+            os.close(write_fd)
+            pipes.append(read_fd)
+        reports = []
+        for read_fd in pipes:
+            with os.fdopen(read_fd) as f:
+                reports.append(json.loads(f.read()))
+        for _ in pipes:
+            os.wait()
+        result["workers"] = reports
+
+    result["seconds"] = time.perf_counter() - start
+    result["memory"] = memory_mb()
+    print(json.dumps(result))
+
+
+def run(mode: str, workers: int, env: dict):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_bench", "--child", mode, "--workers", str(workers)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.workers)
+        return
+
+    with tempfile.TemporaryDirectory() as path:
+        env = dict(
+            os.environ,
+            VECTOR_BACKEND="local",
+            LOCAL_INDEX_DIR=os.path.join(path, "vectors"),
+            BM25_INDEX_DIR=os.path.join(path, "bm25"),
+            REGISTRY_PATH=os.path.join(path, "documents.sqlite3"),
+            EMBED_CACHE_PATH=os.path.join(path, "embeddings.sqlite3"),
+            AWS_REGION=os.environ.get("AWS_REGION", "us-east-1"),
+        )
+
+        imported = run("import", 0, env)
+        print(f"import app.main: {imported['seconds']:.2f}s, heavy modules loaded: {imported['heavy'] or 'none'}")
+
+        started = run("app", 0, env)
+        print(f"app startup: live after {started['live_s']:.2f}s, ready after {started['ready_s']:.2f}s,"
+              f" RSS {started['memory']['rss']:.0f} MB\n")
+
+        print(f"{'services':>22} {'load s':>7} {'RSS MB':>7}")
+        for mode, name in (("separate", "model per service"), ("shared", "shared container")):
+            result = run(mode, 0, env)
+            print(f"{name:>22} {result['seconds']:>7.2f} {result['memory']['rss']:>7.0f}")
+
+        print(f"\n{args.workers} workers {'':>12} {'RSS MB':>7} {'PSS MB':>7} {'private MB':>11} {'total PSS MB':>13}")
+        for mode, name in (("workers", "each loads model"), ("preloaded", "forked after preload")):
+            reports = run(mode, args.workers, env)["workers"]
+            n = len(reports)
+            print(
+                f"{name:>22} {sum(r['rss'] for r in reports) / n:>7.0f} {sum(r['pss'] for r in reports) / n:>7.0f}"
+                f" {sum(r['private'] for r in reports) / n:>11.0f} {sum(r['pss'] for r in reports):>13.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import FakeBedrockRuntimeClient, StubVectorStore, StubEmbeddingManager, percentile
+from app.services.bedrockllm import BedrockLLM
+from app.services.rag_system import RAGSystem
+
+# Time-to-first-token of RAGSystem.astream (behind /query/stream) against
+# time-to-full-answer of RAGSystem.aquery (behind /query), using a fake
+# streaming bedrock-runtime client.
+#   python -m benchmarks.stream_ttft --first-token 0.4 --tokens 200
+
+
+async def measure(rag: RAGSystem, runs: int):
+    ttft, stream_total, blocking_total = [], [], []
+    for i in range(runs):
+        query = f"Is there an arbitration clause? ({i})"
+
+        start = time.perf_counter()
+        first = None
+        async for event, _ in rag.astream(query):
+            if event == "token" and first is None:
+                first = time.perf_counter() - start
+        ttft.append(first)
+        stream_total.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await rag.aquery(query + " (blocking)")
+        blocking_total.append(time.perf_counter() - start)
+    return ttft, stream_total, blocking_total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-token", type=float, default=0.4)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    client = FakeBedrockRuntimeClient(args.first_token, args.token_latency, args.tokens)
+    rag = RAGSystem(
+        embedding_manager=StubEmbeddingManager(),
+        vector_store=StubVectorStore(),
+        bedrock_llm=BedrockLLM(client=client),
+    )
+    rag.answer_cache = None
+
+    ttft, stream_total, blocking_total = asyncio.run(measure(rag, args.runs))
+    print(f"/query/stream first token : p50 {percentile(ttft, 50) * 1000:8.1f} ms")
+    print(f"/query/stream full answer : p50 {percentile(stream_total, 50) * 1000:8.1f} ms")
+    print(f"/query        full answer : p50 {percentile(blocking_total, 50) * 1000:8.1f} ms")
+    rag.close()
+
+
+if __name__ == "__main__":
+    main()
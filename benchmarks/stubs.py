@@ -0,0 +1,263 @@
+import hashlib
+import random
+import time
+from typing import Dict, List
+import numpy as np
+from app.services.local_clients import StubBedrockClient
+
+# Local stand-ins for the vector store / Bedrock / embedding services so the
+# benchmarks can run without AWS or Chroma Cloud credentials.
+
+EMBED_DIM = 384
+
+#the app's offline Bedrock client (LLM_BACKEND=stub)
+FakeBedrockRuntimeClient = StubBedrockClient
+
+
+def fake_vector(text: str, dim: int = EMBED_DIM) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class StubEmbeddingManager:
+    def __init__(self, latency: float = 0.005, model_id: str = "stub-hash"):
+        self.latency = latency
+        self.model_id = model_id
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        time.sleep(self.latency)
+        return np.array([fake_vector(t) for t in texts], dtype=np.float32).reshape(len(texts), EMBED_DIM)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed_texts([text])[0]
+
+
+class StubVectorStore:
+    def __init__(self, latency: float = 0.03, n_docs: int = 5):
+        self.latency = latency
+        self.n_docs = n_docs
+        self.chunk_count = 0
+
+    def add_chunks(self, chunks: List[Dict], doc_id: str, embeddings: np.ndarray, start: int = 0):
+        time.sleep(self.latency)
+        self.chunk_count += len(chunks)
+
+    def query(self, query_embedding: np.ndarray, n_results: int = 5, filters=None) -> Dict:
+        return self.query_many([query_embedding], n_results, filters)
+
+    def query_many(self, query_embeddings, n_results: int = 5, filters=None) -> Dict:
+        #one round trip regardless of the number of queries
+        time.sleep(self.latency)
+        n = min(n_results, self.n_docs)
+        m = len(query_embeddings)
+        return {
+            "ids": [[f"stub_chunk_{i}" for i in range(n)] for _ in range(m)],
+            "documents": [[f"Stub clause {i}. The licensee may cancel at any time." for i in range(n)] for _ in range(m)],
+            "metadatas": [[{"doc_id": "stub", "section": "1. GENERAL", "chunk_index": i} for i in range(n)] for _ in range(m)],
+            "distances": [[0.1 * i for i in range(n)] for _ in range(m)],
+        }
+
+    def delete_chunks(self, ids: List[str]):
+        time.sleep(self.latency)
+
+    def doc_chunks(self, doc_id: str) -> Dict[str, Dict]:
+        return {}
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        time.sleep(self.latency)
+
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        time.sleep(self.latency)
+        return [
+            {"id": i, "text": "Stub clause. The licensee may cancel at any time.",
+             "metadata": {"doc_id": "stub", "section": "1. GENERAL"}}
+            for i in ids
+        ]
+
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        time.sleep(self.latency)
+        return np.stack([fake_vector(i) for i in ids]) if ids else np.zeros((0, EMBED_DIM), dtype=np.float32)
+
+    def delete_by_doc_id(self, doc_id: str):
+        time.sleep(self.latency)
+
+
+class StubBedrockLLM:
+    def __init__(self, latency: float = 0.5):
+        self.latency = latency
+
+    def generate_response(self, query, context) -> str:
+        time.sleep(self.latency)
+        return f"Stub answer to: {query}"
+
+
+class StubCrossEncoder:
+    #Stands in for sentence_transformers.CrossEncoder: scores a pair by the
+    #distinct words query and passage share, and costs pair_latency seconds
+    #per pair, roughly what a MiniLM cross-encoder takes on one CPU core.
+
+    def __init__(self, pair_latency: float = 0.002):
+        self.pair_latency = pair_latency
+
+    @staticmethod
+    def _words(text: str):
+        return {w for w in "".join(c if c.isalnum() else " " for c in text.lower()).split() if len(w) > 2 or w.isdigit()}
+
+    def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        time.sleep(self.pair_latency * len(pairs))
+        return np.array([len(self._words(q) & self._words(p)) for q, p in pairs], dtype=np.float32)
+
+
+class StubS3Manager:
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.objects: Dict[tuple, bytes] = {}
+
+    def create_buckets(self):
+        pass
+
+    def upload_file(self, bucket: str, key: str, data: bytes, content_type: str):
+        time.sleep(self.latency)
+        self.objects[(bucket, key)] = data
+
+    def upload_fileobj(self, bucket: str, key: str, fileobj, content_type: str):
+        self.upload_file(bucket, key, fileobj.read(), content_type)
+
+    def iter_objects(self, bucket: str, prefix: str = ""):
+        keys = sorted(k for b, k in self.objects if b == bucket and k.startswith(prefix))
+        for start in range(0, len(keys), 1000):
+            yield [{"Key": k, "Size": len(self.objects[(bucket, k)])} for k in keys[start:start + 1000]]
+
+    def delete_object(self, bucket: str, key: str):
+        self.objects.pop((bucket, key), None)
+
+
+# --- synthetic PDFs ---------------------------------------------------------
+
+CLAUSES = [
+    ("LIMITATION OF LIABILITY", "In no event shall the licensor be liable for any indirect, incidental or consequential damages arising out of the use of the software."),
+    ("ARBITRATION", "Any dispute arising under this agreement shall be resolved by binding arbitration and the user waives the right to a jury trial."),
+    ("TERMINATION", "Either party may terminate this agreement at any time upon written notice and the licensee must cease all use of the software."),
+    ("DATA COLLECTION", "The licensor may collect usage data and diagnostic information to improve the service as described in the privacy policy."),
+    ("GOVERNING LAW", "This agreement is governed by the laws of the State of Delaware without regard to its conflict of law provisions."),
+    ("WARRANTY DISCLAIMER", "The software is provided as is without warranty of any kind, express or implied, including fitness for a particular purpose."),
+]
+
+
+def synthetic_pages(n_pages: int, seed: int = 0, lines_per_page: int = 40) -> List[List[str]]:
+    pages = []
+    section = 0
+    for p in range(n_pages):
+        lines = []
+        if p == 0:
+            lines.append("END USER LICENSE AGREEMENT")
+        while len(lines) < lines_per_page:
+            title, body = CLAUSES[(seed + section) % len(CLAUSES)]
+            section += 1
+            lines.append(f"{section}. {title}")
+            for k in range(3):
+                lines.append(f"{body} Clause {seed}-{section}-{k}.")
+        pages.append(lines[:lines_per_page])
+    return pages
+
+
+VENDORS = ["Acme Software", "Northwind Labs", "Globex Systems", "Initech", "Umbrella Cloud", "Vandelay Apps",
+           "Hooli", "Stark Digital", "Wayne Analytics", "Cyberdyne Services"]
+PRODUCTS = ["Editor", "Sync", "Vault", "Studio", "Connect", "Insights", "Mobile", "Backup"]
+STATES = ["Delaware", "California", "New York", "Texas", "Washington", "Ontario", "England and Wales"]
+EULA_CLAUSES = [
+    ("GRANT OF LICENSE", "{vendor} grants you a non-exclusive, non-transferable license to install {product} on up to {n} devices."),
+    ("RESTRICTIONS", "You may not reverse engineer, decompile or disassemble {product}, except to the extent applicable law permits."),
+    ("SUBSCRIPTION AND FEES", "Fees for {product} are billed every {n} months in advance and are non-refundable except as stated here."),
+    ("TERMINATION", "{vendor} may terminate this agreement on {days} days written notice, and you must then uninstall {product}."),
+    ("DATA COLLECTION", "{product} collects diagnostic and usage data, which {vendor} retains for {days} days to improve the service."),
+    ("LIMITATION OF LIABILITY", "The total liability of {vendor} shall not exceed {amount} dollars or the fees paid in the last {n} months."),
+    ("ARBITRATION", "Disputes about {product} are settled by binding arbitration in {state}, and you waive any class action."),
+    ("GOVERNING LAW", "This agreement is governed by the laws of {state}, without regard to its conflict of law rules."),
+    ("WARRANTY DISCLAIMER", "{product} is provided as is; {vendor} disclaims all implied warranties, including merchantability."),
+    ("UPDATES", "{vendor} may update {product} automatically and will give {days} days notice of material changes to these terms."),
+]
+
+
+def eula_document(d: int, n_pages: int, lines_per_page: int = 40):
+    #A EULA-like document whose vendor, product, numbers and clause order
+    #depend on d. Returns (pages, questions): (question, clause title) for each
+    #clause, answered by any section of this document with that title.
+    rng = random.Random(d)
+    vendor = VENDORS[d % len(VENDORS)]
+    product = f"{vendor.split()[0]} {PRODUCTS[(d // len(VENDORS)) % len(PRODUCTS)]} {d}"
+    values = {"vendor": vendor, "product": product, "n": rng.randint(2, 12), "days": rng.choice([15, 30, 45, 60, 90]),
+              "amount": rng.choice([100, 500, 1000, 5000]), "state": rng.choice(STATES)}
+    clauses = EULA_CLAUSES[:]
+    rng.shuffle(clauses)
+
+    lines = [f"{product.upper()} END USER LICENSE AGREEMENT"]
+    questions = []
+    section = 0
+    while len(lines) < n_pages * lines_per_page:
+        title, body = clauses[section % len(clauses)]
+        section += 1
+        lines.append(f"{section}. {title}")
+        for k in range(rng.randint(2, 5)):
+            lines.append(body.format(**values) + f" See also section {rng.randint(1, 40)}.")
+        if section <= len(clauses):
+            questions.append((f"What does the {title.lower()} section of the {product} agreement say?", title))
+    pages = [lines[i:i + lines_per_page] for i in range(0, n_pages * lines_per_page, lines_per_page)]
+    return pages, questions
+
+
+def make_pdf(pages: List[List[str]], image_size: int = 0) -> bytes:
+    #minimal hand-written PDF: one Helvetica text stream per page; with
+    #image_size each page also draws a grayscale image of about that many bytes,
+    #like the page scans of a scanned contract
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    width = 1000
+    height = max(1, image_size // width)
+    for p, lines in enumerate(pages):
+        image = b""
+        if image_size:
+            pixels = bytes(range(p % 256, 256)) + bytes(range(p % 256))
+            data = (pixels * (width * height // 256 + 1))[:width * height]
+            objects.append(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (width, height, len(data)) + data + b"\nendstream"
+            )
+            image = b" /XObject << /Im1 %d 0 R >>" % len(objects)
+        ops = ["q 576 0 0 806 18 18 cm /Im1 Do Q"] if image_size else []
+        ops.append("BT /F1 9 Tf 11 TL 36 800 Td")
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({escaped}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >>%s >> /Contents %d 0 R >>" % (image, content_ref)
+        )
+        page_refs.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % r for r in page_refs)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.stubs import StubEmbeddingManager, eula_document, make_pdf, percentile
+from app.core.config import Config
+from app.services.bedrockllm import BedrockLLM
+from app.services.bm25_index import BM25Index
+from app.services.document_processor import DocumentProcessor
+from app.services.document_registry import DocumentRegistry
+from app.services.local_clients import InMemoryS3Client, StubBedrockClient
+from app.services.local_vector_store import LocalVectorStore
+from app.services.rag_system import RAGSystem
+from app.services.s3_manager import S3Manager
+
+# End-to-end benchmark of ingestion and querying on the offline backends: the
+# real S3Manager, BedrockLLM, LocalVectorStore, BM25 index and registry, over an
+# in-memory S3 and a deterministic Bedrock stub. Needs no credentials.
+#   python -m benchmarks.suite --docs 50 --queries 200
+#   python -m benchmarks.suite --compare bench-results/<older commit>.json
+#
+# A generated corpus of EULA-like PDFs is ingested through
+# DocumentProcessor.process_document, then each document's clause questions go
+# through RAGSystem.query (serially, for latency) and RAGSystem.aquery (from
+# --clients concurrent clients, for throughput). Results are written as JSON
+# (default bench-results/<commit>.json); --compare prints the change against
+# an earlier file and flags metrics that got worse by more than --tolerance.
+#
+# --embedder stub (default) uses hash vectors so no model is loaded; "model"
+# uses EmbeddingManager with the configured EMBEDDING_MODEL / EMBEDDING_BACKEND.
+
+
+def peak_rss_mb() -> float:
+    #ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def latency_stats(latencies):
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def run_ingest(processor: DocumentProcessor, registry: DocumentRegistry, corpus) -> dict:
+    latencies, pages, chunks, size = [], 0, 0, 0
+    start = time.perf_counter()
+    for filename, pdf, n_pages, _ in corpus:
+        t = time.perf_counter()
+        result = processor.process_document(pdf, filename)
+        latencies.append(time.perf_counter() - t)
+        registry.put(result)
+        pages += n_pages
+        chunks += result["chunk_count"]
+        size += len(pdf)
+    elapsed = time.perf_counter() - start
+    return {
+        "docs": len(corpus),
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "docs_per_sec": len(corpus) / elapsed,
+        "pages_per_sec": pages / elapsed,
+        "chunks_per_sec": chunks / elapsed,
+        "mb_per_sec": size / 1e6 / elapsed,
+        **{f"doc_{k}": v for k, v in latency_stats(latencies).items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def hit(result: dict, doc_id: str, title: str) -> bool:
+    #a chunk of the right document from a section with the clause's title
+    return any(c["metadata"].get("doc_id") == doc_id and c["metadata"].get("section", "").endswith(f". {title}")
+               for c in result["retrieved_chunks"])
+
+
+def run_queries(rag: RAGSystem, questions, top_k: int) -> dict:
+    latencies, hits, stages = [], 0, {}
+    start = time.perf_counter()
+    for question, doc_id, title in questions:
+        t = time.perf_counter()
+        result = rag.query(question, top_k=top_k)
+        latencies.append(time.perf_counter() - t)
+        hits += hit(result, doc_id, title)
+        for stage, seconds in (result.get("timings") or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": len(questions),
+        "queries_per_sec": len(questions) / elapsed,
+        **latency_stats(latencies),
+        "hit_rate": hits / len(questions),
+        "stage_p50_ms": {stage: percentile(values, 50) * 1000 for stage, values in sorted(stages.items())},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run_concurrent(rag: RAGSystem, questions, top_k: int, clients: int) -> dict:
+    latencies = []
+    pending = list(questions)
+
+    async def client():
+        while pending:
+            question, _, _ = pending.pop()
+            t = time.perf_counter()
+            await rag.aquery(question, top_k=top_k)
+            latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "queries": len(questions),
+        "queries_per_sec": len(questions) / elapsed,
+        **latency_stats(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def higher_is_better(metric: str) -> bool:
+    return "per_sec" in metric or metric.endswith("hit_rate")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    regressions = []
+    print(f"\ncompared with {baseline['commit'][:12]} ({baseline['timestamp']})")
+    print(f"{'metric':>42} {'before':>10} {'after':>10} {'change':>8}")
+    for metric in sorted(set(old) & set(new)):
+        before, after = old[metric], new[metric]
+        if metric.endswith((".docs", ".pages", ".chunks", ".queries", ".clients")):
+            continue
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better(metric) else change
+        flag = "  worse" if worse > tolerance else ""
+        if flag:
+            regressions.append(metric)
+        print(f"{metric:>42} {before:>10.2f} {after:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--embedder", choices=["stub", "model"], default="stub")
+    parser.add_argument("--embed-latency", type=float, default=0.002, help="stub embedder seconds per call")
+    parser.add_argument("--llm-first-token", type=float, default=0.05)
+    parser.add_argument("--llm-token", type=float, default=0.0)
+    parser.add_argument("--llm-tokens", type=int, default=50)
+    parser.add_argument("--s3-latency", type=float, default=0.005)
+    parser.add_argument("--out", help="defaults to bench-results/<commit>.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    Config.ANSWER_CACHE_ENABLED = False
+    Config.EMBED_CACHE_ENABLED = False
+
+    corpus, questions = [], []
+    for d in range(args.docs):
+        pages, doc_questions = eula_document(d, args.pages)
+        filename = f"eula_{d:05d}.pdf"
+        corpus.append((filename, make_pdf(pages), len(pages), doc_questions))
+        doc_id = hashlib.md5(filename.encode()).hexdigest()
+        questions.extend((question, doc_id, title) for question, title in doc_questions)
+    questions = questions[:args.queries]
+    print(f"corpus: {len(corpus)} PDFs, {sum(len(c[1]) for c in corpus) / 1e6:.1f} MB; {len(questions)} questions")
+
+    with tempfile.TemporaryDirectory() as path:
+        if args.embedder == "stub":
+            embedding_manager = StubEmbeddingManager(args.embed_latency)
+        else:
+            from app.services.embedding_manager import EmbeddingManager
+            embedding_manager = EmbeddingManager()
+            embedding_manager.load()
+
+        s3_manager = S3Manager(client=InMemoryS3Client(args.s3_latency))
+        s3_manager.create_buckets()
+        vector_store = LocalVectorStore(path=os.path.join(path, "vectors"))
+        bm25_index = BM25Index(path=os.path.join(path, "bm25")) if Config.HYBRID_SEARCH else None
+        registry = DocumentRegistry(path=os.path.join(path, "documents.sqlite3"))
+        bedrock_llm = BedrockLLM(client=StubBedrockClient(args.llm_first_token, args.llm_token, args.llm_tokens))
+
+        processor = DocumentProcessor(
+            s3_manager=s3_manager, embedding_manager=embedding_manager, vector_store=vector_store,
+            bm25_index=bm25_index, registry=registry,
+        )
+        rag = RAGSystem(
+            embedding_manager=embedding_manager, vector_store=vector_store, bedrock_llm=bedrock_llm, bm25_index=bm25_index,
+        )
+
+        results = {"ingest": run_ingest(processor, registry, corpus)}
+        results["query"] = run_queries(rag, questions, args.top_k)
+        results["query_concurrent"] = asyncio.run(run_concurrent(rag, questions, args.top_k, args.clients))
+        rag.close()
+        registry.close()
+
+    ingest, query, concurrent = results["ingest"], results["query"], results["query_concurrent"]
+    print(f"ingest: {ingest['docs_per_sec']:.1f} docs/s, {ingest['pages_per_sec']:.0f} pages/s, "
+          f"{ingest['chunks_per_sec']:.0f} chunks/s, per doc p50 {ingest['doc_p50_ms']:.0f} ms / p99 {ingest['doc_p99_ms']:.0f} ms")
+    print(f"query:  {query['queries_per_sec']:.1f} q/s serial, p50 {query['p50_ms']:.1f} ms / p95 {query['p95_ms']:.1f} ms"
+          f" / p99 {query['p99_ms']:.1f} ms, hit rate {query['hit_rate']:.0%}")
+    print(f"        {concurrent['queries_per_sec']:.1f} q/s with {args.clients} clients, p50 {concurrent['p50_ms']:.1f} ms"
+          f" / p99 {concurrent['p99_ms']:.1f} ms")
+    print("        stage p50 ms: " + ", ".join(f"{k} {v:.2f}" for k, v in query["stage_p50_ms"].items()))
+    print(f"peak RSS: {concurrent['peak_rss_mb']:.0f} MB")
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": vars(args),
+        "results": results,
+    }
+    out = args.out or os.path.join("bench-results", f"{commit[:12]}{'-dirty' if dirty else ''}.json")
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
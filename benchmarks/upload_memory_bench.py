@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stubs import make_pdf, synthetic_pages
+
+# Peak memory of the server while concurrent clients upload large PDFs to
+# /upload, with uploads spooled to UPLOAD_DIR (memory-mapped for extraction,
+# multipart to S3) vs held in memory as before.
+#   python -m benchmarks.upload_memory_bench --mb 100 --uploads 10
+#
+# Each mode runs in a fresh process: the real /upload route and ingestion queue
+# (INGEST_WORKERS at a time, the rest queued) with stand-in embedding, a local
+# vector store and an S3 client that discards what it receives, so the figures
+# are the server's own. Request bodies are streamed into the ASGI app in 1 MB
+# pieces, as a server would pass them on. Peak RSS is the process high-water mark;
+# when spooling it includes the file pages of the documents being extracted
+# (INGEST_WORKERS at a time), which are memory-mapped and reclaimable.
+
+READ_SIZE = 1024 * 1024
+
+
+class DiscardingS3Client:
+    #counts what a multipart upload would send, keeps nothing
+    def __init__(self):
+        self.parts = 0
+        self.bytes = 0
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        for part in iter(lambda: Fileobj.read(Config.multipart_chunksize), b""):
+            self.parts += 1
+            self.bytes += len(part)
+
+    def delete_object(self, Bucket, Key):
+        return {}
+
+
+def rss_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def post_upload(app, path: str, filename: str) -> int:
+    #POST /upload with the file as a multipart body, streamed READ_SIZE at a time
+    boundary = "bench-boundary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    size = len(head) + os.path.getsize(path) + len(tail)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/upload", "raw_path": b"/upload", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode()),
+                    (b"content-length", str(size).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80), "app": app,
+    }
+    f = open(path, "rb")
+    pieces = iter([head])
+    status = []
+
+    async def receive():
+        piece = next(pieces, None)
+        if piece is None:
+            piece = f.read(READ_SIZE)
+            if not piece:
+                f.close()
+                return {"type": "http.request", "body": tail, "more_body": False}
+        await asyncio.sleep(0)
+        return {"type": "http.request", "body": piece, "more_body": True}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def child(args):
+    os.environ["UPLOAD_SPOOL_MAX_MEMORY_MB"] = "1000000" if args.child == "memory" else str(args.spool_mb)
+    os.environ["UPLOAD_DIR"] = args.upload_dir
+    from fastapi import FastAPI
+    from benchmarks.stubs import StubEmbeddingManager
+    from app.api.routes import router
+    from app.core.config import Config
+    from app.core.state import AppState
+    from app.services.document_processor import DocumentProcessor
+    from app.services.ingestion_queue import IngestionQueue
+    from app.services.local_vector_store import LocalVectorStore
+    from app.services.s3_manager import S3Manager
+
+    Config.EMBED_CACHE_ENABLED = False
+    s3_client = DiscardingS3Client()
+    processor = DocumentProcessor(
+        s3_manager=S3Manager(client=s3_client), embedding_manager=StubEmbeddingManager(0),
+        vector_store=LocalVectorStore(path=os.path.join(args.upload_dir, "vectors")),
+    )
+    state = AppState()
+    state.doc_processor = processor
+    state.ingestion_queue = IngestionQueue(processor)
+    state.ingestion_queue.start()
+    app = FastAPI()
+    app.include_router(router)
+    app.state.app_state = state
+    baseline = rss_mb("VmRSS")
+
+    async def run():
+        return await asyncio.gather(*(post_upload(app, args.pdf, f"scan_{i}.pdf") for i in range(args.uploads)))
+
+    start = time.perf_counter()
+    statuses = asyncio.run(run())
+    accepted = time.perf_counter() - start
+    accepted_peak = rss_mb("VmHWM")
+    jobs = list(state.ingestion_queue.jobs.values())
+    while any(job.status in ("queued", "running") for job in jobs):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    state.ingestion_queue.stop()
+    print(json.dumps({
+        "baseline_mb": baseline,
+        "peak_mb": rss_mb("VmHWM"),
+        "accepted_peak_mb": accepted_peak,
+        "accepted_s": accepted,
+        "seconds": elapsed,
+        "statuses": sorted(set(statuses)),
+        "completed": sum(job.status == "completed" for job in jobs),
+        "errors": sorted({job.error for job in jobs if job.error}),
+        "s3_parts": s3_client.parts,
+        "s3_mb": s3_client.bytes / 1e6,
+        "spool_files_left": len([n for n in os.listdir(args.upload_dir) if n.startswith("upload-")]),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=100, help="size of each uploaded PDF")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--uploads", type=int, default=10)
+    parser.add_argument("--spool-mb", type=int, default=8, help="UPLOAD_SPOOL_MAX_MEMORY_MB when spooling")
+    parser.add_argument("--modes", nargs="+", default=["memory", "spooled"])
+    parser.add_argument("--child", choices=["memory", "spooled"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--upload-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as path:
+        pdf_path = os.path.join(path, "scan.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(make_pdf(synthetic_pages(args.pages), image_size=int(args.mb * 1e6 / args.pages)))
+        size_mb = os.path.getsize(pdf_path) / 1e6
+        print(f"{args.uploads} concurrent uploads of a {size_mb:.0f} MB, {args.pages}-page PDF\n")
+        print(f"{'mode':>8} {'base MB':>8} {'peak MB':>8} {'added MB':>9} {'per upload':>11} {'accepted s':>11}"
+              f" {'done s':>7} {'ingested':>9} {'S3 parts':>9}")
+        for mode in args.modes:
+            upload_dir = os.path.join(path, mode)
+            os.makedirs(upload_dir)
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.upload_memory_bench", "--child", mode, "--pdf", pdf_path,
+                 "--upload-dir", upload_dir, "--uploads", str(args.uploads), "--spool-mb", str(args.spool_mb)],
+                capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                print(f"{mode:>8} failed:\n{out.stderr[-2000:]}")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            added = r["peak_mb"] - r["baseline_mb"]
+            print(f"{mode:>8} {r['baseline_mb']:>8.0f} {r['peak_mb']:>8.0f} {added:>9.0f} {added / args.uploads:>11.1f}"
+                  f" {r['accepted_s']:>11.1f} {r['seconds']:>7.1f} {r['completed']:>4}/{args.uploads:<4} {r['s3_parts']:>9}")
+            if r["errors"] or r["spool_files_left"]:
+                print(f"{'':>8} errors: {r['errors']}, spool files left: {r['spool_files_left']}")
+
+
+if __name__ == "__main__":
+    main()
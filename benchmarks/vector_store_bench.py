@@ -0,0 +1,76 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stubs import percentile
+from app.services.local_vector_store import LocalVectorStore, hnswlib
+
+# Latency and recall of the local vector store at 10k / 100k / 1M chunks.
+# Recall@k compares the HNSW index (if hnswlib is installed) with exact search.
+#   python -m benchmarks.vector_store_bench --sizes 10000 100000 1000000
+
+
+def synthetic_embeddings(n: int, dim: int, rng) -> np.ndarray:
+    #clustered unit vectors, closer to real chunk embeddings than pure noise
+    centers = rng.standard_normal((max(1, n // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(path: str, vectors: np.ndarray, use_hnsw: bool, batch: int = 10000) -> LocalVectorStore:
+    store = LocalVectorStore(path=path, use_hnsw=use_hnsw)
+    for start in range(0, len(vectors), batch):
+        part = vectors[start:start + batch]
+        chunks = [{"text": f"chunk {start + i}", "section": "1. GENERAL", "chunk_index": i} for i in range(len(part))]
+        store.add_chunks(chunks, f"doc{start // batch}", part)
+    return store
+
+
+def time_queries(store: LocalVectorStore, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        rows, _ = store.exact_top_k(q, store.matrix, store.sq_norms, store.alive, k) if store.hnsw is None \
+            else store.hnsw.knn_query(q, k=k)
+        latencies.append(time.perf_counter() - start)
+        results.append(set(np.asarray(rows).reshape(-1).tolist()))
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef", type=int, default=64)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'chunks':>9} {'index':>6} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'recall@k':>9}")
+    for size in args.sizes:
+        vectors = synthetic_embeddings(size, args.dim, rng)
+        queries = synthetic_embeddings(args.queries, args.dim, rng)
+
+        with tempfile.TemporaryDirectory() as path:
+            start = time.perf_counter()
+            exact = build(path, vectors, use_hnsw=False)
+            build_s = time.perf_counter() - start
+            latencies, truth = time_queries(exact, queries, args.k)
+            print(f"{size:>9} {'exact':>6} {build_s:>8.1f} {percentile(latencies, 50) * 1000:>8.2f} "
+                  f"{percentile(latencies, 99) * 1000:>8.2f} {1.0:>9.3f}")
+
+            if hnswlib is not None:
+                start = time.perf_counter()
+                approx = LocalVectorStore(path=path, use_hnsw=True, ef=args.ef)
+                build_s = time.perf_counter() - start
+                latencies, found = time_queries(approx, queries, args.k)
+                recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+                print(f"{size:>9} {'hnsw':>6} {build_s:>8.1f} {percentile(latencies, 50) * 1000:>8.2f} "
+                      f"{percentile(latencies, 99) * 1000:>8.2f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()